@@ -1,10 +1,15 @@
 # Caching utilities for the application
 
+import hashlib
+import inspect
+import random
+from datetime import date, time
+from decimal import Decimal
 from functools import wraps
-from django.views.decorators.cache import cache_page
+from uuid import UUID
+
 from django.core.cache import cache
-from django.utils.decorators import method_decorator
-from datetime import timedelta
+from django.db.models import Model, QuerySet
 
 
 # Кеширование на разные периоды времени
@@ -15,72 +20,135 @@ CACHE_DURATIONS = {
     'very_long': 86400, # 1 день
 }
 
+# Хранится вместо None: промах кеша и закешированный None различимы.
+_NONE = '__cache_result:none__'
+
+
+def _fingerprint(value):
+    """Каноническое представление аргумента для ключа кеша.
+
+    Модель — это метка, pk и updated_at (если есть): изменённый объект даёт
+    новый ключ. Для объектов без стабильного представления — TypeError,
+    а не repr с адресом в памяти.
+    """
+    if isinstance(value, Model):
+        version = getattr(value, 'updated_at', None)
+        return f"<{value._meta.label_lower}:{value.pk}:{version.isoformat() if version else ''}>"
+    if isinstance(value, QuerySet):
+        return f"<qs:{value.model._meta.label_lower}:{value.query}>"
+    if isinstance(value, dict):
+        items = sorted((_fingerprint(k), _fingerprint(v)) for k, v in value.items())
+        return '{' + ','.join(f"{k}:{v}" for k, v in items) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(_fingerprint(v) for v in value) + ']'
+    if isinstance(value, (set, frozenset)):
+        return '{' + ','.join(sorted(_fingerprint(v) for v in value)) + '}'
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, Decimal, UUID)):
+        return repr(value)
+    raise TypeError(f"cache_result: нет стабильного ключа для аргумента типа {type(value).__name__}")
+
 
-def cache_result(duration_key='medium', key_prefix=''):
-    """Декоратор для кеширования результатов функций"""
+def _namespace_versions(namespaces):
+    if not hasattr(cache, 'namespace_version'):
+        return []
+    return [cache.namespace_version(ns) for ns in namespaces]
+
+
+def cache_result(duration_key='medium', key_prefix='', tags=(), jitter=0.1):
+    """Декоратор для кеширования результатов функций.
+
+    Ключ — sha1 от канонических отпечатков аргументов (фиксированной длины,
+    годится для любого бэкенда). None тоже кешируется. При промахе значение
+    вычисляет один вызов (cache.get_or_set — single-flight), остальные ждут.
+    TTL случайно растянут на ±jitter, чтобы ключи, созданные вместе, не
+    истекали одновременно.
+
+    ``tags`` — шаблоны вида "profile:{user_id}", подставляются аргументы
+    вызова; invalidate_tags("profile:5") сбрасывает все результаты с этим
+    тегом, invalidate_cache(key_prefix) — все результаты функции с префиксом.
+    ``wrapper.invalidate(*args, **kwargs)`` удаляет один результат.
+    """
     def decorator(func):
+        signature = inspect.signature(func)
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        def make_key(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            namespaces = [key_prefix] if key_prefix else []
+            namespaces += [f"tag:{tag.format(**bound.arguments)}" for tag in tags]
+            raw = '|'.join([_fingerprint(bound.arguments), *_namespace_versions(namespaces)])
+            return f"cr:{name}:{hashlib.sha1(raw.encode(), usedforsecurity=False).hexdigest()}"
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            duration = CACHE_DURATIONS.get(duration_key, CACHE_DURATIONS['medium'])
-            cache_key = f"{key_prefix}:{func.__name__}:{args}:{kwargs}"
-            
-            result = cache.get(cache_key)
-            if result is None:
+            if isinstance(duration_key, int):
+                duration = duration_key
+            else:
+                duration = CACHE_DURATIONS.get(duration_key, CACHE_DURATIONS['medium'])
+
+            def compute():
                 result = func(*args, **kwargs)
-                cache.set(cache_key, result, duration)
-            
-            return result
+                return _NONE if result is None else result
+
+            timeout = max(1, round(duration * random.uniform(1 - jitter, 1 + jitter)))
+            result = cache.get_or_set(make_key(args, kwargs), compute, timeout)
+            return None if isinstance(result, str) and result == _NONE else result
+
+        wrapper.invalidate = lambda *args, **kwargs: cache.delete(make_key(args, kwargs))
+        wrapper.uncached = func
         return wrapper
     return decorator
 
 
 def invalidate_cache(pattern):
-    """Очистка кеша по шаблону"""
-    if hasattr(cache, 'delete_pattern'):
+    """Очистка кеша по шаблону ("prefix" или "prefix:*") — одна запись новой версии пространства имён"""
+    namespace = pattern.rstrip('*').rstrip(':')
+    if hasattr(cache, 'invalidate_namespace'):
+        cache.invalidate_namespace(namespace)
+    elif hasattr(cache, 'delete_pattern'):
         cache.delete_pattern(pattern)
-    else:
-        # Fallback для БД кеша
-        pass
+
+
+def invalidate_tags(*tags):
+    """Сбросить результаты cache_result, помеченные любым из тегов"""
+    for tag in tags:
+        invalidate_cache(f"tag:{tag}")
 
 
 class CachedQuerySet:
     """Вспомогательный класс для кеширования QuerySet результатов"""
-    
+
     def __init__(self, queryset, cache_duration='medium', cache_key=None):
         self.queryset = queryset
         self.cache_duration = CACHE_DURATIONS.get(cache_duration, CACHE_DURATIONS['medium'])
         self.cache_key = cache_key or f"qs:{queryset.model.__name__}"
-    
+
     def get(self):
         result = cache.get(self.cache_key)
         if result is None:
             result = list(self.queryset)
             cache.set(self.cache_key, result, self.cache_duration)
         return result
-    
+
     def invalidate(self):
         cache.delete(self.cache_key)
 
 
 # Кеширование для часто используемых данных
+@cache_result('long', tags=('profile:{user_id}',))
 def get_user_profile_cached(user_id):
-    """Получить профиль пользователя с кешем"""
-    from accounts.models import User
-    cache_key = f"user_profile:{user_id}"
-    
-    profile = cache.get(cache_key)
-    if profile is None:
-        try:
-            user = User.objects.select_related('profile').get(id=user_id)
-            profile = user.profile
-            cache.set(cache_key, profile, CACHE_DURATIONS['long'])
-        except User.DoesNotExist:
-            return None
-    
-    return profile
+    """Получить профиль пользователя с кешем (None тоже кешируется до создания профиля).
+
+    Сигналы его не сбрасывают: вызывающий код, изменив профиль, вызывает
+    invalidate_user_profile_cache.
+    """
+    from profiles.models import Profile
+    return Profile.objects.select_related('user').filter(user_id=user_id).first()
 
 
 def invalidate_user_profile_cache(user_id):
     """Очистить кеш профиля пользователя"""
-    cache_key = f"user_profile:{user_id}"
-    cache.delete(cache_key)
+    invalidate_tags(f"profile:{user_id}")
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import hashlib
+from functools import wraps
+
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+
+def _has_flash_messages(request) -> bool:
+    # len() does not mark the storage as used, so pending messages still render later.
+    return len(messages.get_messages(request)) > 0
+
+
+def version_etag(request, version: str) -> str:
+    """Strong ETag for ``version`` as seen by this user in this kind of request (htmx partial or page).
+
+    The session key and the CSRF secret are part of it: after a new login (or
+    a rotated token) the cached page holds a stale CSRF token and must not be
+    revalidated with 304.
+    """
+    user_id = getattr(request.user, "pk", None)
+    session = getattr(request, "session", None)
+    session_key = session.session_key if session is not None else None
+    csrf_secret = request.META.get("CSRF_COOKIE", "")
+    hx = request.headers.get("HX-Request") == "true"
+    raw = f"{user_id}|{session_key}|{csrf_secret}|{int(hx)}|{version}"
+    return quote_etag(hashlib.sha1(raw.encode(), usedforsecurity=False).hexdigest())
+
+
+def conditional_view(version):
+    """Answer ``304 Not Modified`` from ``version(request, *args, **kwargs)`` before the view runs.
+
+    ``version`` should be a single cheap query (the last row id, a counter)
+    that changes whenever the rendered output would. Returning None skips
+    the check. Responses are ``private, no-cache`` so browsers keep them but
+    revalidate every time: an idle htmx poll costs one query and no
+    rendering. Requests with pending flash messages always render.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or _has_flash_messages(request):
+                return view_func(request, *args, **kwargs)
+            current = version(request, *args, **kwargs)
+            if current is None:
+                return view_func(request, *args, **kwargs)
+
+            etag = version_etag(request, current)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response["ETag"] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+            # The same URL serves the full page and the htmx fragment.
+            patch_vary_headers(response, ("HX-Request", "Cookie"))
+            return response
+
+        return _wrapped
+
+    return decorator
+
+
+def notifications_version(user) -> str:
+    """Changes whenever the unread notification list (and the header counters) would."""
+    from .models import UserNotification
+
+    state = UserNotification.objects.filter(recipient=user, is_read=False).aggregate(last=Max("id"), unread=Count("id"))
+    return f"{state['last']}:{state['unread']}"
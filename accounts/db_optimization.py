@@ -1,37 +1,349 @@
 # Database optimization utilities
 
-from django.db.models import Prefetch, Select_related
-from django.db import connection
+"""Sampled request profiling.
+
+``DatabaseOptimizationMiddleware`` times a random ``PROFILING_SAMPLE_RATE``
+share of requests and, through ``connection.execute_wrapper``, counts and
+times their SQL (DEBUG is not needed). Per view it keeps histograms of the
+latency, the query count and the SQL time, plus the statements repeated at
+least ``PROFILING_DUPLICATE_THRESHOLD`` times in one request (N+1 loops),
+as fingerprints with the parameters stripped. With the rate at 0 the
+middleware removes itself at startup (MiddlewareNotUsed).
+
+Each process publishes its totals to the shared cache every
+``PROFILING_FLUSH_SECONDS``; ``collect()`` merges all live workers for the
+panel page and ``prometheus_text()`` renders them for scrapers.
+"""
+
+import logging
+import os
+import random
+import re
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection, connections
 from django.test.utils import CaptureQueriesContext
 
+logger = logging.getLogger('django')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+# Fingerprints kept per view: the ones flagged in the most requests.
+MAX_FINGERPRINTS = 20
+
+_WORKERS_KEY = 'profiling:workers'
+_WORKER_TTL = 3600
+
+_SPACES = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+\b')
+
 
 def log_query_count(view_func):
     """Декоратор для логирования количества SQL запросов"""
     def wrapper(*args, **kwargs):
         with CaptureQueriesContext(connection) as context:
             result = view_func(*args, **kwargs)
-            print(f"View {view_func.__name__} executed {len(context)} queries")
+        logger.info("View %s executed %d queries", view_func.__name__, len(context))
         return result
     return wrapper
 
 
+def fingerprint(sql: str) -> str:
+    """``sql`` with literals and IN-list lengths erased, so loop iterations compare equal."""
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACES.sub(' ', sql).strip()[:500]
+
+
+class Histogram:
+    """Fixed-bucket histogram; ``counts[i]`` holds observations <= ``bounds[i]``, the last one the rest."""
+
+    def __init__(self, bounds, counts=None, total=0.0):
+        self.bounds = tuple(bounds)
+        self.counts = list(counts) if counts else [0] * (len(self.bounds) + 1)
+        self.sum = total
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, value) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def merge(self, other: 'Histogram') -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+
+    def quantile(self, q: float):
+        """Upper bound of the bucket holding the ``q`` quantile (None when empty or past the last bound)."""
+        total = self.count
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def mean(self):
+        total = self.count
+        return self.sum / total if total else None
+
+    def to_state(self):
+        return [list(self.counts), self.sum]
+
+
+class ViewStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql = Histogram(LATENCY_BUCKETS)
+        self.errors = 0
+        self.nplusone = 0
+        # fingerprint -> [requests flagged, most repetitions in one request]
+        self.fingerprints = {}
+
+    @property
+    def count(self) -> int:
+        return self.latency.count
+
+    def record(self, duration, queries, sql_time, status, repeated) -> None:
+        self.latency.observe(duration)
+        self.queries.observe(queries)
+        self.sql.observe(sql_time)
+        if status >= 500:
+            self.errors += 1
+        if repeated:
+            self.nplusone += 1
+        for sql, times in repeated.items():
+            entry = self.fingerprints.setdefault(sql, [0, 0])
+            entry[0] += 1
+            entry[1] = max(entry[1], times)
+        if len(self.fingerprints) > MAX_FINGERPRINTS * 2:
+            self._trim()
+
+    def _trim(self) -> None:
+        top = sorted(self.fingerprints.items(), key=lambda kv: kv[1][0], reverse=True)[:MAX_FINGERPRINTS]
+        self.fingerprints = dict(top)
+
+    def merge(self, other: 'ViewStats') -> None:
+        self.latency.merge(other.latency)
+        self.queries.merge(other.queries)
+        self.sql.merge(other.sql)
+        self.errors += other.errors
+        self.nplusone += other.nplusone
+        for sql, (requests, times) in other.fingerprints.items():
+            entry = self.fingerprints.setdefault(sql, [0, 0])
+            entry[0] += requests
+            entry[1] = max(entry[1], times)
+        self._trim()
+
+    def to_state(self) -> dict:
+        return {
+            'latency': self.latency.to_state(),
+            'queries': self.queries.to_state(),
+            'sql': self.sql.to_state(),
+            'errors': self.errors,
+            'nplusone': self.nplusone,
+            'fingerprints': {sql: list(v) for sql, v in self.fingerprints.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'ViewStats':
+        stats = cls()
+        stats.latency = Histogram(LATENCY_BUCKETS, *state['latency'])
+        stats.queries = Histogram(QUERY_BUCKETS, *state['queries'])
+        stats.sql = Histogram(LATENCY_BUCKETS, *state['sql'])
+        stats.errors = state['errors']
+        stats.nplusone = state['nplusone']
+        stats.fingerprints = {sql: list(v) for sql, v in state['fingerprints'].items()}
+        return stats
+
+
+class _Recorder:
+    """Per-process profile store."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views: dict[str, ViewStats] = {}
+        self.started_at = time.time()
+        self.next_flush = 0.0
+
+    def record(self, view, *args) -> None:
+        with self.lock:
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = ViewStats()
+            stats.record(*args)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            views = {name: stats.to_state() for name, stats in self.views.items()}
+        cache_stats = cache.stats() if hasattr(cache, 'stats') else {}
+        return {'started_at': self.started_at, 'views': views, 'cache': cache_stats}
+
+    def flush_if_due(self, force=False) -> None:
+        now = time.monotonic()
+        if not force and now < self.next_flush:
+            return
+        self.next_flush = now + settings.PROFILING_FLUSH_SECONDS
+        try:
+            publish(self.snapshot())
+        except Exception:
+            logger.warning("Cannot publish request profile", exc_info=True)
+
+
+recorder = _Recorder()
+
+
+def _worker_id() -> str:
+    # Evaluated per call: gunicorn may import this module before forking its workers.
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _worker_key(worker_id: str) -> str:
+    return f"profiling:worker:{worker_id}"
+
+
+def publish(snapshot: dict) -> None:
+    def register(workers):
+        workers = {w: seen for w, seen in (workers or {}).items() if seen > time.time() - _WORKER_TTL}
+        workers[_worker_id()] = time.time()
+        return workers, None
+
+    cache.set(_worker_key(_worker_id()), snapshot, _WORKER_TTL)
+    if hasattr(cache, 'update'):
+        cache.update(_WORKERS_KEY, register, _WORKER_TTL)
+    else:
+        cache.set(_WORKERS_KEY, register(cache.get(_WORKERS_KEY))[0], _WORKER_TTL)
+
+
+def worker_snapshots() -> dict:
+    """Worker id -> snapshot of every process that published within the last hour (this one is current)."""
+    workers = cache.get(_WORKERS_KEY) or {}
+    snapshots = cache.get_many([_worker_key(w) for w in workers if w != _worker_id()])
+    result = {key.removeprefix('profiling:worker:'): snap for key, snap in snapshots.items()}
+    result[_worker_id()] = recorder.snapshot()
+    return result
+
+
+def collect() -> dict:
+    """Per-view totals over all workers: {view: ViewStats}."""
+    merged: dict[str, ViewStats] = {}
+    for snapshot in worker_snapshots().values():
+        for view, state in snapshot['views'].items():
+            stats = ViewStats.from_state(state)
+            if view in merged:
+                merged[view].merge(stats)
+            else:
+                merged[view] = stats
+    return merged
+
+
 class DatabaseOptimizationMiddleware:
-    """Middleware для логирования медленных запросов в development"""
-    
+    """Profile a sample of requests: latency, SQL count and time, repeated statements."""
+
     def __init__(self, get_response):
+        self.rate = float(getattr(settings, 'PROFILING_SAMPLE_RATE', 0))
+        if self.rate <= 0:
+            raise MiddlewareNotUsed
         self.get_response = get_response
+        self.threshold = int(getattr(settings, 'PROFILING_DUPLICATE_THRESHOLD', 5))
 
     def __call__(self, request):
-        if hasattr(connection, 'queries_log'):
-            connection.queries = []
-            
-        response = self.get_response(request)
-        
-        if hasattr(connection, 'queries_log') and hasattr(request, 'path'):
-            query_count = len(connection.queries) if hasattr(connection, 'queries') else 0
-            if query_count > 10:  # Предупреждение при более чем 10 запросах
-                import logging
-                logger = logging.getLogger('django')
-                logger.warning(f"Path {request.path} executed {query_count} queries")
-        
+        if self.rate < 1 and random.random() >= self.rate:
+            return self.get_response(request)
+
+        seen: dict[str, int] = {}
+        sql_time = 0.0
+
+        def track(execute, sql, params, many, context):
+            nonlocal sql_time
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                sql_time += time.perf_counter() - started
+                key = fingerprint(sql)
+                seen[key] = seen.get(key, 0) + 1
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(track))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match._func_path) if match else '<unresolved>'
+        repeated = {sql: n for sql, n in seen.items() if n >= self.threshold}
+        recorder.record(view, duration, sum(seen.values()), sql_time, response.status_code, repeated)
+        recorder.flush_if_due()
         return response
+
+
+# --- Prometheus text format ----------------------------------------------------------------------
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(name: str, labels: str, histogram: Histogram) -> list[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.bounds, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+    return lines
+
+
+def prometheus_text() -> str:
+    """Every worker's series, labelled by worker, so counter resets stay per process."""
+    metrics = {
+        'app_request_duration_seconds': ('histogram', 'Sampled request latency', 'latency'),
+        'app_request_queries': ('histogram', 'SQL statements per sampled request', 'queries'),
+        'app_request_sql_seconds': ('histogram', 'SQL time per sampled request', 'sql'),
+        'app_request_errors_total': ('counter', 'Sampled requests answered with 5xx', 'errors'),
+        'app_request_nplusone_total': ('counter', 'Sampled requests that repeated a statement', 'nplusone'),
+    }
+    snapshots = worker_snapshots()
+    lines = []
+    for name, (kind, help_text, attr) in metrics.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for worker, snapshot in sorted(snapshots.items()):
+            for view, state in sorted(snapshot['views'].items()):
+                labels = f'worker="{_label(worker)}",view="{_label(view)}"'
+                value = getattr(ViewStats.from_state(state), attr)
+                if kind == 'histogram':
+                    lines.extend(_histogram_lines(name, labels, value))
+                else:
+                    lines.append(f'{name}{{{labels}}} {value}')
+
+    lines.append('# HELP app_cache_operations_total Tiered cache lookups and writes')
+    lines.append('# TYPE app_cache_operations_total counter')
+    for worker, snapshot in sorted(snapshots.items()):
+        for op in ('local_hits', 'shared_hits', 'misses', 'sets', 'deletes', 'evictions'):
+            if op in snapshot.get('cache', {}):
+                lines.append(
+                    f'app_cache_operations_total{{worker="{_label(worker)}",op="{op}"}} {snapshot["cache"][op]}'
+                )
+    return '\n'.join(lines) + '\n'
@@ -1,18 +1,320 @@
 from django.db import models
+from django.db.models.query_utils import DeferredAttribute
 from django.conf import settings
+import hashlib
+import hmac
 import json
-import base64
+import threading
+from collections import OrderedDict
 
+# Fernet tokens are base64url of a 0x80 version byte followed by a timestamp.
+_TOKEN_PREFIX = "gAAAAA"
 
-class EncryptedEmailField(models.EmailField):
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _copy_json(value):
+    """Cheap deep copy for decoded JSON (dict/list/scalars only)."""
+    if isinstance(value, dict):
+        return {k: _copy_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(v) for v in value]
+    return value
+
+
+class _LRU:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+
+class _Loaded:
+    """A value read from a token, still carrying the token and its plaintext digest.
+
+    Only ``from_db_value()`` produces these; ``_EncryptedAttribute`` unwraps
+    them as the model attribute is set.
+    """
+
+    token = None
+    plaintext = None
+
+    @staticmethod
+    def wrap(value, token: str, plaintext: bytes):
+        cls = _LOADED_TYPES.get(type(value))
+        if cls is None:
+            return value
+        loaded = cls(value)
+        loaded.token, loaded.plaintext = token, plaintext
+        return loaded
+
+
+class _LoadedStr(_Loaded, str):
+    pass
+
+
+class _LoadedDict(_Loaded, dict):
+    pass
+
+
+class _LoadedList(_Loaded, list):
+    pass
+
+
+_LOADED_TYPES = {str: _LoadedStr, dict: _LoadedDict, list: _LoadedList}
+_LOADED_TYPES_BASE = {loaded: base for base, loaded in _LOADED_TYPES.items()}
+
+
+class _Ciphertext(str):
+    """A ready token returned by ``pre_save()``; ``get_prep_value()`` passes it through."""
+
+
+class _EncryptedAttribute(DeferredAttribute):
+    """Remembers, per instance, which token the field value was loaded from.
+
+    ``pre_save()`` writes that token back while the instance still holds the
+    same plaintext for the same row, so saving a model does not re-encrypt
+    untouched fields. Tokens are never shared between rows: equal plaintexts
+    in two rows still get different ciphertexts.
+    """
+
+    def __set__(self, instance, value):
+        if isinstance(value, _Loaded):
+            instance.__dict__.setdefault("_encrypted_tokens", {})[self.field.attname] = (
+                instance.pk, value.plaintext, value.token
+            )
+            value = _LOADED_TYPES_BASE[type(value)](value)
+        instance.__dict__[self.field.attname] = value
+
+
+class _FieldCache:
+    """Decrypt-once cache shared by the encrypted fields.
+
+    Maps a ciphertext digest to the decoded value and a digest of its
+    plaintext, so a row that was already decrypted costs a hash and a dict
+    lookup instead of HMAC + AES + ``json.loads``. Callers always get a copy,
+    never the cached object.
+    """
+
+    def __init__(self):
+        self._decoded = None
+        self._lock = threading.Lock()
+        self.reencrypt_skipped = 0
+
+    def _ensure(self):
+        if self._decoded is None:
+            with self._lock:
+                if self._decoded is None:
+                    self._decoded = _LRU(int(getattr(settings, "ENCRYPTED_FIELD_CACHE_SIZE", 4096)))
+        return self._decoded
+
+    def _decrypt(self, kind: str, token: str, decode):
+        decoded = self._ensure()
+        key = (kind, _digest(token.encode()))
+        hit = decoded.get(key)
+        if hit is None:
+            plaintext = settings.FERNET.decrypt(token.encode())
+            hit = (decode(plaintext), _digest(plaintext))
+            decoded.put(key, hit)
+        return _copy_json(hit[0]), hit[1]
+
+    def decrypt(self, kind: str, token: str, decode):
+        """Return ``decode(plaintext)`` for ``token``; raises if it is not a valid token."""
+        return self._decrypt(kind, token, decode)[0]
+
+    def load(self, kind: str, token: str, decode):
+        """Like ``decrypt()``, but the value remembers ``token`` (see ``_EncryptedAttribute``)."""
+        value, plaintext = self._decrypt(kind, token, decode)
+        return _Loaded.wrap(value, token, plaintext)
+
+    def stats(self) -> dict:
+        return {
+            "decrypt": self._ensure().stats(),
+            "reencrypt_skipped": self.reencrypt_skipped,
+        }
+
+    def clear(self) -> None:
+        self._ensure().clear()
+        self.reencrypt_skipped = 0
+
+
+_cache = _FieldCache()
+
+
+def encrypted_field_cache_stats() -> dict:
+    """Hit/miss counters of the encrypted field caches (per process)."""
+    return _cache.stats()
+
+
+def clear_encrypted_field_cache() -> None:
+    _cache.clear()
+
+
+def _looks_encrypted(value: str) -> bool:
+    return value.startswith(_TOKEN_PREFIX)
+
+
+def _unwrap_json_string(value: str) -> str:
+    # JSONField adapts the token as a JSON string, so the column holds "gAAAA...".
+    if value.startswith('"') and value.endswith('"'):
+        try:
+            inner = json.loads(value)
+        except ValueError:
+            return value
+        if isinstance(inner, str):
+            return inner
+    return value
+
+
+def fernet_token(raw: str, *, json_quoted: bool = False) -> str | None:
+    """The Fernet token held by a raw column value, or None when it is plaintext.
+
+    ``json_quoted``: the column is JSON, where the token is stored as a JSON string.
+    """
+    if json_quoted:
+        raw = _unwrap_json_string(raw)
+    return raw if _looks_encrypted(raw) else None
+
+
+def email_blind_index(email: str | None) -> str | None:
+    """Keyed HMAC-SHA256 of the normalized address, or None for an empty one.
+
+    Ciphertexts differ on every write, so encrypted emails can only be looked
+    up by exact match through this digest. Accepts a Fernet token as well.
+    """
+    if not email:
+        return None
+    if _looks_encrypted(email):
+        try:
+            email = _cache.decrypt("email", email, bytes.decode)
+        except Exception:
+            return None
+    email = email.strip().lower()
+    if not email:
+        return None
+    return hmac.new(settings.BLIND_INDEX_KEY.encode(), email.encode(), hashlib.sha256).hexdigest()
+
+
+def backfill_email_blind_index(user_model, *, chunk_size: int = 2000, dry_run: bool = False) -> dict:
+    """(Re)compute ``email_bidx`` for every row of ``user_model`` in primary-key chunks.
+
+    Works on historical models too (migrations), since it only reads the raw
+    ``email`` column. Addresses that differ only in case collide on the
+    unique index: the account that holds (or first gets) the digest keeps it,
+    the others are left NULL and reported in ``duplicates`` as (pk, holder pk).
+    """
+    stats = {"scanned": 0, "updated": 0, "duplicates": []}
+    qs = user_model.objects.order_by("pk").values_list("pk", "email", "email_bidx")
+    last_pk = 0
+    while True:
+        rows = list(qs.filter(pk__gt=last_pk)[:chunk_size])
+        if not rows:
+            return stats
+        last_pk = rows[-1][0]
+        stats["scanned"] += len(rows)
+
+        wanted = {pk: email_blind_index(email) for pk, email, _ in rows}
+        taken = dict(
+            user_model.objects.filter(email_bidx__in={d for d in wanted.values() if d})
+            .exclude(pk__in=wanted)
+            .values_list("email_bidx", "pk")
+        )
+        changed = []
+        for pk, _, current in rows:
+            digest = wanted[pk]
+            if digest is not None and digest in taken and taken[digest] != pk:
+                stats["duplicates"].append((pk, taken[digest]))
+                digest = None
+            elif digest is not None:
+                taken[digest] = pk
+            if digest != current:
+                changed.append(user_model(pk=pk, email_bidx=digest))
+        if changed and not dry_run:
+            user_model.objects.bulk_update(changed, ["email_bidx"])
+        stats["updated"] += len(changed)
+
+
+class _EncryptedField:
+    """Shared save path of the encrypted fields; ``_plaintext()`` serializes a value."""
+
+    descriptor_class = _EncryptedAttribute
+
+    def _plaintext(self, value) -> bytes:
+        raise NotImplementedError
+
+    def pre_save(self, model_instance, add):
+        value = super().pre_save(model_instance, add)
+        if value is None:
+            return value
+        plaintext = self._plaintext(value)
+        tokens = model_instance.__dict__.setdefault("_encrypted_tokens", {})
+        loaded = tokens.get(self.attname)
+        if not add and loaded and loaded[0] == model_instance.pk and loaded[1] == _digest(plaintext):
+            _cache.reencrypt_skipped += 1
+            return _Ciphertext(loaded[2])
+        token = settings.FERNET.encrypt(plaintext).decode()
+        tokens[self.attname] = (model_instance.pk, _digest(plaintext), token)
+        return _Ciphertext(token)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return value
+        if isinstance(value, _Ciphertext):
+            return str(value)
+        return settings.FERNET.encrypt(self._plaintext(value)).decode()
+
+
+class EncryptedEmailField(_EncryptedField, models.EmailField):
     """Email field that stores encrypted value in database."""
 
     def from_db_value(self, value, expression, connection):
         if value is None:
             return value
+        if not _looks_encrypted(value):
+            return value
         try:
-            decrypted = settings.FERNET.decrypt(value.encode())
-            return decrypted.decode()
+            return _cache.load("email", value, bytes.decode)
         except Exception:
             return value
 
@@ -23,24 +325,25 @@ class EncryptedEmailField(models.EmailField):
             return value
         return str(value)
 
-    def get_prep_value(self, value):
-        if value is None:
-            return value
-        if not isinstance(value, str):
-            value = str(value)
-        encrypted = settings.FERNET.encrypt(value.encode())
-        return encrypted.decode()
+    def _plaintext(self, value) -> bytes:
+        return str(value).encode()
+
 
+def _decode_json(plaintext: bytes):
+    return json.loads(plaintext.decode())
 
-class EncryptedJSONField(models.JSONField):
+
+class EncryptedJSONField(_EncryptedField, models.JSONField):
     """JSON field that stores encrypted value in database."""
 
     def from_db_value(self, value, expression, connection):
         if value is None:
             return value
+        token = _unwrap_json_string(value) if isinstance(value, str) else value
+        if not isinstance(token, str) or not _looks_encrypted(token):
+            return super().from_db_value(value, expression, connection)
         try:
-            decrypted = settings.FERNET.decrypt(value.encode())
-            return json.loads(decrypted.decode())
+            return _cache.load("json", token, _decode_json)
         except Exception:
             return value
 
@@ -48,22 +351,18 @@ class EncryptedJSONField(models.JSONField):
         if value is None:
             return value
         if isinstance(value, str):
-            try:
-                # Try to decrypt if it's an encrypted string
-                decrypted = settings.FERNET.decrypt(value.encode())
-                return json.loads(decrypted.decode())
-            except Exception:
-                # If decryption fails, try to parse as JSON directly
+            if _looks_encrypted(value):
                 try:
-                    return json.loads(value)
+                    return _cache.decrypt("json", value, _decode_json)
                 except Exception:
-                    # Return as-is if it's not JSON
-                    return value
+                    pass
+            # Not a token: try to parse as JSON directly
+            try:
+                return json.loads(value)
+            except Exception:
+                # Return as-is if it's not JSON
+                return value
         return value
 
-    def get_prep_value(self, value):
-        if value is None:
-            return value
-        json_str = json.dumps(value, ensure_ascii=False)
-        encrypted = settings.FERNET.encrypt(json_str.encode())
-        return encrypted.decode()
+    def _plaintext(self, value) -> bytes:
+        return json.dumps(value, ensure_ascii=False).encode()
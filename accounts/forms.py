@@ -4,6 +4,7 @@ from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 
+from .fields import email_blind_index
 from .models import User
 
 
@@ -30,6 +31,12 @@ class RegisterForm(UserCreationForm):
         model = User
         fields = ("username", "email", "password1", "password2")
 
+    def clean_email(self):
+        email = (self.cleaned_data.get("email") or "").strip().lower()
+        if User.objects.filter(email_bidx=email_blind_index(email)).exists():
+            raise ValidationError("Этот email уже занят.")
+        return email
+
 
 class EmailVerificationForm(forms.Form):
     code = forms.CharField(
@@ -98,7 +105,7 @@ class AccountSettingsForm(forms.ModelForm):
         if not email:
             raise ValidationError("Укажите email.")
 
-        qs = User.objects.filter(email__iexact=email)
+        qs = User.objects.filter(email_bidx=email_blind_index(email))
         if self.instance and getattr(self.instance, "pk", None):
             qs = qs.exclude(pk=self.instance.pk)
         if qs.exists():
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.fields import backfill_email_blind_index
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute User.email_bidx (HMAC blind index of the email) in primary-key chunks. "
+        "Run after changing DJANGO_BLIND_INDEX_KEY or after writing emails with queryset.update()"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Users read and updated per batch (default: 2000)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count the rows that would change without writing",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stats = backfill_email_blind_index(
+            User,
+            chunk_size=max(1, options["chunk_size"]),
+            dry_run=options["dry_run"],
+        )
+        for pk, holder in stats["duplicates"]:
+            self.stdout.write(
+                self.style.WARNING(f"user {pk}: email differs from user {holder} only by case, email_bidx left empty")
+            )
+        prefix = "[DRY RUN] Would update" if options["dry_run"] else "Updated"
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"{prefix} {stats['updated']} of {stats['scanned']} users in {elapsed:.1f}s")
+        )
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.db.models.functions import Cast
+
+from accounts.fields import fernet_token
+
+# name -> (app label, model, field, kind)
+TARGETS = {
+    "user.email": ("accounts", "User", "email", "text"),
+    "profile.questionnaire_me": ("profiles", "Profile", "questionnaire_me", "json"),
+    "profile.questionnaire_ideal": ("profiles", "Profile", "questionnaire_ideal", "json"),
+}
+
+_worker_fernet: MultiFernet | None = None
+
+
+def _init_worker(keys: list[str]) -> None:
+    global _worker_fernet
+    _worker_fernet = MultiFernet([Fernet(k.encode()) for k in keys])
+
+
+def _plaintext(kind: str, raw: str) -> bytes | None:
+    """Bytes the encrypted field would encrypt for ``raw``, or None for empty values."""
+    if kind == "json":
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return raw.encode() if raw.strip() else None
+        if not value:
+            return None
+        return json.dumps(value, ensure_ascii=False).encode()
+    return raw.encode() if raw.strip() else None
+
+
+def transform(kind: str, raw: str | None, rotate: bool, fernet: MultiFernet | None = None) -> str | None:
+    """New token for a raw column value, or None when the row is already up to date."""
+    fernet = fernet or _worker_fernet
+    if raw is None:
+        return None
+    token = fernet_token(raw, json_quoted=kind == "json")
+    if token is not None:
+        try:
+            if rotate:
+                return fernet.rotate(token.encode()).decode()
+            fernet.decrypt(token.encode())
+            return None
+        except InvalidToken:
+            # Looks like a token but no configured key opens it: leave it alone.
+            return None
+    plaintext = _plaintext(kind, raw)
+    if plaintext is None:
+        return None
+    return fernet.encrypt(plaintext).decode()
+
+
+def _transform_item(args):
+    kind, raw, rotate = args
+    return transform(kind, raw, rotate)
+
+
+class Command(BaseCommand):
+    help = (
+        "Encrypt plaintext emails/questionnaires and optionally rotate existing tokens to the current "
+        "DJANGO_FERNET_KEY. Streams rows by primary key, encrypts in a worker pool, writes back with "
+        "bulk_update per chunk and checkpoints progress so an interrupted run can resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Show what would be encrypted without actually encrypting",
+        )
+        parser.add_argument(
+            "--rotate",
+            action="store_true",
+            help="Re-encrypt existing tokens under the current key (old keys come from DJANGO_FERNET_OLD_KEYS)",
+        )
+        parser.add_argument(
+            "--targets",
+            default=",".join(TARGETS),
+            help=f"Comma-separated columns to process (default: {','.join(TARGETS)})",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows per primary-key chunk and per bulk_update (default: 2000)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Size of the encryption pool (default: number of CPUs)",
+        )
+        parser.add_argument(
+            "--executor",
+            choices=("process", "thread"),
+            default="process",
+            help="Pool type for encryption work (default: process)",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=str(settings.BASE_DIR / "reencrypt_checkpoint.json"),
+            help="Progress file used by --resume",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue after the last primary key recorded in the checkpoint file",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        rotate = options["rotate"]
+        chunk_size = max(1, options["chunk_size"])
+        workers = max(1, options["workers"])
+        checkpoint_path = Path(options["checkpoint"]).expanduser()
+
+        names = [n.strip() for n in options["targets"].split(",") if n.strip()]
+        unknown = [n for n in names if n not in TARGETS]
+        if unknown:
+            raise CommandError(f"Unknown targets: {', '.join(unknown)}")
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING("[DRY RUN] No data will be modified"))
+        if rotate and not getattr(settings, "FERNET_OLD_KEYS", None):
+            self.stdout.write(self.style.WARNING("DJANGO_FERNET_OLD_KEYS is empty: tokens are re-encrypted under the same key"))
+
+        mode = "rotate" if rotate else "encrypt"
+        state = {"mode": mode, "targets": {}}
+        if options["resume"] and checkpoint_path.exists():
+            state = json.loads(checkpoint_path.read_text(encoding="utf-8"))
+            if state.get("mode") != mode:
+                raise CommandError(
+                    f"Checkpoint {checkpoint_path} was written in '{state.get('mode')}' mode; "
+                    "re-run with the same flags or without --resume"
+                )
+
+        keys = [settings.FERNET_KEY, *getattr(settings, "FERNET_OLD_KEYS", [])]
+        if options["executor"] == "process":
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(keys,))
+        else:
+            _init_worker(keys)
+            pool = ThreadPoolExecutor(max_workers=workers)
+
+        with pool:
+            for name in names:
+                progress = state["targets"].setdefault(name, {"last_pk": 0, "done": False})
+                if progress["done"]:
+                    self.stdout.write(f"{name}: already done according to checkpoint")
+                    continue
+                self._process_target(name, progress, pool, rotate, chunk_size, dry_run, state, checkpoint_path)
+
+        if not dry_run:
+            checkpoint_path.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS("Encryption complete"))
+
+    def _process_target(self, name, progress, pool, rotate, chunk_size, dry_run, state, checkpoint_path):
+        app_label, model_name, field_name, kind = TARGETS[name]
+        model = apps.get_model(app_label, model_name)
+        output_field = models.JSONField() if kind == "json" else models.TextField()
+
+        base_qs = model._default_manager.annotate(
+            raw=Cast(field_name, output_field=models.TextField())
+        ).order_by("pk")
+
+        scanned = changed = 0
+        last_pk = progress["last_pk"]
+        while True:
+            rows = list(
+                base_qs.filter(pk__gt=last_pk)
+                .values_list("pk", "raw")[:chunk_size]
+                .iterator(chunk_size=chunk_size)
+            )
+            if not rows:
+                break
+
+            work = [(kind, raw, rotate) for _, raw in rows]
+            results = list(pool.map(_transform_item, work, chunksize=max(1, len(work) // 32)))
+
+            objs = []
+            for (pk, _), token in zip(rows, results):
+                if token is None:
+                    continue
+                obj = model(pk=pk)
+                setattr(obj, field_name, models.Value(token, output_field=output_field))
+                objs.append(obj)
+
+            if objs and not dry_run:
+                with transaction.atomic():
+                    model._default_manager.bulk_update(objs, [field_name], batch_size=chunk_size)
+
+            scanned += len(rows)
+            changed += len(objs)
+            last_pk = rows[-1][0]
+            if not dry_run:
+                progress["last_pk"] = last_pk
+                self._save_checkpoint(checkpoint_path, state)
+            verb = "would update" if dry_run else "updated"
+            self.stdout.write(f"{name}: scanned {scanned}, {verb} {changed} (last id {last_pk})")
+
+        if not dry_run:
+            progress["done"] = True
+            self._save_checkpoint(checkpoint_path, state)
+
+    @staticmethod
+    def _save_checkpoint(path: Path, state: dict) -> None:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, path)
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0007_encrypt_existing_emails"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="email_bidx",
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, null=True),
+        ),
+    ]
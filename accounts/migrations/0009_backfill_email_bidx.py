@@ -0,0 +1,64 @@
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.db import migrations
+
+CHUNK_SIZE = 2000
+
+
+def _blind_index(email):
+    # Frozen copy of accounts.fields.email_blind_index as of this migration.
+    if not email:
+        return None
+    if email.startswith("gAAAAA"):
+        try:
+            email = settings.FERNET.decrypt(email.encode()).decode()
+        except Exception:
+            return None
+    email = email.strip().lower()
+    if not email:
+        return None
+    return hmac.new(settings.BLIND_INDEX_KEY.encode(), email.encode(), hashlib.sha256).hexdigest()
+
+
+def backfill(apps, schema_editor):
+    """Compute email_bidx in primary-key chunks.
+
+    Addresses that differ only by case would collide on the unique index
+    added next: the first account keeps the digest, the others stay NULL
+    (`manage.py backfill_email_bidx --dry-run` lists them).
+    """
+    User = apps.get_model("accounts", "User")
+    qs = User.objects.order_by("pk").values_list("pk", "email")
+    last_pk = 0
+    while True:
+        rows = list(qs.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        wanted = {pk: _blind_index(email) for pk, email in rows}
+        taken = set(
+            User.objects.filter(email_bidx__in={d for d in wanted.values() if d})
+            .exclude(pk__in=wanted)
+            .values_list("email_bidx", flat=True)
+        )
+        changed = []
+        for pk, digest in wanted.items():
+            if digest in taken:
+                digest = None
+            elif digest is not None:
+                taken.add(digest)
+            changed.append(User(pk=pk, email_bidx=digest))
+        User.objects.bulk_update(changed, ["email_bidx"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0008_user_email_bidx"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
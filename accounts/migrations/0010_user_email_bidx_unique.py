@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0009_backfill_email_bidx"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="email_bidx",
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
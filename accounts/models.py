@@ -2,14 +2,35 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils import timezone
 
+from .fields import email_blind_index
+
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
     email_verified = models.BooleanField(default=False)
+    # Blind index of the (possibly encrypted) email: exact-match lookups without decrypting every row.
+    email_bidx = models.CharField(max_length=64, blank=True, null=True, unique=True, editable=False)
 
     def __str__(self) -> str:
         return self.get_username()
 
+    def save(self, *args, **kwargs):
+        bidx = email_blind_index(self.email)
+        if bidx is not None and bidx != self.email_bidx and self._email_bidx_taken(bidx):
+            # Differs from another account's email only by case (see
+            # backfill_email_blind_index): save without a digest instead of
+            # failing on the unique index. Forms reject it in clean_email.
+            self.email_bidx = None
+        elif bidx is not None or not self.email:
+            self.email_bidx = bidx
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "email" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "email_bidx"}
+        super().save(*args, **kwargs)
+
+    def _email_bidx_taken(self, bidx: str) -> bool:
+        return type(self)._default_manager.filter(email_bidx=bidx).exclude(pk=self.pk).exists()
+
 
 class EmailVerification(models.Model):
     user = models.OneToOneField(
@@ -0,0 +1,145 @@
+"""Fixed-window rate limiting.
+
+Every (scope, identity) pair counts its requests per ``window`` seconds,
+windows aligned to the epoch; the ``limit + 1``-th request of a window is
+refused until the window ends (Retry-After). A hit is one atomic
+``cache.count()`` of the window's counter: a single Lua script on Redis, a
+locked rewrite of one file for ``FileCache``. Refused hits are counted
+too, so hammering does not reopen the window early. Rates live in
+``settings.RATE_LIMITS`` as ``"<requests>/<seconds>"``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .security import get_client_ip
+
+
+class RateLimitResult:
+    def __init__(self, allowed: bool, remaining: int, retry_after: int):
+        self.allowed = allowed
+        self.remaining = remaining
+        self.retry_after = retry_after
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    limit, _, window = str(rate).partition("/")
+    return int(limit), int(window or 1)
+
+
+def _window(scope: str, identity: str, window: int) -> tuple[str, int]:
+    """Counter key of the current window and the seconds left until it ends."""
+    now = time.time()
+    start = int(now // window) * window
+    return f"rl:{scope}:{identity}:{start}", max(1, math.ceil(start + window - now))
+
+
+def hit(scope: str, identity: str, limit: int, window: int) -> RateLimitResult:
+    """Count a request of ``identity`` in ``scope``; allowed while the window holds at most ``limit``."""
+    key, ttl = _window(scope, identity, window)
+    # The counter expires with its window.
+    count = cache.count(key, ttl)
+    if count <= limit:
+        return RateLimitResult(True, limit - count, 0)
+    return RateLimitResult(False, 0, ttl)
+
+
+def peek(scope: str, identity: str, limit: int, window: int) -> RateLimitResult:
+    """Whether a request of ``identity`` in ``scope`` would be allowed, without counting it."""
+    key, ttl = _window(scope, identity, window)
+    # Counters live in the shared tier only (``count()`` bypasses the local one).
+    count = getattr(cache, "shared", cache).get(key) or 0
+    if count < limit:
+        return RateLimitResult(True, limit - count, 0)
+    return RateLimitResult(False, 0, ttl)
+
+
+def _digest(value: str) -> str:
+    # Emails and usernames stay out of cache keys.
+    return hashlib.sha1(value.strip().lower().encode(), usedforsecurity=False).hexdigest()[:20]
+
+
+def request_identities(request, keys) -> list[str]:
+    """Bucket identities of ``request``.
+
+    ``keys``: "ip", "user", "post:<field>", "session:<key>" or a callable
+    ``request -> str | None``. Missing values (anonymous user, empty field)
+    are skipped.
+    """
+    identities = []
+    for key in keys:
+        if callable(key):
+            value = key(request)
+            identity = f"fn:{_digest(value)}" if value else None
+        elif key == "ip":
+            ip = get_client_ip(request)
+            identity = f"ip:{ip}" if ip else None
+        elif key == "user":
+            identity = f"user:{request.user.pk}" if request.user.is_authenticated else None
+        elif key.startswith("post:"):
+            value = request.POST.get(key[5:])
+            identity = f"{key}:{_digest(value)}" if value else None
+        elif key.startswith("session:"):
+            value = request.session.get(key[8:])
+            identity = f"{key}:{_digest(str(value))}" if value else None
+        else:
+            raise ValueError(f"Unknown rate limit key {key!r}")
+        if identity:
+            identities.append(identity)
+    return identities
+
+
+def check(request, scope: str, keys=("ip",), *, consume: bool = True) -> RateLimitResult:
+    """Count ``request`` in every window of ``scope`` it belongs to (one atomic cache operation each).
+
+    With ``consume=False`` the counters are only read, e.g. to refuse a
+    request whose failures are counted later.
+    """
+    result = RateLimitResult(True, 0, 0)
+    if not settings.RATE_LIMIT_ENABLED:
+        return result
+    limit, window = parse_rate(settings.RATE_LIMITS[scope])
+    for identity in request_identities(request, keys):
+        result = (hit if consume else peek)(scope, identity, limit, window)
+        if not result.allowed:
+            break
+    return result
+
+
+def too_many_requests(result: RateLimitResult) -> HttpResponse:
+    response = HttpResponse(
+        f"Слишком много запросов. Повторите через {result.retry_after} с.",
+        status=429,
+        content_type="text/plain; charset=utf-8",
+    )
+    response["Retry-After"] = str(result.retry_after)
+    return response
+
+
+def rate_limit(scope: str, keys=("ip",), methods=("POST",)):
+    """Answer ``429 Too Many Requests`` with Retry-After once a window of ``scope`` is full.
+
+    Only ``methods`` are counted (forms are free to display). Put it below
+    ``@login_required`` when keying by "user".
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            if request.method in methods:
+                result = check(request, scope, keys)
+                if not result.allowed:
+                    return too_many_requests(result)
+            return view_func(request, *args, **kwargs)
+
+        return _wrapped
+
+    return decorator
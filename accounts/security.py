@@ -23,7 +23,7 @@ def verify_code_hash(code, code_hash):
 
 def check_rate_limit(request, key_prefix, max_attempts=5, window_seconds=3600):
     """
-    Проверяет rate limiting для запроса
+    Проверяет rate limiting для запроса (атомарный token bucket, см. accounts/ratelimit.py)
     
     Args:
         request: Django request object
@@ -34,18 +34,10 @@ def check_rate_limit(request, key_prefix, max_attempts=5, window_seconds=3600):
     Returns:
         bool: True если лимит не превышен, False если превышен
     """
-    from django.core.cache import cache
+    from .ratelimit import hit
     
     client_ip = get_client_ip(request)
-    cache_key = f"ratelimit:{key_prefix}:{client_ip}"
-    
-    attempt_count = cache.get(cache_key, 0)
-    
-    if attempt_count >= max_attempts:
-        return False
-    
-    cache.set(cache_key, attempt_count + 1, window_seconds)
-    return True
+    return hit(key_prefix, f"ip:{client_ip}", max_attempts, window_seconds).allowed
 
 
 def get_client_ip(request):
@@ -69,18 +61,10 @@ def is_suspicious_activity(request, threshold=10):
     Returns:
         bool: True если активность подозрительна
     """
-    from django.core.cache import cache
+    from .ratelimit import hit
     
     client_ip = get_client_ip(request)
-    cache_key = f"activity:{client_ip}"
-    
-    count = cache.get(cache_key, 0)
-    
-    if count >= threshold:
-        return True
-    
-    cache.set(cache_key, count + 1, 60)
-    return False
+    return not hit("activity", f"ip:{client_ip}", threshold, 60).allowed
 
 
 class SecurityHeaders:
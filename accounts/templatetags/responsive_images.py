@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from profiles.images import DERIVATIVE_SIZES
+
+register = template.Library()
+
+
+def _source(obj):
+    """(field file, derivative metadata) of a ProfilePhoto or a Profile avatar."""
+    if hasattr(obj, "derivatives"):
+        return obj.image, obj.derivatives
+    return obj.avatar, obj.avatar_derivatives
+
+
+def _srcset(entries, fmt: str) -> str:
+    seen = set()
+    parts = []
+    # Smallest first; sizes that fell back to a smaller copy share its file and are skipped.
+    for entry in reversed(entries):
+        name = entry.get(fmt)
+        if not name or name in seen:
+            continue
+        seen.add(name)
+        parts.append(f"{default_storage.url(name)} {entry['w']}w")
+    return ", ".join(parts)
+
+
+@register.simple_tag
+def responsive_img(obj, size: str = "card", sizes: str = "100vw", css_class: str = "", alt: str = "", eager: bool = False):
+    """``<img>`` for a photo or avatar with WebP/JPEG ``srcset`` of its stored derivatives.
+
+    ``size`` picks the fallback ``src`` and the intrinsic width/height, so the
+    browser reserves the right box before the image arrives; ``sizes`` tells it
+    how wide the slot is. Images below the fold are lazy; pass ``eager=True``
+    for the one the page is about.
+
+        {% responsive_img photo "card" sizes="(min-width: 640px) 33vw, 100vw" css_class="h-44 w-full" %}
+    """
+    if obj is None:
+        return ""
+    field_file, derivatives = _source(obj)
+    if not field_file:
+        return ""
+
+    loading = format_html('loading="eager" fetchpriority="high"') if eager else format_html('loading="lazy"')
+    available = (derivatives or {}).get("sizes") or {}
+    entries = [available[name] for name in DERIVATIVE_SIZES if available.get(name)]
+    if not entries:
+        # Derivatives are built by a background job; until then serve the original.
+        return format_html(
+            '<img class="{}" src="{}" alt="{}" {} decoding="async" />',
+            css_class,
+            field_file.url,
+            alt,
+            loading,
+        )
+
+    main = available.get(size) or entries[-1]
+    attrs = format_html_join(
+        " ",
+        '{}="{}"',
+        (
+            ("class", css_class),
+            ("src", default_storage.url(main["jpeg"])),
+            ("srcset", _srcset(entries, "jpeg")),
+            ("sizes", sizes),
+            ("width", main["w"]),
+            ("height", main["h"]),
+            ("alt", alt),
+        ),
+    )
+    webp = _srcset(entries, "webp")
+    if not webp:
+        return format_html("<img {} {} decoding=\"async\" />", attrs, loading)
+    # display:contents keeps <picture> out of layout, so the <img> classes behave as before.
+    return format_html(
+        '<picture style="display: contents"><source type="image/webp" srcset="{}" sizes="{}" />'
+        '<img {} {} decoding="async" /></picture>',
+        webp,
+        sizes,
+        attrs,
+        loading,
+    )
@@ -8,12 +8,15 @@ from django.contrib.auth.views import LoginView, LogoutView
 from django.core.mail import send_mail
 from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 
 from django.contrib.auth.decorators import login_required
 from django.http import Http404
 from django.utils import timezone
 
+from .conditional import conditional_view, notifications_version
 from .email_verification import send_verification_code, verify_code
+from .fields import email_blind_index
 from .forms import (
     AccountSettingsForm,
     EmailVerificationForm,
@@ -25,14 +28,27 @@ from .forms import (
     RegisterForm,
 )
 from .models import EmailVerification, UserNotification
+from .ratelimit import check, rate_limit, too_many_requests
 
 from .password_reset import send_password_reset_code, verify_password_reset_code
 
 
+@method_decorator(rate_limit("login", keys=("ip",)), name="post")
 class SignInView(LoginView):
     template_name = "accounts/login.html"
     authentication_form = LoginForm
 
+    def post(self, request, *args, **kwargs):
+        # Only failed attempts count against a username, so its owner's own logins never lock it.
+        result = check(request, "login_username", keys=("post:username",), consume=False)
+        if not result.allowed:
+            return too_many_requests(result)
+        return super().post(request, *args, **kwargs)
+
+    def form_invalid(self, form):
+        check(self.request, "login_username", keys=("post:username",))
+        return super().form_invalid(form)
+
     def form_valid(self, form):
         response = super().form_valid(form)
         if self.request.user.is_authenticated and not getattr(self.request.user, "email_verified", False):
@@ -48,6 +64,7 @@ class SignOutView(LogoutView):
     next_page = reverse_lazy("landing")
 
 
+@rate_limit("forgot_username", keys=("ip", "post:email"))
 def forgot_username(request):
     if request.method == "POST":
         form = ForgotUsernameForm(request.POST)
@@ -55,7 +72,7 @@ def forgot_username(request):
             email = (form.cleaned_data.get("email") or "").strip().lower()
 
             UserModel = get_user_model()
-            user = UserModel.objects.filter(email__iexact=email, is_active=True).first()
+            user = UserModel.objects.filter(email_bidx=email_blind_index(email), is_active=True).first()
             if user is not None:
                 subject = "Ваш логин на сайте «Всё Всерьёз»"
                 message = (
@@ -82,6 +99,7 @@ def forgot_username(request):
     return render(request, "accounts/forgot_username.html", {"form": form})
 
 
+@rate_limit("password_reset", keys=("ip", "post:email"))
 def password_reset_request(request):
     if request.method == "POST":
         form = PasswordResetRequestForm(request.POST)
@@ -90,7 +108,7 @@ def password_reset_request(request):
             request.session["password_reset_email"] = email
 
             UserModel = get_user_model()
-            user = UserModel.objects.filter(email__iexact=email, is_active=True).first()
+            user = UserModel.objects.filter(email_bidx=email_blind_index(email), is_active=True).first()
             if user is not None:
                 ok, reason = send_password_reset_code(user, force=False)
                 if not ok:
@@ -119,6 +137,7 @@ def password_reset_request(request):
     return render(request, "accounts/password_reset_request.html", {"form": form})
 
 
+@rate_limit("password_reset_code", keys=("ip", "session:password_reset_email"))
 def password_reset_code(request):
     email = (request.session.get("password_reset_email") or "").strip()
     if not email:
@@ -128,7 +147,7 @@ def password_reset_code(request):
         form = PasswordResetCodeConfirmForm(request.POST)
         if form.is_valid():
             UserModel = get_user_model()
-            user = UserModel.objects.filter(email__iexact=email, is_active=True).first()
+            user = UserModel.objects.filter(email_bidx=email_blind_index(email), is_active=True).first()
             if user is None:
                 form.add_error("code", "Неверный код или он истёк.")
             else:
@@ -235,7 +254,14 @@ def password_change(request):
     return render(request, "accounts/password_change.html", {"form": form})
 
 
+def _notifications_page_version(request) -> str:
+    # The page header also carries the unread counters and the profile's theme.
+    profile = getattr(request.user, "profile", None)
+    return f"{notifications_version(request.user)}:{getattr(profile, 'updated_at', None)}"
+
+
 @login_required
+@conditional_view(_notifications_page_version)
 def notifications_list(request):
     qs = UserNotification.objects.filter(recipient=request.user, is_read=False).order_by("-created_at")
     return render(request, "accounts/notifications.html", {"notifications": qs[:200]})
@@ -340,6 +366,7 @@ def register(request):
 
 
 @login_required
+@rate_limit("verify_email", keys=("user",))
 def verify_email_view(request):
     if request.user.email_verified:
         next_url = request.session.pop("post_verify_next", None)
@@ -389,6 +416,7 @@ def verify_email_view(request):
 
 
 @login_required
+@rate_limit("verify_email_resend", keys=("user",))
 def resend_verification(request):
     if request.method != "POST":
         raise Http404
@@ -13,6 +13,9 @@ class Message(models.Model):
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="message_created_id_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Message({self.match_id},{self.sender_id})"
@@ -1,9 +1,10 @@
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
+from django.db.models import Count, Max, Q
 from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 
+from accounts.conditional import conditional_view
 from matchmaking.models import Match
 from matchmaking.models import UserBan, UserBlock
 
@@ -110,7 +111,7 @@ def inbox(request):
 
         other_avatar_url = None
         if other_profile is not None and other_profile.avatar:
-            other_avatar_url = other_profile.avatar.url
+            other_avatar_url = other_profile.avatar_thumb_url
 
         last_message = m.messages.order_by("-created_at").first()
         last_message_text = ""
@@ -125,6 +126,7 @@ def inbox(request):
                 "other": other,
                 "other_name": other_name,
                 "other_avatar_url": other_avatar_url,
+                "other_profile": other_profile,
                 "last_message_text": last_message_text,
                 "last_message_time": last_message_time,
             }
@@ -166,7 +168,30 @@ def room(request, match_id: int):
     )
 
 
+def _messages_version(request, match_id: int) -> str | None:
+    # New or deleted messages move last/total; read receipts on my messages move unread.
+    # Only for participants: anyone else gets the view (and its 404), never a 304.
+    user = request.user
+    member = Q(user1=user) | Q(user2=user)
+    if user.is_superuser:
+        member |= Q(is_admin_chat=True)
+    state = (
+        Match.objects.filter(member, id=match_id)
+        .annotate(
+            last=Max("messages__id"),
+            total=Count("messages"),
+            unread=Count("messages", filter=Q(messages__sender=user, messages__read_at__isnull=True)),
+        )
+        .values("last", "total", "unread")
+        .first()
+    )
+    if state is None:
+        return None
+    return f"{state['last']}:{state['total']}:{state['unread']}"
+
+
 @login_required
+@conditional_view(_messages_version)
 def messages_partial(request, match_id: int):
     match = get_object_or_404(Match, id=match_id)
 
@@ -0,0 +1,452 @@
+"""Cache backends.
+
+``TieredCache`` (the "default" alias) keeps a small in-process LRU in front
+of the backend shared by every gunicorn worker and the job workers
+(``CACHES["shared"]``: ``FileCache`` on a shared volume, or Redis). Reads
+are served locally for at most ``LOCAL_TIMEOUT`` seconds, so another
+process sees a write or a delete with that much delay at most; the process
+that writes sees it at once.
+
+On top of the Django cache API it adds:
+
+* namespaces: ``ns_key(namespace, key)`` embeds the namespace's current
+  version in the key and ``invalidate_namespace(namespace)`` replaces the
+  version, dropping every key of the namespace with one write;
+* single-flight ``get_or_set``: on a miss one caller computes the value
+  while the others (threads of this process, and other processes through
+  an ``add()`` lock in the shared backend) wait for it;
+* ``count(key, timeout)``: atomic +1 of a counter in one operation of the
+  shared backend (rate limiter windows);
+* ``update(key, func)``: atomic read-modify-write;
+* ``stats()``: per-process hit/miss counters.
+"""
+
+from __future__ import annotations
+
+import os
+import pickle
+import random
+import secrets
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.redis import RedisCache as DjangoRedisCache
+from django.core.files import locks
+
+_MISSING = object()
+
+
+class FileCache(FileBasedCache):
+    """FileBasedCache with an atomic ``add()`` and a cheap cull.
+
+    The stock backend lists the whole directory on every ``set()`` and its
+    ``add()`` is a check-then-set race. Here ``add()`` publishes the file
+    with ``os.link``, which fails when the name exists, so it can serve as
+    a cross-process lock; the directory is scanned at most once per
+    ``CULL_INTERVAL`` seconds, dropping expired files before random ones.
+    ``update()`` is an atomic read-modify-write under an exclusive lock, and
+    ``count()`` an increment built on it.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        options = params.get("OPTIONS", {})
+        self._cull_interval = float(options.get("CULL_INTERVAL", 60))
+        self._next_cull = 0.0
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if self.has_key(key, version):  # also removes an expired file
+            return False
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, "wb") as f:
+                self._write_content(f, timeout, value)
+            try:
+                os.link(tmp_path, fname)
+            except FileExistsError:
+                return False
+            return True
+        finally:
+            os.remove(tmp_path)
+
+    def update(self, key, func, timeout=DEFAULT_TIMEOUT, version=None):
+        """Replace the value with ``func(current value or None) -> (new value, result)``; returns result.
+
+        The current file is locked while ``func`` runs and the new one is
+        renamed over it, so readers never see a partial write. A waiter that
+        wakes up on a replaced (unlinked) file retries on the new one.
+        """
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        while True:
+            with open(os.open(fname, os.O_RDWR | os.O_CREAT, 0o600), "r+b") as f:
+                locks.lock(f, locks.LOCK_EX)
+                try:
+                    if os.fstat(f.fileno()).st_nlink == 0:
+                        continue
+                    current = None
+                    try:
+                        expiry = pickle.load(f)
+                        if expiry is None or expiry >= time.time():
+                            current = pickle.loads(zlib.decompress(f.read()))
+                    except (EOFError, pickle.UnpicklingError, zlib.error):
+                        pass  # freshly created (empty) file
+                    value, result = func(current)
+                    fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+                    try:
+                        with open(fd, "wb") as tmp:
+                            self._write_content(tmp, timeout, value)
+                        os.replace(tmp_path, fname)
+                    except BaseException:
+                        os.remove(tmp_path)
+                        raise
+                    return result
+                finally:
+                    locks.unlock(f)
+
+    def count(self, key, timeout=DEFAULT_TIMEOUT, version=None) -> int:
+        """Add 1 to the counter ``key`` (created at 1) and return it; the expiry is reset to ``timeout``."""
+        return self.update(key, lambda current: ((current or 0) + 1,) * 2, timeout, version=version)
+
+    def _cull(self):
+        now = time.monotonic()
+        if now < self._next_cull:
+            return
+        self._next_cull = now + self._cull_interval
+        filelist = self._list_cache_files()
+        if len(filelist) < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+        alive = []
+        for fname in filelist:
+            try:
+                with open(fname, "rb") as f:
+                    if not self._is_expired(f):
+                        alive.append(fname)
+            except FileNotFoundError:
+                pass
+        if len(alive) >= self._max_entries:
+            for fname in random.sample(alive, len(alive) // self._cull_frequency):
+                self._delete(fname)
+
+
+class RedisCache(DjangoRedisCache):
+    """Django's RedisCache plus ``count()`` as one server-side script."""
+
+    # INCR creates the key at 1; the first increment of a window sets its expiry.
+    _COUNT_SCRIPT = """
+local n = redis.call('INCR', KEYS[1])
+if n == 1 and tonumber(ARGV[1]) > 0 then redis.call('EXPIRE', KEYS[1], ARGV[1]) end
+return n
+"""
+
+    def count(self, key, timeout=DEFAULT_TIMEOUT, version=None) -> int:
+        """Add 1 to the counter ``key`` (created at 1, expiring after ``timeout``) and return it."""
+        key = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+        timeout = -1 if timeout is None else max(1, int(timeout))
+        client = self._cache.get_client(key, write=True)
+        return int(client.eval(self._COUNT_SCRIPT, 1, key, timeout))
+
+
+class TieredCache(BaseCache):
+    """In-process LRU in front of ``caches[OPTIONS["SHARED"]]``.
+
+    OPTIONS: ``SHARED`` (alias of the shared backend, default "shared"),
+    ``LOCAL_MAX_ENTRIES`` (LRU size, default 1024), ``LOCAL_TIMEOUT``
+    (seconds a value is served locally, default 5), ``LOCK_TIMEOUT``
+    (seconds a single-flight computation may hold its lock, default 30).
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._shared_alias = options.get("SHARED", "shared")
+        self._local_max_entries = int(options.get("LOCAL_MAX_ENTRIES", 1024))
+        self._local_timeout = float(options.get("LOCAL_TIMEOUT", 5))
+        self._lock_timeout = int(options.get("LOCK_TIMEOUT", 30))
+        # key -> (monotonic expiry, pickled value); pickled so callers cannot mutate cached objects.
+        self._local: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights: dict[str, list] = {}
+        self._stats: Counter = Counter()
+
+    @property
+    def shared(self) -> BaseCache:
+        return caches[self._shared_alias]
+
+    # --- Local tier ------------------------------------------------------------------------------
+
+    def _local_get(self, key: str):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return _MISSING
+            expires, data = entry
+            if expires < time.monotonic():
+                del self._local[key]
+                return _MISSING
+            self._local.move_to_end(key)
+        return pickle.loads(data)
+
+    def _local_set(self, key: str, value, timeout=DEFAULT_TIMEOUT) -> None:
+        ttl = self._local_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            ttl = min(ttl, timeout)
+        if ttl <= 0 or self._local_max_entries <= 0:
+            self._local_discard(key)
+            return
+        data = pickle.dumps(value, self.pickle_protocol)
+        with self._lock:
+            self._local[key] = (time.monotonic() + ttl, data)
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _local_discard(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    # --- Cache API -------------------------------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._local_get(local_key)
+        if value is not _MISSING:
+            self._stats["local_hits"] += 1
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self._stats["misses"] += 1
+            return default
+        self._stats["shared_hits"] += 1
+        self._local_set(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote = []
+        for key in keys:
+            value = self._local_get(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        self._stats["local_hits"] += len(found)
+        if remote:
+            fetched = self.shared.get_many(remote, version=version)
+            self._stats["shared_hits"] += len(fetched)
+            self._stats["misses"] += len(remote) - len(fetched)
+            for key, value in fetched.items():
+                self._local_set(self.make_and_validate_key(key, version=version), value)
+            found.update(fetched)
+        return found
+
+    def has_key(self, key, version=None):
+        if self._local_get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.shared.set(key, value, timeout, version=version)
+        self._stats["sets"] += 1
+        self._local_set(local_key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version) or []
+        self._stats["sets"] += len(data) - len(failed)
+        for key, value in data.items():
+            local_key = self.make_and_validate_key(key, version=version)
+            if key in failed:
+                self._local_discard(local_key)
+            else:
+                self._local_set(local_key, value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        if not self.shared.add(key, value, timeout, version=version):
+            # Another process holds a (possibly different) value; do not serve ours.
+            self._local_discard(local_key)
+            return False
+        self._stats["sets"] += 1
+        self._local_set(local_key, value, timeout)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local_discard(self.make_and_validate_key(key, version=version))
+        self._stats["deletes"] += 1
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self._local_discard(*(self.make_and_validate_key(key, version=version) for key in keys))
+        self._stats["deletes"] += len(keys)
+        self.shared.delete_many(keys, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_discard(self.make_and_validate_key(key, version=version))
+        return self.shared.incr(key, delta, version=version)
+
+    def count(self, key, timeout=DEFAULT_TIMEOUT, version=None) -> int:
+        """Atomic +1 of the counter ``key`` in the shared tier (created at 1); returns the new value.
+
+        One operation of the shared backend (a script on Redis, a locked
+        rewrite of one file for ``FileCache``). Never served from the local tier.
+        """
+        self._local_discard(self.make_and_validate_key(key, version=version))
+        shared = self.shared
+        if hasattr(shared, "count"):
+            return shared.count(key, timeout, version=version)
+        try:
+            return shared.incr(key, version=version)
+        except ValueError:
+            if shared.add(key, 1, timeout, version=version):
+                return 1
+            return shared.incr(key, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def update(self, key, func, timeout=DEFAULT_TIMEOUT, version=None):
+        """Atomic ``func(current or None) -> (new value, result)`` in the shared tier; returns result.
+
+        Never served from the local tier. Backends without a native
+        ``update()`` (Redis) are serialized through an ``add()`` lock: several
+        round trips, and waiters spin until the lock expires if its holder
+        dies. Counters should use ``count()``.
+        """
+        self._local_discard(self.make_and_validate_key(key, version=version))
+        shared = self.shared
+        if hasattr(shared, "update"):
+            return shared.update(key, func, timeout, version=version)
+        lock_key = f"lock:{key}"
+        deadline = time.monotonic() + self._lock_timeout
+        while not shared.add(lock_key, 1, self._lock_timeout, version=version):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"cache lock {key!r} is held for more than {self._lock_timeout}s")
+            time.sleep(0.005)
+        try:
+            value, result = func(shared.get(key, version=version))
+            shared.set(key, value, timeout, version=version)
+            return result
+        finally:
+            shared.delete(lock_key, version=version)
+
+    # --- Single flight ---------------------------------------------------------------------------
+
+    @contextmanager
+    def _flight(self, key: str):
+        with self._lock:
+            entry = self._flights.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._flights[key]
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """Cached value of ``key``, computing ``default()`` in one caller only on a miss.
+
+        Threads of this process queue on a per-key lock; other processes
+        find the shared ``add()`` lock taken and poll for the value until
+        LOCK_TIMEOUT, then compute it themselves.
+        """
+        value = self.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+        local_key = self.make_and_validate_key(key, version=version)
+        with self._flight(local_key):
+            value = self.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                self._stats["flight_waits"] += 1
+                return value
+            lock_key = f"lock:{key}"
+            locked = self.shared.add(lock_key, 1, self._lock_timeout, version=version)
+            if not locked:
+                self._stats["flight_waits"] += 1
+                value = self._wait_for(key, version)
+                if value is not _MISSING:
+                    return value
+            try:
+                self._stats["flight_computes"] += 1
+                value = default() if callable(default) else default
+                if value is not None:
+                    self.set(key, value, timeout, version=version)
+                return value
+            finally:
+                if locked:
+                    self.shared.delete(lock_key, version=version)
+
+    def _wait_for(self, key, version):
+        deadline = time.monotonic() + self._lock_timeout
+        delay = 0.05
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            value = self.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                return value
+            if not self.shared.has_key(f"lock:{key}", version=version):
+                break  # the computing process gave up or died
+            delay = min(delay * 2, 0.5)
+        return _MISSING
+
+    # --- Namespaces ------------------------------------------------------------------------------
+
+    def namespace_version(self, namespace: str) -> str:
+        version_key = f"ns:{namespace}"
+        current = self.get(version_key)
+        if current is None:
+            current = secrets.token_hex(4)
+            if not self.add(version_key, current, None):
+                current = self.get(version_key) or current
+        return current
+
+    def ns_key(self, namespace: str, key) -> str:
+        """``key`` inside ``namespace``; stops matching once the namespace is invalidated."""
+        return f"{namespace}:{self.namespace_version(namespace)}:{key}"
+
+    def invalidate_namespace(self, namespace: str) -> None:
+        # A fresh random version rather than incr(): any write invalidates, even a lost race.
+        self.set(f"ns:{namespace}", secrets.token_hex(4), None)
+
+    # --- Stats -----------------------------------------------------------------------------------
+
+    def stats(self) -> dict:
+        """Counters of this process since start (or ``reset_stats()``)."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["local_entries"] = len(self._local)
+        for name in ("local_hits", "shared_hits", "misses", "sets", "deletes", "evictions"):
+            stats.setdefault(name, 0)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["local_hits"] + stats["shared_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
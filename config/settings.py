@@ -4,7 +4,7 @@ from pathlib import Path
 
 import dj_database_url
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
 
 
 
@@ -20,7 +20,19 @@ SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY", "django-insecure-change-me-for-
 
 FERNET_KEY = os.environ.get("DJANGO_FERNET_KEY", Fernet.generate_key().decode())
 
-FERNET = Fernet(FERNET_KEY.encode())
+# Previous keys, comma-separated: still accepted for decryption until `manage.py reencrypt_data --rotate`
+
+FERNET_OLD_KEYS = [k.strip() for k in os.environ.get("DJANGO_FERNET_OLD_KEYS", "").split(",") if k.strip()]
+
+FERNET = MultiFernet([Fernet(k.encode()) for k in [FERNET_KEY, *FERNET_OLD_KEYS]])
+
+# HMAC key of blind indexes (User.email_bidx); kept apart from the Fernet keys so their rotation leaves the index valid
+
+BLIND_INDEX_KEY = os.environ.get("DJANGO_BLIND_INDEX_KEY", SECRET_KEY)
+
+# Bounded per-process LRU of decrypted EncryptedEmailField/EncryptedJSONField values
+
+ENCRYPTED_FIELD_CACHE_SIZE = int(os.environ.get("DJANGO_ENCRYPTED_FIELD_CACHE_SIZE", "4096"))
 
 DEBUG = os.environ.get("DJANGO_DEBUG", "true").lower() == "true"
 
@@ -54,8 +66,6 @@ INSTALLED_APPS = [
 
     "django.contrib.staticfiles",
 
-    "django.contrib.sitemaps",
-
     "accounts.apps.AccountsConfig",
 
     "profiles.apps.ProfilesConfig",
@@ -66,6 +76,8 @@ INSTALLED_APPS = [
 
     "panel.apps.PanelConfig",
 
+    "jobs.apps.JobsConfig",
+
 ]
 
 
@@ -76,6 +88,8 @@ MIDDLEWARE = [
 
     "whitenoise.middleware.WhiteNoiseMiddleware",
 
+    "accounts.db_optimization.DatabaseOptimizationMiddleware",
+
     "django.contrib.sessions.middleware.SessionMiddleware",
 
     "django.middleware.common.CommonMiddleware",
@@ -166,6 +180,57 @@ if os.environ.get("DATABASE_URL"):
 
 
 
+# Cache shared by all web and job workers ("shared"), fronted by a small per-process LRU ("default", see config/cache.py).
+# DJANGO_CACHE_URL=redis://host:6379/0 uses Redis (requires the redis package); otherwise files in CACHE_DIR.
+
+CACHE_URL = os.environ.get("DJANGO_CACHE_URL", "").strip()
+
+CACHE_DIR = Path(os.environ.get("DJANGO_CACHE_DIR", BASE_DIR / "cache"))
+
+CACHES = {
+
+    "default": {
+
+        "BACKEND": "config.cache.TieredCache",
+
+        "TIMEOUT": 300,
+
+        "OPTIONS": {
+
+            "SHARED": "shared",
+
+            "LOCAL_MAX_ENTRIES": int(os.environ.get("DJANGO_CACHE_LOCAL_MAX_ENTRIES", "2048")),
+
+            "LOCAL_TIMEOUT": float(os.environ.get("DJANGO_CACHE_LOCAL_TIMEOUT", "5")),
+
+        },
+
+    },
+
+    "shared": (
+
+        {"BACKEND": "config.cache.RedisCache", "LOCATION": CACHE_URL}
+
+        if CACHE_URL
+
+        else {
+
+            "BACKEND": "config.cache.FileCache",
+
+            "LOCATION": str(CACHE_DIR),
+
+            "TIMEOUT": 300,
+
+            "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("DJANGO_CACHE_MAX_ENTRIES", "50000"))},
+
+        }
+
+    ),
+
+}
+
+
+
 AUTH_PASSWORD_VALIDATORS = [
 
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -257,6 +322,118 @@ EMAIL_VERIFICATION_MAX_ATTEMPTS = int(os.environ.get("EMAIL_VERIFICATION_MAX_ATT
 EMAIL_VERIFICATION_MAX_SENDS = int(os.environ.get("EMAIL_VERIFICATION_MAX_SENDS", "20"))
 
 
+# Profile access audit log: events are buffered in-process and written in batches.
+
+PROFILE_ACCESS_LOG_ASYNC = os.environ.get("PROFILE_ACCESS_LOG_ASYNC", "1").strip() not in ("0", "false", "False")
+
+PROFILE_ACCESS_LOG_BATCH_SIZE = int(os.environ.get("PROFILE_ACCESS_LOG_BATCH_SIZE", "200"))
+
+PROFILE_ACCESS_LOG_FLUSH_INTERVAL_SECONDS = float(os.environ.get("PROFILE_ACCESS_LOG_FLUSH_INTERVAL_SECONDS", "2"))
+
+PROFILE_ACCESS_LOG_MAX_PENDING = int(os.environ.get("PROFILE_ACCESS_LOG_MAX_PENDING", "50000"))
+
+PROFILE_ACCESS_LOG_SPILL_DIR = os.environ.get("PROFILE_ACCESS_LOG_SPILL_DIR", "").strip()
+
+PROFILE_ACCESS_LOG_RETENTION_DAYS = int(os.environ.get("PROFILE_ACCESS_LOG_RETENTION_DAYS", "90"))
+
+PROFILE_ACCESS_LOG_ARCHIVE_DIR = os.environ.get("PROFILE_ACCESS_LOG_ARCHIVE_DIR", str(BASE_DIR / "archive" / "profile_access"))
+
+
+# Background jobs (jobs app): stored in the database and executed by `manage.py run_workers`.
+# JOBS_EAGER runs handlers inline after commit, for development without a worker.
+
+JOBS_EAGER = os.environ.get("DJANGO_JOBS_EAGER", "0").strip().lower() in ("1", "true", "yes")
+
+JOBS_CONCURRENCY = int(os.environ.get("DJANGO_JOBS_CONCURRENCY", "2"))
+
+JOBS_POLL_INTERVAL_SECONDS = float(os.environ.get("DJANGO_JOBS_POLL_INTERVAL_SECONDS", "1"))
+
+JOBS_VISIBILITY_TIMEOUT_SECONDS = int(os.environ.get("DJANGO_JOBS_VISIBILITY_TIMEOUT_SECONDS", "300"))
+
+JOBS_MAX_ATTEMPTS = int(os.environ.get("DJANGO_JOBS_MAX_ATTEMPTS", "5"))
+
+JOBS_RETRY_BACKOFF_SECONDS = float(os.environ.get("DJANGO_JOBS_RETRY_BACKOFF_SECONDS", "10"))
+
+JOBS_RETRY_BACKOFF_MAX_SECONDS = float(os.environ.get("DJANGO_JOBS_RETRY_BACKOFF_MAX_SECONDS", "3600"))
+
+JOBS_KEEP_DONE_DAYS = int(os.environ.get("DJANGO_JOBS_KEEP_DONE_DAYS", "7"))
+
+# Sitemaps are pre-rendered into MEDIA_ROOT/sitemaps/ (see config/sitemaps.py); locations use SITE_URL.
+
+SITE_URL = os.environ.get("DJANGO_SITE_URL", "https://vsevseryoz.ru").rstrip("/")
+
+# User ids per profile sitemap file (the protocol allows at most 50000 URLs per file)
+
+SITEMAP_BUCKET_SIZE = min(50000, int(os.environ.get("DJANGO_SITEMAP_BUCKET_SIZE", "10000")))
+
+# Profile changes re-render their file after this delay, so bursts of saves coalesce into one job
+
+SITEMAP_REFRESH_DELAY_SECONDS = int(os.environ.get("DJANGO_SITEMAP_REFRESH_DELAY_SECONDS", "60"))
+
+# Full rebuild interval (catches bans that expire and anything the signals miss)
+
+SITEMAP_REBUILD_INTERVAL_SECONDS = int(os.environ.get("DJANGO_SITEMAP_REBUILD_INTERVAL_SECONDS", "21600"))
+
+# Landing page: rendered CMS fragment lifetime (versioned by HomePage.updated_at) and browser max-age for anonymous visitors
+
+LANDING_FRAGMENT_CACHE_SECONDS = int(os.environ.get("DJANGO_LANDING_FRAGMENT_CACHE_SECONDS", "86400"))
+
+LANDING_CACHE_SECONDS = int(os.environ.get("DJANGO_LANDING_CACHE_SECONDS", "300"))
+
+# Panel dashboard counters: cached snapshot, recomputed in the background once older than this.
+
+PANEL_METRICS_TTL_SECONDS = int(os.environ.get("DJANGO_PANEL_METRICS_TTL_SECONDS", "60"))
+
+# Per-user activity counters in the panel; invalidated by signals on swipes, matches, messages, blocks, reports and bans.
+
+PANEL_USER_ACTIVITY_TTL_SECONDS = int(os.environ.get("DJANGO_PANEL_USER_ACTIVITY_TTL_SECONDS", "300"))
+
+# Fixed-window rate limits (accounts/ratelimit.py): "<requests>/<seconds>" per scope, windows aligned to the epoch.
+# DJANGO_RATE_LIMITS="login=20/300,swipe=60/60" overrides single scopes.
+
+RATE_LIMIT_ENABLED = os.environ.get("DJANGO_RATE_LIMIT_ENABLED", "true").lower() == "true"
+
+RATE_LIMITS = {
+
+    "login": "10/300",  # per IP
+
+    "login_username": "10/300",  # per username: failed attempts only
+
+    "verify_email": "10/600",  # per user: code entry
+
+    "verify_email_resend": "5/600",  # per user: code e-mails
+
+    "password_reset": "5/900",  # per IP and per email: code requests
+
+    "password_reset_code": "10/900",  # per IP and per email being reset: code entry
+
+    "forgot_username": "5/900",  # per IP and per email
+
+    "swipe": "120/60",  # per user
+
+}
+
+RATE_LIMITS.update(
+
+    item.strip().split("=", 1) for item in os.environ.get("DJANGO_RATE_LIMITS", "").split(",") if "=" in item
+
+)
+
+# Request profiling (accounts/db_optimization.py): share of requests sampled; 0 removes the middleware.
+
+PROFILING_SAMPLE_RATE = float(os.environ.get("DJANGO_PROFILING_SAMPLE_RATE", "0.01"))
+
+# The same statement this many times in one request is reported as an N+1 loop.
+
+PROFILING_DUPLICATE_THRESHOLD = int(os.environ.get("DJANGO_PROFILING_DUPLICATE_THRESHOLD", "5"))
+
+PROFILING_FLUSH_SECONDS = int(os.environ.get("DJANGO_PROFILING_FLUSH_SECONDS", "15"))
+
+# Bearer token for Prometheus scrapes of /panel/metrics/ (staff sessions need none); empty allows staff only.
+
+PROFILING_METRICS_TOKEN = os.environ.get("DJANGO_PROFILING_METRICS_TOKEN", "")
+
+
 
 LOGGING = {
 
@@ -1,33 +1,238 @@
-from django.contrib.sitemaps import Sitemap
+"""Pre-rendered sitemaps.
+
+Crawlers fetch ``/sitemap.xml`` and ``/sitemaps/*.xml`` as plain files from
+MEDIA_ROOT/sitemaps/ (Caddy serves them; ``sitemap_file`` is the fallback),
+so they never reach the database. Public profiles are split into files by
+user id range, ``SITEMAP_BUCKET_SIZE`` ids each: a profile change re-renders
+only its own file (``profiles.sitemap_bucket`` job) and a periodic job
+rebuilds everything.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.http import FileResponse, Http404
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 
+from jobs.queue import enqueue
+from matchmaking.models import UserBan
 from profiles.models import Profile
 
+INDEX_NAME = "sitemap.xml"
+STATIC_NAME = "sitemap-static.xml"
+_BUCKET_NAME = re.compile(r"^sitemap-profiles-(\d+)\.xml$")
+
+_XMLNS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+
+def sitemap_dir() -> Path:
+    return Path(settings.MEDIA_ROOT) / "sitemaps"
+
+
+def bucket_name(bucket: int) -> str:
+    return f"sitemap-profiles-{bucket}.xml"
+
+
+def bucket_of(user_id: int) -> int:
+    return int(user_id) // settings.SITEMAP_BUCKET_SIZE
+
+
+def _absolute(path: str) -> str:
+    return settings.SITE_URL + path
+
+
+def _w3c(dt: datetime) -> str:
+    return dt.astimezone(dt_timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def _write(name: str, content: str) -> bool:
+    """Atomically replace ``name`` with ``content``; returns False when it is already identical.
+
+    Unchanged files keep their mtime, so ETag/Last-Modified (and lastmod in
+    the index) only move when the content really changes.
+    """
+    path = sitemap_dir() / name
+    data = content.encode("utf-8")
+    try:
+        if path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".sitemap-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return True
+
 
-class StaticViewSitemap(Sitemap):
-    changefreq = "daily"
-    priority = 1.0
+def _urlset(entries) -> str:
+    """``entries``: (location path, lastmod datetime or None, changefreq, priority)."""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', f"<urlset {_XMLNS}>"]
+    for location, lastmod, changefreq, priority in entries:
+        lines.append("<url>")
+        lines.append(f"<loc>{escape(_absolute(location))}</loc>")
+        if lastmod is not None:
+            lines.append(f"<lastmod>{_w3c(lastmod)}</lastmod>")
+        lines.append(f"<changefreq>{changefreq}</changefreq>")
+        lines.append(f"<priority>{priority}</priority>")
+        lines.append("</url>")
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
 
-    def items(self):
-        return ["landing"]
 
-    def location(self, item):
-        return reverse(item)
+def public_profiles():
+    """Profiles whose public page answers 200: active, not banned."""
+    return (
+        Profile.objects.filter(user__is_active=True)
+        .exclude(Exists(UserBan.objects.active().filter(user=OuterRef("user"))))
+        .order_by("user_id")
+        .values_list("user_id", "updated_at")
+    )
 
 
-class PublicProfilesSitemap(Sitemap):
-    changefreq = "weekly"
-    priority = 0.6
+def _profile_entries(rows):
+    for user_id, updated_at in rows:
+        yield reverse("public_profile", args=[user_id]), updated_at, "weekly", "0.6"
 
-    def items(self):
-        return (
-            Profile.objects.select_related("user")
-            .filter(user__is_active=True)
-            .order_by("-updated_at")
+
+def write_static() -> bool:
+    return _write(STATIC_NAME, _urlset([(reverse("landing"), None, "daily", "1.0")]))
+
+
+def write_bucket(bucket: int) -> bool:
+    """Re-render one profile file from an indexed user_id range scan; drops it when empty."""
+    size = settings.SITEMAP_BUCKET_SIZE
+    rows = list(public_profiles().filter(user_id__gte=bucket * size, user_id__lt=(bucket + 1) * size))
+    if not rows:
+        try:
+            (sitemap_dir() / bucket_name(bucket)).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+    return _write(bucket_name(bucket), _urlset(_profile_entries(rows)))
+
+
+def write_index() -> bool:
+    """Index of the files on disk, each with its mtime as lastmod (no database access)."""
+    directory = sitemap_dir()
+    names = [STATIC_NAME] if (directory / STATIC_NAME).exists() else []
+    buckets = []
+    if directory.exists():
+        for entry in os.scandir(directory):
+            match = _BUCKET_NAME.match(entry.name)
+            if match:
+                buckets.append(int(match.group(1)))
+    names += [bucket_name(b) for b in sorted(buckets)]
+
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', f"<sitemapindex {_XMLNS}>"]
+    for name in names:
+        mtime = datetime.fromtimestamp((directory / name).stat().st_mtime, tz=dt_timezone.utc)
+        lines.append("<sitemap>")
+        lines.append(f"<loc>{escape(_absolute(reverse('sitemap_file', args=[name])))}</loc>")
+        lines.append(f"<lastmod>{_w3c(mtime)}</lastmod>")
+        lines.append("</sitemap>")
+    lines.append("</sitemapindex>")
+    return _write(INDEX_NAME, "\n".join(lines) + "\n")
+
+
+def refresh_buckets(buckets) -> None:
+    changed = [write_bucket(b) for b in sorted(set(buckets))]
+    if any(changed) or not (sitemap_dir() / INDEX_NAME).exists():
+        write_index()
+
+
+def build_all(*, chunk_size: int = 5000) -> dict:
+    """Render every file with one keyset-paged pass over public profiles."""
+    size = settings.SITEMAP_BUCKET_SIZE
+    stats = {"files": 0, "written": 0, "urls": 1}
+    stats["written"] += write_static()
+
+    qs = public_profiles()
+    seen = set()
+    current, rows = None, []
+
+    def flush():
+        if rows:
+            stats["files"] += 1
+            stats["urls"] += len(rows)
+            stats["written"] += _write(bucket_name(current), _urlset(_profile_entries(rows)))
+            seen.add(current)
+
+    last_user_id = -1
+    while True:
+        chunk = list(qs.filter(user_id__gt=last_user_id)[:chunk_size])
+        for user_id, updated_at in chunk:
+            bucket = user_id // size
+            if bucket != current:
+                flush()
+                current, rows = bucket, []
+            rows.append((user_id, updated_at))
+        if len(chunk) < chunk_size:
+            break
+        last_user_id = chunk[-1][0]
+    flush()
+
+    directory = sitemap_dir()
+    if directory.exists():
+        for entry in os.scandir(directory):
+            match = _BUCKET_NAME.match(entry.name)
+            if match and int(match.group(1)) not in seen:
+                os.unlink(entry.path)
+                stats["written"] += 1
+    write_index()
+    return stats
+
+
+def schedule_refresh(*user_ids) -> None:
+    """Queue a re-render of the files holding ``user_ids``, coalesced per file."""
+    for bucket in {bucket_of(pk) for pk in user_ids if pk}:
+        enqueue(
+            "profiles.sitemap_bucket",
+            {"bucket": bucket},
+            key=f"sitemap-bucket:{bucket}",
+            delay=settings.SITEMAP_REFRESH_DELAY_SECONDS,
         )
 
-    def location(self, obj: Profile):
-        return reverse("public_profile", args=[obj.user_id])
 
-    def lastmod(self, obj: Profile):
-        return obj.updated_at
+def schedule_rebuild(delay: float | None = None) -> None:
+    if delay is None:
+        delay = settings.SITEMAP_REBUILD_INTERVAL_SECONDS
+    enqueue("profiles.sitemap_rebuild", key="sitemap-rebuild", delay=delay)
+
+
+def sitemap_file(request, name: str = INDEX_NAME):
+    """Serve a pre-rendered file with ETag/Last-Modified when Caddy is not in front (development)."""
+    if name != INDEX_NAME and name != STATIC_NAME and not _BUCKET_NAME.match(name):
+        raise Http404
+    path = sitemap_dir() / name
+    if not path.exists():
+        if name != INDEX_NAME:
+            raise Http404
+        # First request after a fresh deploy without `manage.py build_sitemaps`.
+        build_all()
+    stat = path.stat()
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = FileResponse(path.open("rb"), content_type="application/xml")
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Cache-Control"] = "public, max-age=3600"
+    return response
@@ -1,11 +1,10 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.contrib.sitemaps.views import sitemap
 from django.http import Http404, HttpResponse
 from django.urls import include, path, re_path
 
-from config.sitemaps import PublicProfilesSitemap, StaticViewSitemap
+from config.sitemaps import sitemap_file
 from matchmaking.views import landing, robots_txt
 
 
@@ -22,11 +21,6 @@ def google_search_console_verification(request):
     content = (settings.BASE_DIR / "google05ced95716c6d480.html").read_text(encoding="utf-8")
     return HttpResponse(content, content_type="text/html; charset=utf-8")
 
-sitemaps = {
-    "static": StaticViewSitemap,
-    "profiles": PublicProfilesSitemap,
-}
-
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("panel/", include("panel.urls")),
@@ -41,7 +35,8 @@ urlpatterns = [
         name="google_search_console_verification",
     ),
     path("robots.txt", robots_txt, name="robots_txt"),
-    path("sitemap.xml", sitemap, {"sitemaps": sitemaps}, name="sitemap_xml"),
+    path("sitemap.xml", sitemap_file, name="sitemap_xml"),
+    path("sitemaps/<str:name>", sitemap_file, name="sitemap_file"),
     path("", landing, name="landing"),
     path("accounts/", include("accounts.urls")),
     path("profiles/", include("profiles.urls")),
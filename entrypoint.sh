@@ -26,5 +26,6 @@ fi
 
 python manage.py migrate --noinput
 python manage.py collectstatic --noinput
+python manage.py build_sitemaps --schedule-only
 
 exec gunicorn config.wsgi:application --bind 0.0.0.0:${PORT:-8000} --workers ${GUNICORN_WORKERS:-3}
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "jobs"
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+
+        # Handlers live in <app>/tasks.py and register themselves on import.
+        autodiscover_modules("tasks")
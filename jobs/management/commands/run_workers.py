@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.queue import Worker, purge_finished
+
+
+class Command(BaseCommand):
+    help = "Run background job workers (image derivatives, avatar crops, media cleanup) until SIGTERM/SIGINT"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=int(getattr(settings, "JOBS_CONCURRENCY", 2)),
+            help="Worker threads in this process (default: JOBS_CONCURRENCY)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=float(getattr(settings, "JOBS_POLL_INTERVAL_SECONDS", 1)),
+            help="Seconds to sleep when the queue is empty (default: JOBS_POLL_INTERVAL_SECONDS)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the jobs that are due and exit",
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options["concurrency"])
+        stop_event = threading.Event()
+
+        def _stop(signum, frame):
+            self.stdout.write("Stopping after the current jobs...")
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+
+        workers = [
+            Worker(i, stop_event, poll_interval=options["poll_interval"], once=options["once"])
+            for i in range(concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {concurrency} job worker(s)")
+
+        keep_days = int(getattr(settings, "JOBS_KEEP_DONE_DAYS", 7))
+        next_purge = 0.0
+        while any(w.is_alive() for w in workers):
+            if not options["once"] and time.monotonic() >= next_purge:
+                deleted = purge_finished(keep_days)
+                if deleted:
+                    self.stdout.write(f"Purged {deleted} finished jobs")
+                next_purge = time.monotonic() + 3600
+            for worker in workers:
+                worker.join(timeout=1)
+
+        processed = sum(w.processed for w in workers)
+        self.stdout.write(self.style.SUCCESS(f"Workers stopped, {processed} jobs processed"))
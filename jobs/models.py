@@ -0,0 +1,37 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A unit of background work, stored in the main database (no external broker)."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "В очереди"
+        RUNNING = "running", "Выполняется"
+        DONE = "done", "Готово"
+        FAILED = "failed", "Ошибка"
+
+    name = models.CharField(max_length=128)
+    payload = models.JSONField(default=dict, blank=True)
+    # Optional deduplication key: a queued job with the same key absorbs new enqueues.
+    key = models.CharField(max_length=191, blank=True, default="")
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=128, blank=True, default="")
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["run_at", "id"]
+        indexes = [
+            models.Index(fields=["status", "run_at"]),
+            models.Index(fields=["status", "locked_until"]),
+            models.Index(fields=["key", "status"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"Job({self.id}, {self.name}, {self.status})"
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger("django")
+
+_registry: dict[str, callable] = {}
+
+
+def job(name: str):
+    """Register ``func`` as the handler of jobs called ``name``; it gets the payload as kwargs."""
+
+    def decorator(func):
+        _registry[name] = func
+        return func
+
+    return decorator
+
+
+def get_handler(name: str):
+    return _registry.get(name)
+
+
+def enqueue(name: str, payload: dict | None = None, *, key: str = "", delay: float = 0, max_attempts: int | None = None):
+    """Queue a job; it becomes visible to workers when the current transaction commits.
+
+    With ``key`` an identical job that is still queued is reused instead of adding
+    a duplicate. With JOBS_EAGER the handler runs right away (after commit),
+    which is what development without ``run_workers`` wants.
+    """
+    payload = payload or {}
+    if getattr(settings, "JOBS_EAGER", False):
+        handler = _registry[name]
+        transaction.on_commit(lambda: handler(**payload))
+        return None
+
+    if key:
+        existing = Job.objects.filter(key=key, status=Job.Status.QUEUED).first()
+        if existing is not None:
+            return existing
+
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        key=key,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or int(getattr(settings, "JOBS_MAX_ATTEMPTS", 5)),
+    )
+
+
+def backoff_seconds(attempts: int) -> float:
+    base = float(getattr(settings, "JOBS_RETRY_BACKOFF_SECONDS", 10))
+    cap = float(getattr(settings, "JOBS_RETRY_BACKOFF_MAX_SECONDS", 3600))
+    delay = min(cap, base * (2 ** max(0, attempts - 1)))
+    # Full jitter keeps retries of a failed batch from arriving together.
+    return random.uniform(delay / 2, delay)
+
+
+def claim(worker_id: str, limit: int = 1) -> list[Job]:
+    """Lease up to ``limit`` due jobs for ``worker_id``.
+
+    A job is due when it is queued and its run_at has passed, or when it is
+    running but its lease (locked_until) expired because the worker died.
+    The conditional UPDATE makes the lease safe even where SKIP LOCKED is not
+    available (SQLite).
+    """
+    now = timezone.now()
+    visibility = timedelta(seconds=int(getattr(settings, "JOBS_VISIBILITY_TIMEOUT_SECONDS", 300)))
+    due = Q(status=Job.Status.QUEUED, run_at__lte=now) | Q(status=Job.Status.RUNNING, locked_until__lt=now)
+
+    claimed = []
+    with transaction.atomic():
+        candidates = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by("run_at", "id")
+            .values_list("id", "status", "attempts")[:limit]
+        )
+        for job_id, status, attempts in candidates:
+            updated = Job.objects.filter(id=job_id, status=status, attempts=attempts).update(
+                status=Job.Status.RUNNING,
+                attempts=F("attempts") + 1,
+                locked_until=now + visibility,
+                locked_by=worker_id,
+            )
+            if updated:
+                claimed.append(job_id)
+    return list(Job.objects.filter(id__in=claimed).order_by("run_at", "id"))
+
+
+def run_job(job_obj: Job) -> bool:
+    """Execute a leased job and record the outcome; returns True on success."""
+    handler = get_handler(job_obj.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job {job_obj.name!r}")
+        handler(**(job_obj.payload or {}))
+    except Exception:
+        error = traceback.format_exc()
+        if job_obj.attempts >= job_obj.max_attempts:
+            logger.error("Job %s (%s) failed permanently:\n%s", job_obj.id, job_obj.name, error)
+            Job.objects.filter(id=job_obj.id, locked_by=job_obj.locked_by).update(
+                status=Job.Status.FAILED,
+                last_error=error[-10000:],
+                locked_until=None,
+                finished_at=timezone.now(),
+            )
+        else:
+            logger.warning("Job %s (%s) failed, attempt %s/%s", job_obj.id, job_obj.name, job_obj.attempts, job_obj.max_attempts)
+            Job.objects.filter(id=job_obj.id, locked_by=job_obj.locked_by).update(
+                status=Job.Status.QUEUED,
+                last_error=error[-10000:],
+                locked_until=None,
+                run_at=timezone.now() + timedelta(seconds=backoff_seconds(job_obj.attempts)),
+            )
+        return False
+
+    Job.objects.filter(id=job_obj.id, locked_by=job_obj.locked_by).update(
+        status=Job.Status.DONE,
+        last_error="",
+        locked_until=None,
+        finished_at=timezone.now(),
+    )
+    return True
+
+
+def purge_finished(days: int) -> int:
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(status=Job.Status.DONE, finished_at__lt=cutoff).delete()
+    return deleted
+
+
+class Worker(threading.Thread):
+    """Polls the queue and runs jobs one at a time until ``stop_event`` is set."""
+
+    def __init__(self, index: int, stop_event: threading.Event, *, poll_interval: float, once: bool = False):
+        super().__init__(name=f"jobs-worker-{index}", daemon=True)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+        self.stop_event = stop_event
+        self.poll_interval = poll_interval
+        self.once = once
+        self.processed = 0
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                try:
+                    jobs = claim(self.worker_id)
+                except DatabaseError:
+                    # Lock contention (SQLite) or a dropped connection: back off and retry.
+                    logger.exception("Cannot claim jobs")
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+                if not jobs:
+                    if self.once:
+                        return
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+                for job_obj in jobs:
+                    try:
+                        run_job(job_obj)
+                    except DatabaseError:
+                        # The outcome was not recorded; the lease expires and the job runs again.
+                        logger.exception("Cannot record result of job %s", job_obj.id)
+                    self.processed += 1
+        finally:
+            connection.close()
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-19 04:10
+
+import profiles.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matchmaking', '0007_match_is_admin_chat'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='homeblock',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=profiles.storage.content_addressed_storage, upload_to='landing/'),
+        ),
+    ]
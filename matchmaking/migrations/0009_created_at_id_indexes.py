@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("matchmaking", "0008_homeblock_content_addressed_image"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="swipe",
+            index=models.Index(fields=["created_at", "id"], name="swipe_created_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="match",
+            index=models.Index(fields=["created_at", "id"], name="match_created_id_idx"),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.db import models
 from django.db.models import Q
 from django.utils import timezone
 
+from profiles.storage import content_addressed_storage
+
 
 class Swipe(models.Model):
     class Value(models.TextChoices):
@@ -33,6 +35,9 @@ class Swipe(models.Model):
                 name="no_self_swipe",
             ),
         ]
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="swipe_created_id_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.from_user_id}->{self.to_user_id}:{self.value}"
@@ -56,6 +61,9 @@ class Match(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["user1", "user2"], name="uniq_match_pair"),
         ]
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="match_created_id_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if self.user1_id and self.user2_id and self.user1_id > self.user2_id:
@@ -286,7 +294,7 @@ class HomeBlock(models.Model):
     secondary_button_text = models.CharField(max_length=60, blank=True, default="")
     secondary_button_url = models.CharField(max_length=200, blank=True, default="")
 
-    image = models.ImageField(upload_to="landing/", blank=True, null=True)
+    image = models.ImageField(upload_to="landing/", storage=content_addressed_storage, blank=True, null=True)
     items = models.JSONField(blank=True, null=True)
     extra = models.JSONField(blank=True, null=True)
 
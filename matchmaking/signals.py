@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import HomeBlock, HomePage
+
+
+@receiver(post_save, sender=HomeBlock)
+@receiver(post_delete, sender=HomeBlock)
+def touch_home_page(sender, instance, raw=False, **kwargs):
+    # HomePage.updated_at versions the landing fragment cache, so block edits must move it too.
+    if not raw:
+        HomePage.objects.filter(pk=instance.page_id).update(updated_at=timezone.now())
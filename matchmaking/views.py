@@ -1,18 +1,26 @@
-from io import BytesIO
+import functools
+import hashlib
 from urllib.parse import quote
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
-from django.http import Http404, HttpResponse
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db.models import Count, Max, Q
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import get_template
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.utils.text import slugify
 
+from accounts.conditional import conditional_view, notifications_version
 from accounts.models import User
+from accounts.ratelimit import rate_limit
 
 from .forms import ReportUserForm
-from .models import HomePage, Match, Swipe, UserBan, UserBlock, UserRecommendation
+from .models import HomeBlock, HomePage, Match, Swipe, UserBan, UserBlock, UserRecommendation
 from .services import record_swipe
 
 
@@ -56,16 +64,55 @@ FEED_FACT_SECTIONS = [
 ]
 
 
+@functools.cache
+def _landing_deploy_version() -> str:
+    """Digest of what the landing page is rendered from besides the CMS: its templates and static files."""
+    digest = hashlib.md5(usedforsecurity=False)
+    for name in ("matchmaking/landing.html", "base.html"):
+        digest.update(get_template(name).template.source.encode())
+    digest.update(str(getattr(staticfiles_storage, "manifest_hash", "")).encode())
+    return digest.hexdigest()
+
+
 def landing(request):
     if request.user.is_authenticated:
         return redirect("feed")
 
-    page = HomePage.objects.filter(slug="landing", is_active=True).first()
-    blocks = []
+    # Only the version is read per request; the blocks query runs when the fragment cache misses.
+    page = HomePage.objects.filter(slug="landing", is_active=True).only("pk", "updated_at").first()
+    blocks = HomeBlock.objects.none()
+    cms_version = "none"
     if page is not None:
-        blocks = list(page.blocks.filter(is_active=True).order_by("order", "id"))
+        blocks = page.blocks.filter(is_active=True).order_by("order", "id")
+        cms_version = f"{page.pk}:{page.updated_at.timestamp()}"
+
+    etag = quote_etag(hashlib.md5(f"{cms_version}|{_landing_deploy_version()}".encode(), usedforsecurity=False).hexdigest())
+    # len() does not mark the messages as used, so a rendered page still shows them.
+    flashed = len(messages.get_messages(request)) > 0
+    if not flashed:
+        # Answered before rendering: a revalidation costs the version query only.
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            patch_cache_control(not_modified, public=True, max_age=settings.LANDING_CACHE_SECONDS)
+            return not_modified
+
+    response = render(
+        request,
+        "matchmaking/landing.html",
+        {
+            "cms_blocks": blocks,
+            "cms_version": cms_version,
+            "cms_cache_seconds": settings.LANDING_FRAGMENT_CACHE_SECONDS,
+        },
+    )
+    if flashed or request.META.get("CSRF_COOKIE_NEEDS_UPDATE"):
+        # Personalised or cookie-setting responses must not be shared.
+        return response
 
-    return render(request, "matchmaking/landing.html", {"cms_blocks": blocks})
+    patch_cache_control(response, public=True, max_age=settings.LANDING_CACHE_SECONDS)
+    response["ETag"] = etag
+    return response
 
 
 def robots_txt(request):
@@ -193,13 +240,9 @@ def recommendation_compatibility(request, user_id: int):
 def recommendation_excel(request, user_id: int):
     rec, my_profile, other_user, other_profile = _recommendation_pair_or_404(request, user_id)
 
-    from openpyxl import Workbook
-    from openpyxl.utils import get_column_letter
+    from profiles.questionnaire import get_questionnaire_spec, questionnaire_gender_for_profile
 
-    from profiles.questionnaire import get_questionnaire_spec_for_profile
-
-    wb = Workbook()
-    wb.remove(wb.active)
+    from .xlsx import CONTENT_TYPE, Sheet, stream_xlsx
 
     def _label_value(value, choices_map: dict[str, str]):
         if value is None:
@@ -213,14 +256,18 @@ def recommendation_excel(request, user_id: int):
         value_s = str(value)
         return choices_map.get(value_s, value_s)
 
-    def add_sheet(profile, kind: str, title: str):
-        spec = get_questionnaire_spec_for_profile(profile, kind)
-        answers = profile.questionnaire_me if kind == "me" else profile.questionnaire_ideal
-        answers = answers or {}
+    # Both profiles usually resolve to the same (gender, kind) specs; fetch each once.
+    specs = {}
 
-        ws = wb.create_sheet(title=title)
-        ws.append(["Раздел", "Вопрос", "Ответ (значение)", "Ответ (текст)"])
+    def spec_for(profile, kind: str):
+        key = (questionnaire_gender_for_profile(profile, kind), kind)
+        if key not in specs:
+            specs[key] = get_questionnaire_spec(*key)
+        return specs[key]
 
+    def answer_rows(spec, answers):
+        yield ["Раздел", "Вопрос", "Ответ (значение)", "Ответ (текст)"]
+        answers = answers or {}
         for section in spec:
             section_title = section.get("title") or section.get("id") or ""
             for q in section.get("questions") or []:
@@ -237,36 +284,34 @@ def recommendation_excel(request, user_id: int):
                 else:
                     raw_value = "" if raw is None else str(raw)
 
-                ws.append([section_title, q_text, raw_value, _label_value(raw, choices_map)])
-
-        for col in range(1, 5):
-            ws.column_dimensions[get_column_letter(col)].width = 32 if col in (1, 2) else 24
-
-        ws.freeze_panes = "A2"
+                yield [section_title, q_text, raw_value, _label_value(raw, choices_map)]
 
-    add_sheet(my_profile, "me", "Мои ответы")
-    add_sheet(my_profile, "ideal", "Кто мне подходит")
-    add_sheet(other_profile, "me", "Ответы кандидата")
-    add_sheet(other_profile, "ideal", "Кто ему подходит")
-
-    meta = wb.create_sheet(title="Инфо")
-    meta.append(["Рекомендация ID", rec.id])
-    meta.append(["Мой user_id", request.user.id])
-    meta.append(["Кандидат", other_user.username])
-    meta.append(["Скор", rec.score if rec.score is not None else ""]) 
-    meta.append(["Создана", rec.created_at.strftime("%Y-%m-%d %H:%M") if rec.created_at else ""]) 
+    def answers_sheet(profile, kind: str, title: str):
+        answers = profile.questionnaire_me if kind == "me" else profile.questionnaire_ideal
+        return Sheet(title, answer_rows(spec_for(profile, kind), answers), widths=(32, 32, 24, 24), header=True)
+
+    # Specs are resolved here, before the response starts, so database errors still become a 500.
+    sheets = [
+        answers_sheet(my_profile, "me", "Мои ответы"),
+        answers_sheet(my_profile, "ideal", "Кто мне подходит"),
+        answers_sheet(other_profile, "me", "Ответы кандидата"),
+        answers_sheet(other_profile, "ideal", "Кто ему подходит"),
+        Sheet(
+            "Инфо",
+            [
+                ["Рекомендация ID", rec.id],
+                ["Мой user_id", request.user.id],
+                ["Кандидат", other_user.username],
+                ["Скор", rec.score if rec.score is not None else ""],
+                ["Создана", rec.created_at.strftime("%Y-%m-%d %H:%M") if rec.created_at else ""],
+            ],
+        ),
+    ]
 
     base = slugify(other_user.username) or "candidate"
     filename = f"recommendation_{base}_{rec.id}.xlsx"
 
-    buf = BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-
-    response = HttpResponse(
-        buf.getvalue(),
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
+    response = StreamingHttpResponse(stream_xlsx(sheets), content_type=CONTENT_TYPE)
     response["Content-Disposition"] = (
         f'attachment; filename="{filename}"; filename*=UTF-8\'\'{quote(filename)}'
     )
@@ -427,7 +472,41 @@ def _next_candidate_for(user):
     return rec.recommended_user.profile, rec
 
 
+def _feed_version(request) -> str:
+    """Inputs of _next_candidate_for and the page header, without picking the candidate."""
+    user = request.user
+    top = (
+        UserRecommendation.objects.filter(to_user=user, consumed_at__isnull=True)
+        .order_by("-created_at", "-id")
+        .values_list("id", "recommended_user__profile__updated_at")
+        .first()
+    )
+    recs = UserRecommendation.objects.filter(to_user=user).aggregate(
+        last=Max("id"), consumed=Max("consumed_at"), pending=Count("id", filter=Q(consumed_at__isnull=True))
+    )
+    blocks = UserBlock.objects.filter(Q(blocker=user) | Q(blocked=user)).aggregate(last=Max("id"), n=Count("id"))
+    bans = UserBan.objects.active().aggregate(last=Max("id"), n=Count("id"))
+    profile = getattr(user, "profile", None)
+    return "|".join(
+        str(part)
+        for part in (
+            top,
+            recs["last"],
+            recs["consumed"],
+            recs["pending"],
+            blocks["last"],
+            blocks["n"],
+            bans["last"],
+            bans["n"],
+            request.session.get("last_recommendation_user_id"),
+            getattr(profile, "updated_at", None),
+            notifications_version(user),
+        )
+    )
+
+
 @login_required
+@conditional_view(_feed_version)
 def feed(request):
     candidate, recommendation = _next_candidate_for(request.user)
     last_rec_user_id = request.session.get("last_recommendation_user_id")
@@ -456,6 +535,7 @@ def feed(request):
 
 
 @login_required
+@rate_limit("swipe", keys=("user",))
 def swipe(request, user_id: int, value: str):
     if request.method != "POST":
         raise Http404
@@ -551,7 +631,7 @@ def matches(request):
 
         other_avatar_url = None
         if other_profile is not None and other_profile.avatar:
-            other_avatar_url = other_profile.avatar.url
+            other_avatar_url = other_profile.avatar_thumb_url
 
         # Get last message preview
         last_message = m.messages.order_by("-created_at").first()
@@ -567,6 +647,7 @@ def matches(request):
                 "other": other,
                 "other_name": other_name,
                 "other_avatar_url": other_avatar_url,
+                "other_profile": other_profile,
                 "last_message_text": last_message_text,
                 "last_message_time": last_message_time,
             }
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Func, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from accounts.models import User
+from chat.models import Message
+from matchmaking.models import Match, Swipe, UserBan, UserBlock, UserReport
+
+ACTIVITY_COUNTERS = (
+    "swipes_made",
+    "swipes_received",
+    "matches",
+    "messages_sent",
+    "blocks_made",
+    "blocks_received",
+    "reports_made",
+    "reports_received",
+    "unresolved_reports_received",
+)
+
+_CACHE_PREFIX = "panel:activity:"
+# Annotation prefix: several counter names (swipes_made, ...) are also reverse relations on User.
+_ANNOTATION_PREFIX = "activity_"
+
+
+def _count(qs):
+    # COUNT as a plain function, not an aggregate: no GROUP BY, exactly one row per outer user.
+    return Coalesce(
+        Subquery(qs.order_by().annotate(n=Func(F("pk"), function="COUNT")).values("n"), output_field=IntegerField()),
+        Value(0),
+    )
+
+
+def activity_annotations() -> dict:
+    """Correlated subqueries for every activity counter plus the active ban id."""
+    user = OuterRef("pk")
+    return {
+        "swipes_made": _count(Swipe.objects.filter(from_user=user)),
+        "swipes_received": _count(Swipe.objects.filter(to_user=user)),
+        "matches": _count(Match.objects.filter(Q(user1=user) | Q(user2=user))),
+        "messages_sent": _count(Message.objects.filter(sender=user)),
+        "blocks_made": _count(UserBlock.objects.filter(blocker=user)),
+        "blocks_received": _count(UserBlock.objects.filter(blocked=user)),
+        "reports_made": _count(UserReport.objects.filter(reporter=user)),
+        "reports_received": _count(UserReport.objects.filter(reported_user=user)),
+        "unresolved_reports_received": _count(UserReport.objects.filter(reported_user=user, resolved=False)),
+        "active_ban_id": Subquery(UserBan.objects.active().filter(user=user).order_by("-created_at").values("pk")[:1]),
+    }
+
+
+def _cache_key(user_id: int) -> str:
+    return f"{_CACHE_PREFIX}{user_id}"
+
+
+def bulk_user_activity(user_ids) -> dict[int, dict]:
+    """Activity summaries for many users: cached ones from one get_many, the rest from one query."""
+    user_ids = list(dict.fromkeys(int(pk) for pk in user_ids))
+    if not user_ids:
+        return {}
+    cached = cache.get_many([_cache_key(pk) for pk in user_ids])
+    result = {pk: cached[_cache_key(pk)] for pk in user_ids if _cache_key(pk) in cached}
+
+    missing = [pk for pk in user_ids if pk not in result]
+    if missing:
+        annotations = {_ANNOTATION_PREFIX + name: expr for name, expr in activity_annotations().items()}
+        rows = User.objects.filter(pk__in=missing).annotate(**annotations).values("pk", *annotations)
+        fresh = {
+            row.pop("pk"): {name.removeprefix(_ANNOTATION_PREFIX): value for name, value in row.items()}
+            for row in rows
+        }
+        ttl = int(getattr(settings, "PANEL_USER_ACTIVITY_TTL_SECONDS", 300))
+        cache.set_many({_cache_key(pk): summary for pk, summary in fresh.items()}, ttl)
+        result.update(fresh)
+    return result
+
+
+def user_activity(user_id: int) -> dict | None:
+    """Activity summary of one user in a single statement (or none, when cached)."""
+    return bulk_user_activity([user_id]).get(int(user_id))
+
+
+def invalidate_user_activity(*user_ids) -> None:
+    cache.delete_many([_cache_key(pk) for pk in user_ids if pk])
@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.forms import SetPasswordForm
 from django.contrib.auth.models import Group
 
+from accounts.fields import email_blind_index
 from accounts.models import User
 from matchmaking.models import HomeBlock, HomePage, UserBan
 from profiles.models import Profile, QuestionnaireChoice, QuestionnaireQuestion, QuestionnaireSection
@@ -25,6 +26,15 @@ class UserEditForm(forms.ModelForm):
         except Exception:
             self.fields["is_matchmaker"].initial = False
 
+    def clean_email(self):
+        email = (self.cleaned_data.get("email") or "").strip()
+        qs = User.objects.filter(email_bidx=email_blind_index(email))
+        if self.instance and self.instance.pk:
+            qs = qs.exclude(pk=self.instance.pk)
+        if email and qs.exists():
+            raise forms.ValidationError("Этот email уже занят.")
+        return email
+
     def save(self, commit=True):
         user = super().save(commit=commit)
 
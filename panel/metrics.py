@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+
+logger = logging.getLogger("django")
+
+SNAPSHOT_CACHE_KEY = "panel:metrics:snapshot"
+REFRESH_LOCK_KEY = "panel:metrics:refreshing"
+
+# Counters of append-only tables that grow into millions of rows. On PostgreSQL
+# they come from the planner statistics instead of a full scan.
+ESTIMATED_COUNTERS = ("swipes_count", "messages_count")
+
+
+def _counters() -> dict:
+    """Counter name -> queryset whose COUNT(*) it is."""
+    from accounts.models import User
+    from chat.models import Message
+    from matchmaking.models import Match, Swipe, UserBan, UserBlock, UserReport
+    from profiles.models import Profile, ProfilePhoto
+
+    from .models import AdminNotification
+
+    return {
+        "users_count": User.objects.all(),
+        "active_users_count": User.objects.filter(is_active=True),
+        "profiles_count": Profile.objects.all(),
+        "photos_count": ProfilePhoto.objects.all(),
+        "swipes_count": Swipe.objects.all(),
+        "matches_count": Match.objects.all(),
+        "messages_count": Message.objects.all(),
+        "blocks_count": UserBlock.objects.all(),
+        "reports_count": UserReport.objects.all(),
+        "unresolved_reports_count": UserReport.objects.filter(resolved=False),
+        "bans_count": UserBan.objects.all(),
+        "active_bans_count": UserBan.objects.active(),
+        "notifications_count": AdminNotification.objects.all(),
+    }
+
+
+def compute_snapshot() -> dict:
+    """All dashboard counters in one round trip: ``SELECT (SELECT COUNT(*) ...), (...), ...``.
+
+    Each counter is its own scalar subquery compiled from the ORM, so filters
+    (e.g. active bans) stay in one place. Estimated counters use
+    ``pg_class.reltuples`` on PostgreSQL and fall back to an exact count for
+    tables that were never analyzed.
+    """
+    counters = _counters()
+    estimate = connection.vendor == "postgresql"
+
+    columns = []
+    params: list = []
+    for name, qs in counters.items():
+        if estimate and name in ESTIMATED_COUNTERS:
+            columns.append("(SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass)")
+            params.append(qs.model._meta.db_table)
+            continue
+        sql, sub_params = qs.order_by().values("pk").query.sql_with_params()
+        columns.append(f"(SELECT COUNT(*) FROM ({sql}) AS counted)")
+        params.extend(sub_params)
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT " + ", ".join(columns), params)
+        row = cursor.fetchone()
+
+    snapshot = dict(zip(counters, (int(v or 0) for v in row)))
+    for name in ESTIMATED_COUNTERS:
+        if estimate and snapshot[name] < 0:
+            # reltuples is -1 until the first ANALYZE/VACUUM.
+            snapshot[name] = counters[name].count()
+    snapshot["estimated"] = list(ESTIMATED_COUNTERS) if estimate else []
+    snapshot["computed_at"] = time.time()
+    return snapshot
+
+
+def refresh_snapshot() -> dict:
+    snapshot = compute_snapshot()
+    ttl = int(getattr(settings, "PANEL_METRICS_TTL_SECONDS", 60))
+    # Kept well past the TTL so a stale snapshot can be served while the next one is computed.
+    cache.set(SNAPSHOT_CACHE_KEY, snapshot, ttl * 10)
+    return snapshot
+
+
+def _refresh_in_background() -> None:
+    ttl = int(getattr(settings, "PANEL_METRICS_TTL_SECONDS", 60))
+    if not cache.add(REFRESH_LOCK_KEY, 1, ttl):
+        return
+
+    def _run():
+        try:
+            refresh_snapshot()
+        except DatabaseError:
+            logger.exception("Cannot refresh panel metrics")
+        finally:
+            cache.delete(REFRESH_LOCK_KEY)
+            connection.close()
+
+    threading.Thread(target=_run, name="panel-metrics-refresh", daemon=True).start()
+
+
+def get_snapshot() -> dict:
+    """Dashboard counters, at most PANEL_METRICS_TTL_SECONDS old in the steady state.
+
+    A fresh snapshot is returned from cache; a stale one is returned as is
+    while a background thread recomputes it; only the very first request
+    (or one after a long idle period) computes it inline.
+    """
+    snapshot = cache.get(SNAPSHOT_CACHE_KEY)
+    if snapshot is None:
+        return refresh_snapshot()
+    ttl = int(getattr(settings, "PANEL_METRICS_TTL_SECONDS", 60))
+    if time.time() - snapshot.get("computed_at", 0) > ttl:
+        _refresh_in_background()
+    return snapshot
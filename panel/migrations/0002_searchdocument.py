@@ -0,0 +1,91 @@
+from django.db import migrations, models
+
+FTS_TABLE = "panel_searchdocument_fts"
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS panel_searchdoc_body_trgm ON panel_searchdocument USING gin (body gin_trgm_ops)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS panel_searchdoc_body_trgm",
+]
+
+# External-content FTS5 table: stores only the trigram index, rows live in panel_searchdocument.
+SQLITE_FORWARD = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "body, content='panel_searchdocument', content_rowid='id', tokenize='trigram')",
+    f"""CREATE TRIGGER IF NOT EXISTS panel_searchdocument_ai AFTER INSERT ON panel_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, new.body);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS panel_searchdocument_ad AFTER DELETE ON panel_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS panel_searchdocument_au AFTER UPDATE ON panel_searchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, new.body);
+    END""",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS panel_searchdocument_ai",
+    "DROP TRIGGER IF EXISTS panel_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS panel_searchdocument_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def _run(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def create_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == "sqlite":
+        _run(schema_editor, SQLITE_FORWARD)
+
+
+def drop_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _run(schema_editor, POSTGRES_BACKWARD)
+    elif vendor == "sqlite":
+        _run(schema_editor, SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("panel", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "scope",
+                    models.CharField(
+                        choices=[
+                            ("users", "Пользователи"),
+                            ("profiles", "Анкеты"),
+                            ("reports", "Жалобы"),
+                            ("bans", "Баны"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("object_id", models.PositiveBigIntegerField()),
+                ("body", models.TextField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=("scope", "object_id"), name="uniq_search_document"),
+                ],
+            },
+        ),
+        migrations.RunPython(create_text_index, drop_text_index),
+    ]
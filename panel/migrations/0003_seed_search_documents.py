@@ -0,0 +1,73 @@
+import re
+
+from django.db import migrations
+
+CHUNK_SIZE = 2000
+
+_SPACES = re.compile(r"\s+")
+
+
+# Frozen copies of panel.search.normalize and the scope documents as of this migration;
+# signals keep the index current afterwards, `manage.py rebuild_search_index` re-creates it.
+def _join(*parts):
+    text = " ".join(str(p) for p in parts if p)
+    return _SPACES.sub(" ", text.lower().replace("ё", "е")).strip()
+
+
+def _scopes(apps):
+    User = apps.get_model("accounts", "User")
+    Profile = apps.get_model("profiles", "Profile")
+    UserReport = apps.get_model("matchmaking", "UserReport")
+    UserBan = apps.get_model("matchmaking", "UserBan")
+    return {
+        "users": (
+            User.objects.all(),
+            lambda u: _join(u.username, u.first_name, u.last_name),
+        ),
+        "profiles": (
+            Profile.objects.select_related("user"),
+            lambda p: _join(p.user.username, p.display_name, p.city),
+        ),
+        "reports": (
+            UserReport.objects.select_related("reporter", "reported_user"),
+            lambda r: _join(r.reporter.username, r.reported_user.username, r.reason, r.get_reason_display(), r.message),
+        ),
+        "bans": (
+            UserBan.objects.select_related("user"),
+            lambda b: _join(b.user.username, b.reason, b.get_reason_display(), b.note),
+        ),
+    }
+
+
+def seed(apps, schema_editor):
+    SearchDocument = apps.get_model("panel", "SearchDocument")
+    for scope, (queryset, document) in _scopes(apps).items():
+        qs = queryset.order_by("pk")
+        last_pk = 0
+        while True:
+            chunk = list(qs.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+            if not chunk:
+                break
+            SearchDocument.objects.bulk_create(
+                [SearchDocument(scope=scope, object_id=obj.pk, body=document(obj)) for obj in chunk],
+                ignore_conflicts=True,
+            )
+            last_pk = chunk[-1].pk
+
+
+def unseed(apps, schema_editor):
+    apps.get_model("panel", "SearchDocument").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("panel", "0002_searchdocument"),
+        ("accounts", "0010_user_email_bidx_unique"),
+        ("profiles", "0016_content_addressed_media"),
+        ("matchmaking", "0009_created_at_id_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(seed, unseed),
+    ]
@@ -18,3 +18,30 @@ class AdminNotification(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+
+
+class SearchDocument(models.Model):
+    """Normalized text of one searchable panel row; maintained by panel/search.py.
+
+    Indexed with pg_trgm (GIN) on PostgreSQL and mirrored into an FTS5 trigram
+    table on SQLite, so substring search does not scan the source tables.
+    """
+
+    class Scope(models.TextChoices):
+        USERS = "users", "Пользователи"
+        PROFILES = "profiles", "Анкеты"
+        REPORTS = "reports", "Жалобы"
+        BANS = "bans", "Баны"
+
+    scope = models.CharField(max_length=16, choices=Scope.choices)
+    object_id = models.PositiveBigIntegerField()
+    body = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "object_id"], name="uniq_search_document"),
+        ]
+
+    def __str__(self) -> str:
+        return f"SearchDocument({self.scope}:{self.object_id})"
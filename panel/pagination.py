@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+
+from django.db import DatabaseError, connection
+from django.db.models import Q
+
+CURSOR_PARAM = "cursor"
+DIRECTION_PARAM = "dir"
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    raw = json.dumps([created_at.isoformat(), pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(value: str | None) -> tuple[datetime, int] | None:
+    """(created_at, id) from a cursor, or None for a missing or mangled one (first page)."""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        created_at, pk = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def approximate_count(qs) -> int | None:
+    """Planner row estimate for ``qs`` on PostgreSQL; None elsewhere or on failure.
+
+    Costs an EXPLAIN instead of a COUNT(*) over millions of rows, which is
+    all a "≈ N records" label needs.
+    """
+    if connection.vendor != "postgresql":
+        return None
+    sql, params = qs.order_by().values("pk").query.sql_with_params()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class KeysetPage:
+    """One page of a (created_at, id) DESC listing.
+
+    Exposes ``object_list``, ``has_next``/``has_previous`` and the cursors for
+    the neighbouring pages; ``is_keyset`` lets ``panel/_pagination.html``
+    render cursor links instead of page numbers.
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, *, has_next: bool, has_previous: bool, total: int | None = None):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.approximate_total = total
+
+    def has_next(self) -> bool:
+        return self.has_next_page
+
+    def has_previous(self) -> bool:
+        return self.has_previous_page
+
+    def has_other_pages(self) -> bool:
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_cursor(self) -> str | None:
+        if not self.object_list:
+            return None
+        last = self.object_list[-1]
+        return encode_cursor(last.created_at, last.pk)
+
+    @property
+    def previous_cursor(self) -> str | None:
+        if not self.object_list:
+            return None
+        first = self.object_list[0]
+        return encode_cursor(first.created_at, first.pk)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+
+def keyset_page(qs, *, cursor: str | None, backwards: bool, per_page: int, estimate_total: bool = False):
+    """Newest-first page of ``qs`` after (or, ``backwards``, before) ``cursor``.
+
+    Seeks with ``WHERE (created_at, id) < cursor ORDER BY created_at DESC, id
+    DESC LIMIT per_page + 1`` – no OFFSET and no COUNT(*), so a deep page
+    costs the same as the first one given an index on (created_at, id).
+    """
+    position = decode_cursor(cursor)
+    if position is None:
+        backwards = False
+    qs = qs.order_by()
+    total = approximate_count(qs) if estimate_total else None
+
+    if position is not None:
+        created_at, pk = position
+        # The plain range bound lets the planner seek the index; the OR only breaks ties.
+        if backwards:
+            qs = qs.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk),
+                created_at__gte=created_at,
+            )
+        else:
+            qs = qs.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk),
+                created_at__lte=created_at,
+            )
+
+    if backwards:
+        rows = list(qs.order_by("created_at", "pk")[: per_page + 1])
+        more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next, has_previous = True, more
+    else:
+        rows = list(qs.order_by("-created_at", "-pk")[: per_page + 1])
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        has_next, has_previous = more, position is not None
+
+    return KeysetPage(rows, has_next=has_next, has_previous=has_previous, total=total)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import re
+
+from django.db import connection
+from django.db.models import Case, F, FloatField, Func, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.expressions import RawSQL
+
+from accounts.fields import email_blind_index
+from accounts.models import User
+from matchmaking.models import UserBan, UserReport
+from profiles.models import Profile
+
+from .models import SearchDocument
+
+Scope = SearchDocument.Scope
+
+_FTS_TABLE = "panel_searchdocument_fts"
+# The trigram tokenizer cannot match anything shorter than three characters.
+_FTS_MIN_LENGTH = 3
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    return _SPACES.sub(" ", (text or "").lower().replace("ё", "е")).strip()
+
+
+def _join(*parts) -> str:
+    return normalize(" ".join(str(p) for p in parts if p))
+
+
+class _ScopeSpec:
+    def __init__(self, queryset, document, *, watched_user_fields=()):
+        self.queryset = queryset
+        self.document = document
+        self.watched_user_fields = watched_user_fields
+
+
+SCOPES = {
+    Scope.USERS: _ScopeSpec(
+        lambda: User.objects.all(),
+        lambda u: _join(u.username, u.first_name, u.last_name),
+    ),
+    Scope.PROFILES: _ScopeSpec(
+        lambda: Profile.objects.select_related("user"),
+        lambda p: _join(p.user.username, p.display_name, p.city),
+        watched_user_fields=("user",),
+    ),
+    Scope.REPORTS: _ScopeSpec(
+        lambda: UserReport.objects.select_related("reporter", "reported_user"),
+        lambda r: _join(r.reporter.username, r.reported_user.username, r.reason, r.get_reason_display(), r.message),
+        watched_user_fields=("reporter", "reported_user"),
+    ),
+    Scope.BANS: _ScopeSpec(
+        lambda: UserBan.objects.select_related("user"),
+        lambda b: _join(b.user.username, b.reason, b.get_reason_display(), b.note),
+        watched_user_fields=("user",),
+    ),
+}
+
+
+# --- Index maintenance -------------------------------------------------------------------------
+
+
+def index_objects(scope: str, objects) -> int:
+    """Upsert the documents of ``objects`` (instances of the scope's model)."""
+    spec = SCOPES[scope]
+    docs = [SearchDocument(scope=scope, object_id=obj.pk, body=spec.document(obj)) for obj in objects]
+    if docs:
+        SearchDocument.objects.bulk_create(
+            docs,
+            update_conflicts=True,
+            unique_fields=["scope", "object_id"],
+            update_fields=["body", "updated_at"],
+        )
+    return len(docs)
+
+
+def index_ids(scope: str, ids) -> int:
+    ids = list(ids)
+    if not ids:
+        return 0
+    return index_objects(scope, SCOPES[scope].queryset().filter(pk__in=ids))
+
+
+def unindex(scope: str, ids) -> None:
+    SearchDocument.objects.filter(scope=scope, object_id__in=list(ids)).delete()
+
+
+def reindex_user(user) -> None:
+    """Refresh every document that contains ``user``'s name (the user and rows that mention them)."""
+    index_objects(Scope.USERS, [user])
+    for scope, spec in SCOPES.items():
+        for field in spec.watched_user_fields:
+            index_ids(scope, spec.queryset().filter(**{field: user}).values_list("pk", flat=True))
+
+
+def rebuild(scope: str, *, chunk_size: int = 2000) -> int:
+    """Re-create all documents of ``scope`` from its source table; returns the number indexed."""
+    qs = SCOPES[scope].queryset().order_by("pk")
+    total = 0
+    last_pk = 0
+    while True:
+        chunk = list(qs.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            break
+        total += index_objects(scope, chunk)
+        last_pk = chunk[-1].pk
+    stale = SearchDocument.objects.filter(scope=scope).exclude(
+        object_id__in=SCOPES[scope].queryset().values("pk")
+    )
+    stale.delete()
+    return total
+
+
+# --- Querying ----------------------------------------------------------------------------------
+
+
+def _matching_documents(words: list[str], scope: str):
+    """Documents of ``scope`` that contain every word."""
+    qs = SearchDocument.objects.filter(scope=scope)
+    if connection.vendor == "sqlite" and all(len(w) >= _FTS_MIN_LENGTH for w in words):
+        # Every word becomes a quoted phrase; FTS5 ANDs them over the trigram index.
+        match = " ".join('"' + w.replace('"', '""') + '"' for w in words)
+        return qs.filter(id__in=RawSQL(f"SELECT rowid FROM {_FTS_TABLE} WHERE {_FTS_TABLE} MATCH %s", [match]))
+    # On PostgreSQL LIKE '%word%' is served by the pg_trgm GIN index.
+    for word in words:
+        qs = qs.filter(body__contains=word)
+    return qs
+
+
+def _rank(phrase: str):
+    """Relevance of a document's body to ``phrase``, higher is better."""
+    if connection.vendor == "postgresql":
+        return Func(Value(phrase), F("body"), function="word_similarity", output_field=FloatField())
+    return Case(When(body__startswith=phrase, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+
+
+# Scopes that also match by the user's email: lookup path from the scope's model to User.
+_EMAIL_SCOPES = {Scope.USERS: "", Scope.BANS: "user__"}
+
+
+def filter_by_search(qs, q: str, scope: str):
+    """``qs`` narrowed to the objects whose document contains every word of ``q``, best match first.
+
+    Filters by a subquery on the search documents, so filters applied to the
+    result afterwards see every hit. Users and bans also match by email
+    (substring, or the exact address through the blind index, ranked first).
+    """
+    phrase = normalize(q)
+    words = phrase.split(" ") if phrase else []
+    if not words:
+        return qs.none()
+
+    match = Q(pk__in=_matching_documents(words, scope).values("object_id"))
+    ordering = []
+    prefix = _EMAIL_SCOPES.get(scope)
+    if prefix is not None:
+        email = q.strip()
+        match |= Q(**{f"{prefix}email__icontains": email})
+        bidx = email_blind_index(email) if "@" in email else None
+        if bidx:
+            exact = Q(**{f"{prefix}email_bidx": bidx})
+            match |= exact
+            qs = qs.annotate(search_exact=Case(When(exact, then=Value(1)), default=Value(0), output_field=IntegerField()))
+            ordering.append("-search_exact")
+    # One unique-index lookup per hit, by (scope, object_id).
+    rank = Subquery(
+        SearchDocument.objects.filter(scope=scope, object_id=OuterRef("pk")).annotate(rank=_rank(phrase)).values("rank")[:1],
+        output_field=FloatField(),
+    )
+    return (
+        qs.filter(match)
+        .annotate(search_rank=rank)
+        .order_by(*ordering, F("search_rank").desc(nulls_last=True), "-pk")
+    )
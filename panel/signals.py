@@ -1,12 +1,89 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from chat.models import Message
+from matchmaking.models import Match, Swipe, UserBan, UserBlock, UserReport
+from profiles.models import Profile
+
+from . import search
+from .activity import invalidate_user_activity
 from .models import AdminNotification
 
+# Model -> FK attributes of the users whose activity summary the row counts towards.
+_ACTIVITY_USERS = {
+    Swipe: ("from_user_id", "to_user_id"),
+    Match: ("user1_id", "user2_id"),
+    Message: ("sender_id",),
+    UserBlock: ("blocker_id", "blocked_id"),
+    UserReport: ("reporter_id", "reported_user_id"),
+    UserBan: ("user_id",),
+}
+
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def notify_admin_new_user(sender, instance, created, **kwargs):
     if not created:
         return
     AdminNotification.objects.create(event=AdminNotification.Event.NEW_USER, user=instance)
+
+
+# Model -> search scope of its documents, and the fields whose change requires a reindex.
+_SEARCH_SCOPES = {
+    Profile: (search.Scope.PROFILES, {"user", "display_name", "city"}),
+    UserReport: (search.Scope.REPORTS, {"reporter", "reported_user", "reason", "message"}),
+    UserBan: (search.Scope.BANS, {"user", "reason", "note"}),
+}
+_USER_SEARCH_FIELDS = {"username", "first_name", "last_name"}
+
+
+def _touches(update_fields, watched) -> bool:
+    return update_fields is None or bool(set(update_fields) & watched)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def index_user(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or not _touches(update_fields, _USER_SEARCH_FIELDS):
+        return
+    if created:
+        search.index_objects(search.Scope.USERS, [instance])
+    else:
+        search.reindex_user(instance)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def unindex_user(sender, instance, **kwargs):
+    search.unindex(search.Scope.USERS, [instance.pk])
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=UserReport)
+@receiver(post_save, sender=UserBan)
+def index_search_document(sender, instance, update_fields=None, raw=False, **kwargs):
+    scope, watched = _SEARCH_SCOPES[sender]
+    if raw or not _touches(update_fields, watched):
+        return
+    search.index_ids(scope, [instance.pk])
+
+
+@receiver(post_delete, sender=Profile)
+@receiver(post_delete, sender=UserReport)
+@receiver(post_delete, sender=UserBan)
+def unindex_search_document(sender, instance, **kwargs):
+    search.unindex(_SEARCH_SCOPES[sender][0], [instance.pk])
+
+
+@receiver(post_save, sender=Swipe)
+@receiver(post_save, sender=Match)
+@receiver(post_save, sender=Message)
+@receiver(post_save, sender=UserBlock)
+@receiver(post_save, sender=UserReport)
+@receiver(post_save, sender=UserBan)
+@receiver(post_delete, sender=Swipe)
+@receiver(post_delete, sender=Match)
+@receiver(post_delete, sender=Message)
+@receiver(post_delete, sender=UserBlock)
+@receiver(post_delete, sender=UserReport)
+@receiver(post_delete, sender=UserBan)
+def invalidate_activity_summary(sender, instance, **kwargs):
+    invalidate_user_activity(*(getattr(instance, attr) for attr in _ACTIVITY_USERS[sender]))
@@ -4,6 +4,8 @@ from . import views
 
 urlpatterns = [
     path("", views.dashboard, name="panel_dashboard"),
+    path("profiling/", views.profiling, name="panel_profiling"),
+    path("metrics/", views.metrics, name="panel_metrics"),
 
     path("home/", views.home_pages, name="panel_home_pages"),
     path("home/new/", views.home_page_create, name="panel_home_page_create"),
@@ -49,11 +51,17 @@ urlpatterns = [
         name="panel_user_toggle_active",
     ),
     path("profiles/", views.profiles_list, name="panel_profiles"),
+    path("profiles/export/", views.profiles_export, name="panel_profiles_export"),
     path(
         "profiles/<int:profile_id>/",
         views.profile_detail,
         name="panel_profile_detail",
     ),
+    path(
+        "profiles/<int:profile_id>/access-log/",
+        views.profile_access_log,
+        name="panel_profile_access_log",
+    ),
 
     path("questionnaire/sections/", views.questionnaire_sections, name="panel_questionnaire_sections"),
     path(
@@ -1,14 +1,21 @@
+import itertools
+import logging
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
 from functools import wraps
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
 from django.db.models import Q
-from django.http import Http404
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 
+from accounts import db_optimization
 from accounts.models import User
 from chat.models import Message
 from matchmaking.models import (
@@ -21,8 +28,10 @@ from matchmaking.models import (
     UserRecommendation,
     UserReport,
 )
+from profiles.audit import access_daily_summary
 from profiles.models import (
     Profile,
+    ProfileAccessLog,
     ProfilePhoto,
     QuestionnaireChoice,
     QuestionnaireQuestion,
@@ -30,6 +39,7 @@ from profiles.models import (
 )
 from profiles.questionnaire import get_questionnaire_spec_for_profile, questionnaire_progress
 
+from .activity import ACTIVITY_COUNTERS, bulk_user_activity, user_activity
 from .forms import (
     HomeBlockForm,
     HomePageForm,
@@ -42,7 +52,12 @@ from .forms import (
     UserEditForm,
     UserSetPasswordForm,
 )
+from .metrics import get_snapshot
 from .models import AdminNotification
+from .pagination import CURSOR_PARAM, DIRECTION_PARAM, keyset_page
+from .search import Scope as SearchScope, filter_by_search
+
+logger = logging.getLogger("django")
 
 
 def staff_required(view_func):
@@ -86,6 +101,27 @@ def _paginate(request, qs, per_page: int = 50):
     return page_obj, base_qs
 
 
+def _keyset_paginate(request, qs, per_page: int = 80):
+    """Same ``(page_obj, base_qs)`` contract as ``_paginate`` for big ``created_at`` tables.
+
+    Pages are addressed by an opaque ``?cursor=`` (plus ``dir=prev`` for the
+    previous page) instead of ``?page=N``, so deep pages avoid OFFSET and COUNT(*).
+    """
+    page_obj = keyset_page(
+        qs,
+        cursor=request.GET.get(CURSOR_PARAM),
+        backwards=request.GET.get(DIRECTION_PARAM) == "prev",
+        per_page=per_page,
+        estimate_total=True,
+    )
+
+    params = request.GET.copy()
+    for key in (CURSOR_PARAM, DIRECTION_PARAM, "page"):
+        params.pop(key, None)
+    base_qs = params.urlencode()
+    return page_obj, base_qs
+
+
 @staff_required
 def home_pages(request):
     qs = HomePage.objects.all().order_by("slug", "id")
@@ -216,49 +252,76 @@ def home_block_delete(request, block_id: int):
 
 @staff_or_matchmaker_required
 def dashboard(request):
-    users_count = User.objects.count()
-    active_users_count = User.objects.filter(is_active=True).count()
-    profiles_count = Profile.objects.count()
-    photos_count = ProfilePhoto.objects.count()
-    swipes_count = Swipe.objects.count()
-    matches_count = Match.objects.count()
-    messages_count = Message.objects.count()
-    blocks_count = UserBlock.objects.count()
-    reports_count = UserReport.objects.count()
-    unresolved_reports_count = UserReport.objects.filter(resolved=False).count()
-    bans_count = UserBan.objects.count()
-    active_bans_count = UserBan.objects.active().count()
+    snapshot = get_snapshot()
 
     recent_users = User.objects.order_by("-date_joined")[:8]
     recent_matches = Match.objects.select_related("user1", "user2").order_by("-created_at")[:8]
 
-    notifications_count = AdminNotification.objects.count()
     notifications = AdminNotification.objects.select_related("user")[:12]
 
     return render(
         request,
         "panel/dashboard.html",
         {
-            "users_count": users_count,
-            "active_users_count": active_users_count,
-            "profiles_count": profiles_count,
-            "photos_count": photos_count,
-            "swipes_count": swipes_count,
-            "matches_count": matches_count,
-            "messages_count": messages_count,
-            "blocks_count": blocks_count,
-            "reports_count": reports_count,
-            "unresolved_reports_count": unresolved_reports_count,
-            "bans_count": bans_count,
-            "active_bans_count": active_bans_count,
+            **snapshot,
+            "metrics_computed_at": datetime.fromtimestamp(snapshot["computed_at"], tz=dt_timezone.utc),
             "recent_users": recent_users,
             "recent_matches": recent_matches,
-            "notifications_count": notifications_count,
             "notifications": notifications,
         },
     )
 
 
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+@staff_required
+def profiling(request):
+    rows = []
+    repeated = []
+    for view, stats in db_optimization.collect().items():
+        rows.append(
+            {
+                "view": view,
+                "count": stats.count,
+                "errors": stats.errors,
+                "total_ms": stats.latency.sum * 1000,
+                "p50_ms": _ms(stats.latency.quantile(0.5)),
+                "p95_ms": _ms(stats.latency.quantile(0.95)),
+                "p99_ms": _ms(stats.latency.quantile(0.99)),
+                "queries_mean": stats.queries.mean(),
+                "queries_p95": stats.queries.quantile(0.95),
+                "sql_mean_ms": _ms(stats.sql.mean()),
+                "nplusone": stats.nplusone,
+            }
+        )
+        for sql, (requests, times) in stats.fingerprints.items():
+            repeated.append({"view": view, "sql": sql, "requests": requests, "times": times})
+    rows.sort(key=lambda r: r["total_ms"], reverse=True)
+    repeated.sort(key=lambda r: (r["requests"], r["times"]), reverse=True)
+
+    return render(
+        request,
+        "panel/profiling.html",
+        {
+            "rows": rows,
+            "repeated": repeated[:30],
+            "sample_rate": settings.PROFILING_SAMPLE_RATE,
+            "duplicate_threshold": settings.PROFILING_DUPLICATE_THRESHOLD,
+        },
+    )
+
+
+def metrics(request):
+    """Prometheus text for a scraper with PROFILING_METRICS_TOKEN as bearer token, or for staff."""
+    token = settings.PROFILING_METRICS_TOKEN
+    authorized = bool(token) and constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}")
+    if not authorized and not (request.user.is_authenticated and request.user.is_staff):
+        raise PermissionDenied
+    return HttpResponse(db_optimization.prometheus_text(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @staff_or_matchmaker_required
 def users_list(request):
     q = (request.GET.get("q") or "").strip()
@@ -267,13 +330,16 @@ def users_list(request):
 
     qs = User.objects.all().order_by("-date_joined")
     if q:
-        qs = qs.filter(Q(username__icontains=q) | Q(email__icontains=q))
+        qs = filter_by_search(qs, q, SearchScope.USERS)
     if only_staff:
         qs = qs.filter(is_staff=True)
     if only_inactive:
         qs = qs.filter(is_active=False)
 
     page_obj, base_qs = _paginate(request, qs, per_page=50)
+    activity = bulk_user_activity(u.id for u in page_obj.object_list)
+    for u in page_obj.object_list:
+        u.activity = activity.get(u.id)
     return render(
         request,
         "panel/users_list.html",
@@ -305,16 +371,11 @@ def user_detail(request, user_id: int):
 
     profile = getattr(u, "profile", None)
 
-    swipes_made = Swipe.objects.filter(from_user=u).count()
-    swipes_received = Swipe.objects.filter(to_user=u).count()
-    matches = Match.objects.filter(Q(user1=u) | Q(user2=u)).count()
-    messages_sent = Message.objects.filter(sender=u).count()
-    blocks_made = UserBlock.objects.filter(blocker=u).count()
-    blocks_received = UserBlock.objects.filter(blocked=u).count()
-    reports_made = UserReport.objects.filter(reporter=u).count()
-    reports_received = UserReport.objects.filter(reported_user=u).count()
-    unresolved_reports_received = UserReport.objects.filter(reported_user=u, resolved=False).count()
-    active_ban = UserBan.objects.active().filter(user=u).order_by("-created_at").first()
+    activity = user_activity(u.id) or {}
+    active_ban = None
+    if activity.get("active_ban_id"):
+        # The cached id may belong to a ban that has expired since; re-check it.
+        active_ban = UserBan.objects.active().filter(pk=activity["active_ban_id"]).first()
 
     return render(
         request,
@@ -323,15 +384,7 @@ def user_detail(request, user_id: int):
             "target_user": u,
             "form": form,
             "profile": profile,
-            "swipes_made": swipes_made,
-            "swipes_received": swipes_received,
-            "matches": matches,
-            "messages_sent": messages_sent,
-            "blocks_made": blocks_made,
-            "blocks_received": blocks_received,
-            "reports_made": reports_made,
-            "reports_received": reports_received,
-            "unresolved_reports_received": unresolved_reports_received,
+            **{name: activity.get(name, 0) for name in ACTIVITY_COUNTERS},
             "active_ban": active_ban,
         },
     )
@@ -361,11 +414,7 @@ def user_recommendations(request, user_id: int):
         qs = qs.exclude(user_id__in=swiped_to_ids)
 
     if q:
-        qs = qs.filter(
-            Q(user__username__icontains=q)
-            | Q(display_name__icontains=q)
-            | Q(city__icontains=q)
-        )
+        qs = filter_by_search(qs, q, SearchScope.PROFILES)
 
     my_gender = target_profile.gender or None
     if target_profile.looking_for:
@@ -511,12 +560,7 @@ def reports_list(request):
     ).order_by("-created_at")
 
     if q:
-        qs = qs.filter(
-            Q(reporter__username__icontains=q)
-            | Q(reported_user__username__icontains=q)
-            | Q(message__icontains=q)
-            | Q(reason__icontains=q)
-        )
+        qs = filter_by_search(qs, q, SearchScope.REPORTS)
 
     if only_open:
         qs = qs.filter(resolved=False)
@@ -603,12 +647,7 @@ def bans_list(request):
 
     qs = UserBan.objects.select_related("user", "created_by", "revoked_by").order_by("-created_at")
     if q:
-        qs = qs.filter(
-            Q(user__username__icontains=q)
-            | Q(user__email__icontains=q)
-            | Q(note__icontains=q)
-            | Q(reason__icontains=q)
-        )
+        qs = filter_by_search(qs, q, SearchScope.BANS)
 
     now = timezone.now()
     if only_active:
@@ -768,13 +807,7 @@ def user_delete(request, user_id: int):
     profile = getattr(u, "profile", None)
 
     if request.method == "POST":
-        if profile is not None:
-            if profile.avatar:
-                profile.avatar.delete(save=False)
-            for p in profile.photos.all():
-                if p.image:
-                    p.image.delete(save=False)
-
+        # Avatar and photo files are released by profiles.release_image jobs from the delete signals.
         u.delete()
         messages.success(request, "Пользователь удалён")
         return redirect("panel_users")
@@ -795,11 +828,7 @@ def profiles_list(request):
 
     qs = Profile.objects.select_related("user").order_by("-updated_at")
     if q:
-        qs = qs.filter(
-            Q(user__username__icontains=q)
-            | Q(display_name__icontains=q)
-            | Q(city__icontains=q)
-        )
+        qs = filter_by_search(qs, q, SearchScope.PROFILES)
 
     page_obj, base_qs = _paginate(request, qs, per_page=50)
     return render(
@@ -813,6 +842,32 @@ def profiles_list(request):
     )
 
 
+@staff_required
+def profiles_export(request):
+    """All profiles' answers as one wide CSV/JSONL table, streamed while it is read from the database."""
+    from profiles.export import export_columns, iter_export_records, stream_csv, stream_jsonl
+
+    fmt = request.GET.get("format") or "csv"
+    if fmt not in ("csv", "jsonl"):
+        raise Http404
+
+    columns = export_columns()
+    records = iter_export_records(columns)
+    if fmt == "csv":
+        # The BOM lets Excel detect UTF-8 in the Cyrillic headers.
+        lines = itertools.chain(["\ufeff"], stream_csv(records, columns))
+        content_type = "text/csv; charset=utf-8"
+    else:
+        lines = stream_jsonl(records)
+        content_type = "application/x-ndjson; charset=utf-8"
+
+    logger.info("Questionnaire export (%s) by user %s", fmt, request.user.id)
+    filename = f"questionnaires_{timezone.localdate():%Y%m%d}.{fmt}"
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 @staff_required
 def profile_detail(request, profile_id: int):
     profile = get_object_or_404(Profile, id=profile_id)
@@ -937,6 +992,41 @@ def profile_detail(request, profile_id: int):
     )
 
 
+@staff_required
+def profile_access_log(request, profile_id: int):
+    profile = get_object_or_404(Profile.objects.select_related("user"), id=profile_id)
+
+    raw_days = (request.GET.get("days") or "").strip()
+    days = int(raw_days) if raw_days.isdigit() else 90
+    since = timezone.localdate() - timedelta(days=min(max(days, 1), 3650) - 1)
+
+    summary = access_daily_summary(profile_id=profile.id, since=since)
+    accessor_ids = {row["accessed_by_id"] for row in summary if row["accessed_by_id"]}
+    accessors = User.objects.in_bulk(accessor_ids)
+    for row in summary:
+        row["accessed_by"] = accessors.get(row["accessed_by_id"])
+        row["access_type_label"] = ProfileAccessLog.AccessType(row["access_type"]).label
+
+    qs = (
+        ProfileAccessLog.objects.filter(profile=profile)
+        .select_related("accessed_by")
+        .order_by("-accessed_at", "-id")
+    )
+    page_obj, base_qs = _paginate(request, qs, per_page=50)
+    return render(
+        request,
+        "panel/profile_access_log.html",
+        {
+            "profile": profile,
+            "summary": summary,
+            "total_count": sum(row["count"] for row in summary),
+            "days": days,
+            "page_obj": page_obj,
+            "base_qs": base_qs,
+        },
+    )
+
+
 @staff_required
 def photos_list(request):
     q = (request.GET.get("q") or "").strip()
@@ -966,8 +1056,6 @@ def photo_delete(request, photo_id: int):
         raise Http404
 
     photo = get_object_or_404(ProfilePhoto, id=photo_id)
-    if photo.image:
-        photo.image.delete(save=False)
     photo.delete()
     messages.success(request, "Фото удалено")
     return redirect("panel_photos")
@@ -985,7 +1073,7 @@ def swipes_list(request):
             | Q(value__icontains=q)
         )
 
-    page_obj, base_qs = _paginate(request, qs, per_page=80)
+    page_obj, base_qs = _keyset_paginate(request, qs, per_page=80)
     return render(
         request,
         "panel/swipes_list.html",
@@ -1016,7 +1104,7 @@ def matches_list(request):
     if q:
         qs = qs.filter(Q(user1__username__icontains=q) | Q(user2__username__icontains=q))
 
-    page_obj, base_qs = _paginate(request, qs, per_page=80)
+    page_obj, base_qs = _keyset_paginate(request, qs, per_page=80)
     return render(
         request,
         "panel/matches_list.html",
@@ -1047,7 +1135,7 @@ def messages_list(request):
     if q:
         qs = qs.filter(Q(sender__username__icontains=q) | Q(text__icontains=q))
 
-    page_obj, base_qs = _paginate(request, qs, per_page=80)
+    page_obj, base_qs = _keyset_paginate(request, qs, per_page=80)
     return render(
         request,
         "panel/messages_list.html",
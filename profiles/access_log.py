@@ -0,0 +1,367 @@
+"""Buffered writer for ProfileAccessLog.
+
+Views only enqueue access events; a background thread writes them in batches
+with ``bulk_create`` when the batch is full or the flush interval elapses.
+Pending events are drained when the worker process exits. When
+``PROFILE_ACCESS_LOG_SPILL_DIR`` is set, every event is also appended to a
+per-process journal file, so events lost by a crashed worker are replayed by
+the next process that starts the writer.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger("django")
+
+_JOURNAL_RE = re.compile(r"^profile-access-(\d+)(?:-[\w]+)?\.(jsonl|flushing)$")
+
+
+def _settings(name: str, default):
+    return getattr(settings, name, default)
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _serialize(event: dict) -> str:
+    data = dict(event)
+    data["accessed_at"] = event["accessed_at"].isoformat()
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _deserialize(line: str) -> dict | None:
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or not data.get("profile_id") or not data.get("access_type"):
+        return None
+    accessed_at = parse_datetime(str(data.get("accessed_at") or "")) or timezone.now()
+    return {
+        "profile_id": data["profile_id"],
+        "accessed_by_id": data.get("accessed_by_id"),
+        "access_type": data["access_type"],
+        "ip_address": data.get("ip_address"),
+        "user_agent": data.get("user_agent") or "",
+        "accessed_at": accessed_at,
+    }
+
+
+def _read_journal(path: Path) -> list[dict]:
+    events = []
+    try:
+        with path.open("r", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                event = _deserialize(line)
+                if event is not None:
+                    events.append(event)
+    except OSError:
+        logger.exception("Cannot read profile access journal %s", path)
+    return events
+
+
+def write_access_events(events: list[dict], *, batch_size: int = 500) -> int:
+    """Insert access events with ``bulk_create``; returns the number of rows written."""
+    from .models import ProfileAccessLog
+
+    if not events:
+        return 0
+
+    def _build(items):
+        return [ProfileAccessLog(**item) for item in items]
+
+    try:
+        ProfileAccessLog.objects.bulk_create(_build(events), batch_size=batch_size)
+        return len(events)
+    except IntegrityError:
+        pass
+
+    # A profile or user was deleted between the request and the flush:
+    # drop events for missing profiles and detach missing users.
+    from accounts.models import User
+
+    from .models import Profile
+
+    profile_ids = set(
+        Profile.objects.filter(id__in={e["profile_id"] for e in events}).values_list("id", flat=True)
+    )
+    user_ids = set(
+        User.objects.filter(
+            id__in={e["accessed_by_id"] for e in events if e.get("accessed_by_id")}
+        ).values_list("id", flat=True)
+    )
+    kept = []
+    for e in events:
+        if e["profile_id"] not in profile_ids:
+            continue
+        if e.get("accessed_by_id") and e["accessed_by_id"] not in user_ids:
+            e = {**e, "accessed_by_id": None}
+        kept.append(e)
+    ProfileAccessLog.objects.bulk_create(_build(kept), batch_size=batch_size)
+    return len(kept)
+
+
+class AccessLogWriter:
+    def __init__(
+        self,
+        *,
+        batch_size: int = 200,
+        flush_interval: float = 2.0,
+        max_pending: int = 50_000,
+        spill_dir: str | os.PathLike | None = None,
+    ):
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.05, float(flush_interval))
+        self.max_pending = max(self.batch_size, int(max_pending))
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+
+        self._pid = None
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._journal = None
+        self._journal_seq = 0
+        # Batches that failed to write: (events, journal path or None).
+        self._retry: list[tuple[list[dict], Path | None]] = []
+
+    # -- lifecycle -------------------------------------------------------
+
+    def _ensure_started(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                # Forked child: state inherited from the parent is not ours.
+                self._queue = queue.Queue()
+                self._retry = []
+                self._journal = None
+                self._journal_seq = 0
+                self._pid = pid
+                if self.spill_dir is not None:
+                    self._recover_spilled()
+                    self._open_journal()
+                atexit.register(self.shutdown)
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="profile-access-log-writer",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                close_old_connections()
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Profile access log flush failed")
+        finally:
+            connection.close()
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Stop the background thread and write everything still pending."""
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Profile access log final flush failed; events stay in the spill journal")
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+                self._remove_if_empty(self._journal_path())
+
+    # -- journal ---------------------------------------------------------
+
+    def _journal_path(self) -> Path:
+        return self.spill_dir / f"profile-access-{self._pid}.jsonl"
+
+    def _open_journal(self) -> None:
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            self._journal = self._journal_path().open("a", encoding="utf-8")
+        except OSError:
+            logger.exception("Cannot open profile access journal in %s", self.spill_dir)
+            self._journal = None
+
+    def _rotate_journal(self) -> Path | None:
+        """Close the current journal and hand it over to the flush in progress."""
+        if self._journal is None:
+            return None
+        self._journal.close()
+        self._journal = None
+        self._journal_seq += 1
+        current = self._journal_path()
+        rotated = self.spill_dir / f"profile-access-{self._pid}-{self._journal_seq}.flushing"
+        try:
+            current.rename(rotated)
+        except OSError:
+            logger.exception("Cannot rotate profile access journal %s", current)
+            rotated = None
+        self._open_journal()
+        return rotated
+
+    @staticmethod
+    def _remove_if_empty(path: Path) -> None:
+        try:
+            if path.exists() and path.stat().st_size == 0:
+                path.unlink()
+        except OSError:
+            pass
+
+    def _recover_spilled(self) -> None:
+        if not self.spill_dir.exists():
+            return
+        for path in sorted(self.spill_dir.iterdir()):
+            m = _JOURNAL_RE.match(path.name)
+            if m is None:
+                continue
+            owner = int(m.group(1))
+            if owner != self._pid and _pid_alive(owner):
+                continue
+            self._journal_seq += 1
+            claimed = self.spill_dir / f"profile-access-{self._pid}-r{self._journal_seq}.flushing"
+            try:
+                path.rename(claimed)
+            except OSError:
+                # Another process claimed it first.
+                continue
+            events = _read_journal(claimed)
+            if events:
+                self._retry.append((events, claimed))
+                logger.warning("Recovered %s profile access events from %s", len(events), path.name)
+            else:
+                claimed.unlink(missing_ok=True)
+
+    # -- public API ------------------------------------------------------
+
+    def enqueue(self, event: dict) -> None:
+        self._ensure_started()
+        with self._lock:
+            if self._journal is not None:
+                try:
+                    self._journal.write(_serialize(event) + "\n")
+                    self._journal.flush()
+                except OSError:
+                    logger.exception("Cannot append to profile access journal")
+            self._queue.put_nowait(event)
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                events = []
+                while True:
+                    try:
+                        events.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                journal = self._rotate_journal() if events else None
+
+            batches = self._retry
+            self._retry = []
+            if events:
+                batches.append((events, journal))
+
+            written = 0
+            for idx, (batch, path) in enumerate(batches):
+                try:
+                    written += write_access_events(batch, batch_size=self.batch_size)
+                except Exception:
+                    logger.exception("Cannot write %s profile access events; will retry", len(batch))
+                    self._keep_for_retry(batches[idx:])
+                    break
+                if path is not None:
+                    path.unlink(missing_ok=True)
+            return written
+
+    def _keep_for_retry(self, batches) -> None:
+        pending = 0
+        kept = []
+        for batch, path in reversed(batches):
+            pending += len(batch)
+            if pending > self.max_pending:
+                if path is None:
+                    logger.error("Dropping %s profile access events: retry buffer is full", len(batch))
+                # Journaled batches are replayed from disk by the next process.
+                continue
+            kept.append((batch, path))
+        kept.reverse()
+        self._retry = kept + self._retry
+
+
+_writer: AccessLogWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> AccessLogWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AccessLogWriter(
+                    batch_size=int(_settings("PROFILE_ACCESS_LOG_BATCH_SIZE", 200)),
+                    flush_interval=float(_settings("PROFILE_ACCESS_LOG_FLUSH_INTERVAL_SECONDS", 2.0)),
+                    max_pending=int(_settings("PROFILE_ACCESS_LOG_MAX_PENDING", 50_000)),
+                    spill_dir=_settings("PROFILE_ACCESS_LOG_SPILL_DIR", "") or None,
+                )
+    return _writer
+
+
+def record_profile_access(*, profile_id: int, user_id: int | None, access_type: str, ip_address, user_agent: str):
+    event = {
+        "profile_id": profile_id,
+        "accessed_by_id": user_id,
+        "access_type": access_type,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "accessed_at": timezone.now(),
+    }
+    if not _settings("PROFILE_ACCESS_LOG_ASYNC", True):
+        write_access_events([event])
+        return
+    get_writer().enqueue(event)
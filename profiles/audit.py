@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ProfileAccessDailyAggregate, ProfileAccessLog
+
+
+def day_start(value: date) -> datetime:
+    return timezone.make_aware(datetime.combine(value, time.min))
+
+
+def access_daily_summary(
+    *,
+    profile_id: int | None = None,
+    accessed_by_id: int | None = None,
+    since: date | None = None,
+    until: date | None = None,
+) -> list[dict]:
+    """Per-day access counts for the audit trail.
+
+    Days that were already archived come from ProfileAccessDailyAggregate,
+    recent days are grouped from the raw ProfileAccessLog rows; callers get one
+    list sorted newest first and do not need to know where the cutoff is.
+    """
+    raw_qs = ProfileAccessLog.objects.all()
+    agg_qs = ProfileAccessDailyAggregate.objects.all()
+
+    if profile_id is not None:
+        raw_qs = raw_qs.filter(profile_id=profile_id)
+        agg_qs = agg_qs.filter(profile_id=profile_id)
+    if accessed_by_id is not None:
+        raw_qs = raw_qs.filter(accessed_by_id=accessed_by_id)
+        agg_qs = agg_qs.filter(accessed_by_id=accessed_by_id)
+    if since is not None:
+        raw_qs = raw_qs.filter(accessed_at__gte=day_start(since))
+        agg_qs = agg_qs.filter(day__gte=since)
+    if until is not None:
+        raw_qs = raw_qs.filter(accessed_at__lt=day_start(until + timedelta(days=1)))
+        agg_qs = agg_qs.filter(day__lte=until)
+
+    keys = ("day", "profile_id", "accessed_by_id", "access_type")
+
+    raw_rows = (
+        raw_qs.order_by()
+        .annotate(day=TruncDate("accessed_at"))
+        .values(*keys)
+        .annotate(
+            total=Count("id"),
+            first_at=Min("accessed_at"),
+            last_at=Max("accessed_at"),
+        )
+    )
+    agg_rows = (
+        agg_qs.order_by()
+        .values(*keys)
+        .annotate(
+            total=Sum("count"),
+            first_at=Min("first_accessed_at"),
+            last_at=Max("last_accessed_at"),
+        )
+    )
+
+    merged: dict[tuple, dict] = {}
+    for source, rows in (("raw", raw_rows), ("archive", agg_rows)):
+        for row in rows:
+            key = tuple(row[k] for k in keys)
+            item = merged.get(key)
+            if item is None:
+                merged[key] = {
+                    **{k: row[k] for k in keys},
+                    "count": int(row["total"] or 0),
+                    "first_accessed_at": row["first_at"],
+                    "last_accessed_at": row["last_at"],
+                    "archived": source == "archive",
+                }
+                continue
+            item["count"] += int(row["total"] or 0)
+            item["first_accessed_at"] = min(item["first_accessed_at"], row["first_at"])
+            item["last_accessed_at"] = max(item["last_accessed_at"], row["last_at"])
+            item["archived"] = item["archived"] or source == "archive"
+
+    return sorted(merged.values(), key=lambda r: (r["day"], r["last_accessed_at"]), reverse=True)
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import csv
+import json
+
+from cryptography.fernet import InvalidToken
+from django.conf import settings
+
+from accounts.fields import fernet_token
+
+from .models import Profile
+from .questionnaire import get_questionnaire_spec, iter_question_ids
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+
+BASE_COLUMNS = ["user_id", "username", "gender", "looking_for", "city", "birth_date", "created_at"]
+
+_MULTI_SEPARATOR = "|"
+
+
+def export_columns() -> list[str]:
+    """Profile columns followed by ``me.<question>`` and ``ideal.<question>`` for every question.
+
+    The spec without gender/kind filters covers every question that exists,
+    so all rows share one header whatever their gender is.
+    """
+    question_ids = list(dict.fromkeys(iter_question_ids(get_questionnaire_spec())))
+    return BASE_COLUMNS + [f"me.{q}" for q in question_ids] + [f"ideal.{q}" for q in question_ids]
+
+
+def decode_answers(value) -> dict:
+    """Answers dict from a questionnaire column, decrypting Fernet tokens.
+
+    Decrypts without the shared field cache: an export touches every row once,
+    and would only evict the entries the web process actually reuses.
+    """
+    if isinstance(value, str):
+        token = fernet_token(value, json_quoted=True)
+        try:
+            value = json.loads(settings.FERNET.decrypt(token.encode()) if token else value)
+            if isinstance(value, str):
+                # A JSON-quoted plaintext document.
+                value = json.loads(value)
+        except (InvalidToken, ValueError):
+            return {}
+    return value if isinstance(value, dict) else {}
+
+
+def iter_export_records(columns: list[str], *, chunk_size: int = 2000):
+    """Yield one flat dict per profile, in primary-key order.
+
+    Profiles are read in keyset chunks with ``.iterator()``, so neither the
+    queryset cache nor a long-running transaction holds more than one chunk.
+    Multiple-choice answers stay lists; writers decide how to flatten them.
+    """
+    answer_columns = [c for c in columns if c not in BASE_COLUMNS]
+    qs = Profile.objects.order_by("pk").values_list(
+        "pk",
+        "user_id",
+        "user__username",
+        "gender",
+        "looking_for",
+        "city",
+        "birth_date",
+        "created_at",
+        "questionnaire_me",
+        "questionnaire_ideal",
+    )
+    last_pk = 0
+    while True:
+        fetched = 0
+        for pk, user_id, username, gender, looking_for, city, birth_date, created_at, me, ideal in qs.filter(
+            pk__gt=last_pk
+        )[:chunk_size].iterator(chunk_size=chunk_size):
+            fetched += 1
+            last_pk = pk
+            record = {
+                "user_id": user_id,
+                "username": username,
+                "gender": gender,
+                "looking_for": looking_for,
+                "city": city,
+                "birth_date": birth_date.isoformat() if birth_date else None,
+                "created_at": created_at.isoformat() if created_at else None,
+            }
+            answers = {"me": decode_answers(me), "ideal": decode_answers(ideal)}
+            for column in answer_columns:
+                kind, qid = column.split(".", 1)
+                record[column] = answers[kind].get(qid)
+            yield record
+        if fetched < chunk_size:
+            return
+
+
+def _flat(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return _MULTI_SEPARATOR.join(str(v) for v in value)
+    return str(value)
+
+
+class _Echo:
+    """csv.writer target that hands each formatted line back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(records, columns: list[str]):
+    """CSV text lines (header first); multiple choices are joined with ``|``."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for record in records:
+        yield writer.writerow([_flat(record.get(c)) for c in columns])
+
+
+def stream_jsonl(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def write_parquet(records, columns: list[str], path, *, batch_rows: int = 10000) -> int:
+    """Write ``records`` to a Parquet file one row group per ``batch_rows``; returns the row count.
+
+    Every column is a nullable string (multiple choices joined with ``|``),
+    so the schema does not depend on which answers happen to be present.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("pyarrow is required for Parquet export. Install it and try again.") from e
+
+    schema = pa.schema([(c, pa.string()) for c in columns])
+    total = 0
+    batch = {c: [] for c in columns}
+
+    def flush(writer):
+        writer.write_table(pa.table(batch, schema=schema))
+        for values in batch.values():
+            values.clear()
+
+    with pq.ParquetWriter(str(path), schema, compression="zstd") as writer:
+        pending = 0
+        for record in records:
+            for c in columns:
+                value = record.get(c)
+                batch[c].append(None if value is None else _flat(value))
+            pending += 1
+            total += 1
+            if pending >= batch_rows:
+                flush(writer)
+                pending = 0
+        if pending:
+            flush(writer)
+    return total
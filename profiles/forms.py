@@ -1,7 +1,7 @@
 from django import forms
 
 from .models import Profile, ProfilePhoto
-from .questionnaire import get_questionnaire_spec_for_profile
+from .questionnaire import get_questionnaire_spec_for_profile, update_questionnaire_progress
 
 
 class OnboardingForm(forms.ModelForm):
@@ -76,10 +76,17 @@ class _PeerCheckboxSelectMultiple(forms.CheckboxSelectMultiple):
 
 
 class QuestionnaireForm(forms.Form):
-    def __init__(self, *args, profile: Profile, kind: str, **kwargs):
+    """Answers of one questionnaire kind.
+
+    With ``section`` only that section's questions get fields, and ``save``
+    merges them into the stored answers instead of replacing the whole dict.
+    """
+
+    def __init__(self, *args, profile: Profile, kind: str, section: str | None = None, **kwargs):
         super().__init__(*args, **kwargs)
         self.profile = profile
         self.kind = kind
+        self.section = section
 
         if kind == "me":
             initial_answers = profile.questionnaire_me or {}
@@ -88,11 +95,12 @@ class QuestionnaireForm(forms.Form):
         else:
             raise ValueError("Invalid questionnaire kind")
 
-        spec = get_questionnaire_spec_for_profile(profile, kind)
+        self.spec = get_questionnaire_spec_for_profile(profile, kind)
+        self.sections = [s for s in self.spec if section is None or s["id"] == section]
 
         self._question_ids = []
-        for section in spec:
-            for q in section["questions"]:
+        for spec_section in self.sections:
+            for q in spec_section["questions"]:
                 qid = q["id"]
                 self._question_ids.append(qid)
                 input_type = (q.get("input_type") or "choice").strip().lower()
@@ -140,11 +148,17 @@ class QuestionnaireForm(forms.Form):
 
     def save(self):
         answers = self.cleaned_answers()
+        if self.section is not None:
+            stored = getattr(self.profile, f"questionnaire_{self.kind}") or {}
+            merged = {qid: v for qid, v in stored.items() if qid not in self._question_ids}
+            merged.update(answers)
+            answers = merged
         if self.kind == "me":
             self.profile.questionnaire_me = answers
         elif self.kind == "ideal":
             self.profile.questionnaire_ideal = answers
         else:
             raise ValueError("Invalid questionnaire kind")
-        self.profile.save(update_fields=[f"questionnaire_{self.kind}", "updated_at"])
+        update_questionnaire_progress(self.profile, self.kind, spec=self.spec, save=False)
+        self.profile.save(update_fields=[f"questionnaire_{self.kind}", "questionnaire_progress", "updated_at"])
         return self.profile
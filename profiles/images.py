@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger("django")
+
+DERIVATIVE_VERSION = 1
+
+# Bounding box (longest side, px) per derivative, largest first: each size is
+# resized from the previous one, which is much cheaper than from the original.
+DERIVATIVE_SIZES = {
+    "full": 1440,
+    "card": 640,
+    "thumb": 160,
+}
+
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def derivative_name(source: str, size: str, fmt: str, *, square: bool = False) -> str:
+    stem, _ = os.path.splitext(source)
+    variant = f"sq_{size}" if square else size
+    return f"derivatives/{stem}_{variant}.{DERIVATIVE_FORMATS[fmt][1]}"
+
+
+def _open_normalized(field_file) -> Image.Image:
+    """Decode an uploaded image upright, as RGB, without any metadata."""
+    field_file.open("rb")
+    try:
+        img = Image.open(field_file)
+        # Lets libjpeg decode at 1/2..1/8 scale when the original is far larger than we need.
+        box = max(DERIVATIVE_SIZES.values())
+        img.draft("RGB", (box, box))
+        img = ImageOps.exif_transpose(img)
+        img.load()
+    finally:
+        field_file.close()
+
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        img = Image.new("RGB", rgba.size, (255, 255, 255))
+        img.paste(rgba, mask=rgba.getchannel("A"))
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    # Drop EXIF/ICC/XMP that survived the transpose.
+    img.info = {}
+    return img
+
+
+def generate_derivatives(field_file, *, square: bool = False) -> dict:
+    """Write thumb/card/full WebP+JPEG variants of ``field_file`` under ``derivatives/``.
+
+    ``square`` centre-crops every variant (slightly above the middle, where
+    faces usually are); avatars use it. Variants go to ``default_storage``
+    under names derived from the source, so rows sharing a content-addressed
+    original share its variants too.
+
+    Returns the metadata stored on the model::
+
+        {"v": 1, "source": "photos/a.jpg", "w": 3024, "h": 4032,
+         "sizes": {"card": {"w": 480, "h": 640, "webp": "derivatives/photos/a_card.webp", "jpeg": "..."}, ...}}
+    """
+    storage = default_storage
+    source = field_file.name
+    img = _open_normalized(field_file)
+
+    sizes = {}
+    previous = None
+    variant = img
+    if square:
+        side = min(img.size)
+        variant = ImageOps.fit(img, (side, side), Image.Resampling.LANCZOS, centering=(0.5, 0.4))
+    for size_name, box in DERIVATIVE_SIZES.items():
+        variant = variant.copy()
+        variant.thumbnail((box, box), Image.Resampling.LANCZOS)
+        if previous is not None and (previous["w"], previous["h"]) == variant.size:
+            # Small originals: no point in storing the same pixels twice.
+            sizes[size_name] = dict(previous)
+            continue
+
+        entry = {"w": variant.width, "h": variant.height}
+        for fmt, (pil_format, _, options) in DERIVATIVE_FORMATS.items():
+            buf = io.BytesIO()
+            variant.save(buf, pil_format, **options)
+            name = derivative_name(source, size_name, fmt, square=square)
+            if storage.exists(name):
+                storage.delete(name)
+            entry[fmt] = storage.save(name, ContentFile(buf.getvalue()))
+        sizes[size_name] = entry
+        previous = entry
+
+    return {"v": DERIVATIVE_VERSION, "source": source, "w": img.width, "h": img.height, "square": square, "sizes": sizes}
+
+
+def derivative_files(derivatives: dict | None) -> set[str]:
+    names = set()
+    for entry in ((derivatives or {}).get("sizes") or {}).values():
+        for fmt in DERIVATIVE_FORMATS:
+            if entry.get(fmt):
+                names.add(entry[fmt])
+    return names
+
+
+def derivative_url(derivatives: dict | None, size: str, fmt: str = "jpeg", storage=None) -> str | None:
+    entry = ((derivatives or {}).get("sizes") or {}).get(size) or {}
+    name = entry.get(fmt)
+    if not name:
+        return None
+    return (default_storage if storage is None else storage).url(name)
+
+
+def derivatives_are_current(derivatives: dict | None, source: str | None) -> bool:
+    derivatives = derivatives or {}
+    return bool(source) and derivatives.get("source") == source and derivatives.get("v") == DERIVATIVE_VERSION
+
+
+def _shared_derivatives(qs, meta_field: str, source: str) -> dict | None:
+    """Current variants another row already built for the same (deduplicated) original."""
+    for derivatives in qs.values_list(meta_field, flat=True)[:5]:
+        if derivatives_are_current(derivatives, source) and not derivatives.get("error"):
+            return derivatives
+    return None
+
+
+def _build(field_file, *, square: bool = False) -> dict:
+    try:
+        return generate_derivatives(field_file, square=square)
+    except (UnidentifiedImageError, OSError, ValueError, Image.DecompressionBombError):
+        logger.exception("Cannot build derivatives for %s", field_file.name)
+        # Remember the failure so every later save does not retry a broken file.
+        return {"v": DERIVATIVE_VERSION, "source": field_file.name, "error": True, "sizes": {}}
+
+
+def refresh_photo_derivatives(photo, *, force: bool = False) -> dict:
+    """Make ``photo.derivatives`` match ``photo.image``; returns the metadata."""
+    from .models import ProfilePhoto
+
+    source = photo.image.name if photo.image else None
+    if not source and not photo.derivatives:
+        return photo.derivatives
+    if not force and derivatives_are_current(photo.derivatives, source):
+        return photo.derivatives
+    derivatives = {}
+    if source:
+        shared = None
+        if not force:
+            shared = _shared_derivatives(ProfilePhoto.objects.filter(image=source).exclude(pk=photo.pk), "derivatives", source)
+        derivatives = shared or _build(photo.image)
+    ProfilePhoto.objects.filter(pk=photo.pk).update(derivatives=derivatives)
+    photo.derivatives = derivatives
+    return derivatives
+
+
+def refresh_avatar_derivatives(profile, *, force: bool = False) -> dict:
+    """Make ``profile.avatar_derivatives`` match ``profile.avatar`` (square, centre-cropped variants).
+
+    Variants of the previous avatar are released once nothing uses them.
+    """
+    from .models import Profile
+
+    source = profile.avatar.name if profile.avatar else None
+    old = profile.avatar_derivatives or {}
+    if not source and not old:
+        return old
+    if not force and derivatives_are_current(old, source):
+        return old
+
+    derivatives = {}
+    if source:
+        shared = None
+        if not force:
+            shared = _shared_derivatives(Profile.objects.filter(avatar=source).exclude(pk=profile.pk), "avatar_derivatives", source)
+        derivatives = shared or _build(profile.avatar, square=True)
+    Profile.objects.filter(pk=profile.pk).update(avatar_derivatives=derivatives)
+    profile.avatar_derivatives = derivatives
+
+    old_source = old.get("source")
+    if old_source and old_source != source:
+        release_image(old_source, avatar_derivatives=sorted(derivative_files(old)))
+    return derivatives
+
+
+def release_image(source: str, *, photo_derivatives=(), avatar_derivatives=(), storage=None) -> None:
+    """Delete files of an image that lost a reference, but only those nothing else still uses.
+
+    Gallery and avatar variants have different names, so each set is checked
+    against its own model; the original goes when no photo, avatar or landing
+    block points at it.
+    """
+    from matchmaking.models import HomeBlock
+
+    from .models import Profile, ProfilePhoto
+
+    if storage is None:
+        storage = default_storage
+
+    used_by_photo = ProfilePhoto.objects.filter(image=source).exists()
+    used_by_avatar = Profile.objects.filter(avatar=source).exists()
+
+    doomed = []
+    if not used_by_photo:
+        doomed.extend(photo_derivatives)
+    if not used_by_avatar:
+        doomed.extend(avatar_derivatives)
+    if not used_by_photo and not used_by_avatar and not HomeBlock.objects.filter(image=source).exists():
+        doomed.append(source)
+
+    for name in doomed:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning("Cannot delete media file %s", name)
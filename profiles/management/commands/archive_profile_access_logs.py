@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from profiles.audit import day_start
+from profiles.models import ProfileAccessDailyAggregate, ProfileAccessLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll ProfileAccessLog rows older than the retention window into daily aggregates, "
+        "export them to gzip-compressed JSONL files and delete them in chunks"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=int(getattr(settings, "PROFILE_ACCESS_LOG_RETENTION_DAYS", 90)),
+            help="Keep raw rows for this many days (default: PROFILE_ACCESS_LOG_RETENTION_DAYS)",
+        )
+        parser.add_argument(
+            "--export-dir",
+            default=str(getattr(settings, "PROFILE_ACCESS_LOG_ARCHIVE_DIR", settings.BASE_DIR / "archive" / "profile_access")),
+            help="Directory for the exported .jsonl.gz files (default: PROFILE_ACCESS_LOG_ARCHIVE_DIR)",
+        )
+        parser.add_argument(
+            "--no-export",
+            action="store_true",
+            help="Only aggregate and delete, do not export raw rows",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Rows per DELETE statement and per export fetch (default: 5000)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Show what would be archived without changing anything",
+        )
+
+    def handle(self, *args, **options):
+        retention_days = options["retention_days"]
+        if retention_days < 1:
+            raise CommandError("--retention-days must be at least 1")
+        chunk_size = max(100, options["chunk_size"])
+        dry_run = options["dry_run"]
+        export_dir = None if options["no_export"] else Path(options["export_dir"]).expanduser()
+
+        cutoff_day = timezone.localdate() - timedelta(days=retention_days)
+        cutoff = day_start(cutoff_day)
+
+        oldest = (
+            ProfileAccessLog.objects.filter(accessed_at__lt=cutoff)
+            .order_by("accessed_at")
+            .values_list("accessed_at", flat=True)
+            .first()
+        )
+        if oldest is None:
+            self.stdout.write(f"Nothing to archive before {cutoff_day}")
+            return
+
+        if export_dir is not None and not dry_run:
+            export_dir.mkdir(parents=True, exist_ok=True)
+
+        day = timezone.localtime(oldest).date()
+        total_rows = 0
+        while day < cutoff_day:
+            rows = self._archive_day(day, export_dir, chunk_size, dry_run)
+            total_rows += rows
+            day += timedelta(days=1)
+
+        verb = "Would archive" if dry_run else "Archived"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total_rows} access log rows older than {cutoff_day}"))
+
+    def _archive_day(self, day, export_dir, chunk_size, dry_run) -> int:
+        start = day_start(day)
+        end = day_start(day + timedelta(days=1))
+        day_qs = ProfileAccessLog.objects.filter(accessed_at__gte=start, accessed_at__lt=end)
+
+        if dry_run:
+            count = day_qs.count()
+            if count:
+                self.stdout.write(f"{day}: {count} rows")
+            return count
+
+        with transaction.atomic():
+            groups = list(
+                day_qs.order_by()
+                .values("profile_id", "accessed_by_id", "access_type")
+                .annotate(
+                    total=Count("id"),
+                    first_at=Min("accessed_at"),
+                    last_at=Max("accessed_at"),
+                )
+            )
+            if not groups:
+                return 0
+
+            ProfileAccessDailyAggregate.objects.bulk_create(
+                [
+                    ProfileAccessDailyAggregate(
+                        profile_id=g["profile_id"],
+                        accessed_by_id=g["accessed_by_id"],
+                        access_type=g["access_type"],
+                        day=day,
+                        count=g["total"],
+                        first_accessed_at=g["first_at"],
+                        last_accessed_at=g["last_at"],
+                    )
+                    for g in groups
+                ],
+                batch_size=chunk_size,
+            )
+
+            if export_dir is not None:
+                tmp_path, final_path = self._export_day(day, day_qs, export_dir, chunk_size)
+                transaction.on_commit(lambda: os.replace(tmp_path, final_path))
+            else:
+                tmp_path = None
+
+            try:
+                deleted = self._delete_in_chunks(day_qs, chunk_size)
+            except Exception:
+                if tmp_path is not None:
+                    tmp_path.unlink(missing_ok=True)
+                raise
+
+        self.stdout.write(f"{day}: {deleted} rows -> {len(groups)} aggregates")
+        return deleted
+
+    def _export_day(self, day, day_qs, export_dir: Path, chunk_size: int):
+        final_path = export_dir / f"profile_access_{day.isoformat()}.jsonl.gz"
+        suffix = 2
+        while final_path.exists():
+            final_path = export_dir / f"profile_access_{day.isoformat()}_{suffix}.jsonl.gz"
+            suffix += 1
+        tmp_path = final_path.with_name(final_path.name + ".tmp")
+
+        fields = ("id", "profile_id", "accessed_by_id", "access_type", "ip_address", "user_agent", "accessed_at")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as fh:
+            for row in day_qs.order_by("id").values(*fields).iterator(chunk_size=chunk_size):
+                row["accessed_at"] = row["accessed_at"].isoformat()
+                fh.write(json.dumps(row, ensure_ascii=False))
+                fh.write("\n")
+        return tmp_path, final_path
+
+    @staticmethod
+    def _delete_in_chunks(day_qs, chunk_size: int) -> int:
+        deleted = 0
+        while True:
+            ids = list(day_qs.order_by("id").values_list("id", flat=True)[:chunk_size])
+            if not ids:
+                return deleted
+            count, _ = ProfileAccessLog.objects.filter(id__in=ids).delete()
+            deleted += count
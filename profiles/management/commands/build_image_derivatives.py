@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from profiles.images import derivatives_are_current, generate_derivatives
+from profiles.models import Profile, ProfilePhoto
+
+
+def _safe_generate(field_file, square: bool) -> dict | None:
+    try:
+        return generate_derivatives(field_file, square=square)
+    except Exception:
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Build thumb/card/full WebP+JPEG derivatives for existing profile photos and avatars. "
+        "Images are decoded and encoded in a thread pool (Pillow releases the GIL), rows are "
+        "updated with one bulk_update per chunk"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Encoding threads (default: number of CPUs)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=200,
+            help="Rows fetched and updated per batch (default: 200)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild derivatives that are already up to date",
+        )
+        parser.add_argument(
+            "--only",
+            choices=("photos", "avatars"),
+            help="Process only gallery photos or only avatars",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the images that need derivatives",
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options["workers"])
+        chunk_size = max(1, options["chunk_size"])
+        force = options["force"]
+        dry_run = options["dry_run"]
+        only = options["only"]
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            if only in (None, "photos"):
+                self._run(
+                    "photos",
+                    ProfilePhoto.objects.exclude(image="").only("id", "image", "derivatives"),
+                    "image",
+                    "derivatives",
+                    pool,
+                    chunk_size,
+                    force,
+                    dry_run,
+                )
+            if only in (None, "avatars"):
+                self._run(
+                    "avatars",
+                    Profile.objects.exclude(avatar="").exclude(avatar__isnull=True).only("id", "avatar", "avatar_derivatives"),
+                    "avatar",
+                    "avatar_derivatives",
+                    pool,
+                    chunk_size,
+                    force,
+                    dry_run,
+                )
+
+    def _run(self, label, qs, file_attr, meta_attr, pool, chunk_size, force, dry_run):
+        model = qs.model
+        # Avatars get square crops, gallery photos keep their aspect ratio.
+        square = model is Profile
+
+        scanned = built = failed = 0
+        last_pk = 0
+        while True:
+            rows = list(qs.filter(pk__gt=last_pk).order_by("pk")[:chunk_size])
+            if not rows:
+                break
+            last_pk = rows[-1].pk
+            scanned += len(rows)
+
+            todo = []
+            for obj in rows:
+                field_file = getattr(obj, file_attr)
+                if not force and derivatives_are_current(getattr(obj, meta_attr), field_file.name):
+                    continue
+                todo.append(obj)
+
+            if dry_run:
+                built += len(todo)
+                continue
+
+            updated = []
+            pending = [(obj, pool.submit(_safe_generate, getattr(obj, file_attr), square)) for obj in todo]
+
+            for obj, future in pending:
+                derivatives = future.result()
+                if derivatives is None:
+                    failed += 1
+                    self.stderr.write(f"{label}: cannot process {getattr(obj, file_attr).name} (id {obj.pk})")
+                    continue
+                setattr(obj, meta_attr, derivatives)
+                updated.append(obj)
+
+            if updated:
+                model.objects.bulk_update(updated, [meta_attr], batch_size=chunk_size)
+            built += len(updated)
+            self.stdout.write(f"{label}: scanned {scanned}, built {built}, failed {failed}")
+
+        verb = "Would build" if dry_run else "Built"
+        self.stdout.write(self.style.SUCCESS(f"{verb} derivatives for {built} {label} ({failed} failed)"))
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from config.sitemaps import INDEX_NAME, build_all, schedule_rebuild, sitemap_dir
+
+
+class Command(BaseCommand):
+    help = (
+        "Render sitemap.xml and the per-range profile sitemaps into MEDIA_ROOT/sitemaps/ and queue "
+        "the periodic rebuild job. Files whose content did not change are left untouched"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--no-schedule",
+            action="store_true",
+            help="Do not queue the periodic rebuild job",
+        )
+        parser.add_argument(
+            "--schedule-only",
+            action="store_true",
+            help=(
+                "Do not build now, only queue the rebuild job: right away when sitemap.xml is missing, "
+                "otherwise after SITEMAP_REBUILD_INTERVAL_SECONDS (for container start)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["schedule_only"]:
+            missing = not (sitemap_dir() / INDEX_NAME).exists()
+            schedule_rebuild(delay=0 if missing else None)
+            self.stdout.write(self.style.SUCCESS("Queued the sitemap rebuild" + (" (no sitemap.xml yet)" if missing else "")))
+            return
+        started = time.monotonic()
+        stats = build_all()
+        if not options["no_schedule"]:
+            schedule_rebuild()
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{stats['urls']} URLs in {stats['files']} profile files, {stats['written']} files changed "
+                f"in {sitemap_dir()} ({elapsed:.1f}s)"
+            )
+        )
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles.export import EXPORT_FORMATS, export_columns, iter_export_records, stream_csv, stream_jsonl, write_parquet
+
+
+class Command(BaseCommand):
+    help = (
+        "Export every profile's me/ideal answers as a wide table (one column per question) "
+        "to CSV, JSONL or Parquet. Rows are streamed in primary-key chunks and written "
+        "incrementally, so memory does not grow with the number of profiles"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Output file; '-' writes CSV/JSONL to stdout")
+        parser.add_argument(
+            "--format",
+            choices=EXPORT_FORMATS,
+            help="Output format (default: from the file extension, else csv)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Profiles fetched per query (default: 2000)",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"]
+        if fmt is None:
+            ext = Path(path).suffix.lower().lstrip(".")
+            fmt = ext if ext in EXPORT_FORMATS else "csv"
+        if fmt == "parquet" and path == "-":
+            raise CommandError("Parquet cannot be written to stdout")
+        chunk_size = max(1, options["chunk_size"])
+
+        started = time.monotonic()
+        columns = export_columns()
+        records = iter_export_records(columns, chunk_size=chunk_size)
+
+        if fmt == "parquet":
+            try:
+                written = write_parquet(self._counted(records), columns, path)
+            except RuntimeError as e:
+                raise CommandError(str(e)) from e
+        else:
+            lines = stream_csv(self._counted(records), columns) if fmt == "csv" else stream_jsonl(self._counted(records))
+            if path == "-":
+                for line in lines:
+                    self.stdout.write(line, ending="")
+            else:
+                # Written next to the target and renamed, so a failed run never leaves half a file behind.
+                tmp_path = f"{path}.part"
+                # utf-8-sig lets Excel detect the encoding of the Cyrillic headers.
+                encoding = "utf-8-sig" if fmt == "csv" else "utf-8"
+                with open(tmp_path, "w", encoding=encoding, newline="") as fh:
+                    fh.writelines(lines)
+                os.replace(tmp_path, path)
+            written = self.processed
+
+        if path != "-":
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Exported {written} profiles, {len(columns)} columns to {path} ({fmt}) in {elapsed:.1f}s"
+                )
+            )
+
+    def _counted(self, records):
+        self.processed = 0
+        for record in records:
+            self.processed += 1
+            if self.processed % 10000 == 0:
+                self.stderr.write(f"{self.processed} profiles...")
+            yield record
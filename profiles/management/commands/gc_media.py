@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from matchmaking.models import HomeBlock
+from profiles.images import derivative_files
+from profiles.models import Profile, ProfilePhoto
+from profiles.storage import BLOB_PREFIX
+
+# Directories owned by image fields: content-addressed blobs, pre-dedup uploads and variants.
+MANAGED_DIRS = (BLOB_PREFIX, "photos", "avatars", "landing", "derivatives")
+
+
+def referenced_media() -> set[str]:
+    """Every media name a row still points at, originals and derivatives."""
+    names = set()
+    for image, derivatives in ProfilePhoto.objects.values_list("image", "derivatives").iterator(chunk_size=2000):
+        if image:
+            names.add(image)
+        names |= derivative_files(derivatives)
+    for avatar, derivatives in Profile.objects.values_list("avatar", "avatar_derivatives").iterator(chunk_size=2000):
+        if avatar:
+            names.add(avatar)
+        names |= derivative_files(derivatives)
+    names.update(name for name in HomeBlock.objects.exclude(image="").exclude(image__isnull=True).values_list("image", flat=True))
+    return names
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete media files no photo, avatar or landing block references any more. "
+        "Uploads are deduplicated, so files are shared and only this sweep (or the release jobs) removes them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age-hours",
+            type=float,
+            default=24,
+            help="Keep unreferenced files younger than this; protects uploads whose row is not committed yet (default: 24)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only list the files that would be deleted",
+        )
+
+    def handle(self, *args, **options):
+        if options["min_age_hours"] < 0:
+            raise CommandError("--min-age-hours must not be negative")
+        dry_run = options["dry_run"]
+        cutoff = time.time() - options["min_age_hours"] * 3600
+        root = default_storage.path("")
+
+        # Collect references first: a file uploaded after this point is younger than the cutoff.
+        referenced = referenced_media()
+
+        scanned = deleted = freed = 0
+        for top in MANAGED_DIRS:
+            for dirpath, dirnames, filenames in os.walk(os.path.join(root, top)):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, root).replace(os.sep, "/")
+                    scanned += 1
+                    if name in referenced:
+                        continue
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    if stat.st_mtime > cutoff:
+                        continue
+                    deleted += 1
+                    freed += stat.st_size
+                    if dry_run:
+                        self.stdout.write(name)
+                        continue
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError as exc:
+                        self.stderr.write(f"Cannot delete {name}: {exc}")
+
+        verb = "would delete" if dry_run else "deleted"
+        self.stdout.write(
+            self.style.SUCCESS(f"Scanned {scanned} files, {verb} {deleted} unreferenced ({freed / 1048576:.1f} MiB)")
+        )
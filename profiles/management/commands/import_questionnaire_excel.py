@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import json
+from collections import defaultdict
 from pathlib import Path
 
 from django.conf import settings
@@ -90,25 +92,53 @@ def _cell_text(value) -> str:
     return str(value).replace("\r\n", "\n").replace("\r", "\n").strip()
 
 
-def _heuristic_find_columns(ws):
-    max_row = ws.max_row or 0
-    max_col = ws.max_column or 0
+def _norm(text) -> str:
+    return " ".join(str(text or "").split()).lower()
+
+
+def _sheet_matrix(ws) -> list[tuple]:
+    """All cell values of a read-only sheet as rows of equal width.
+
+    Read-only worksheets stream the XML once; the heuristics below look at
+    the same cells several times, so they work on this in-memory copy.
+    """
+    # Some writers store a wrong <dimension>; without this iter_rows would stop early.
+    ws.reset_dimensions()
+    rows = [tuple(row) for row in ws.iter_rows(values_only=True)]
+    while rows and not any(v is not None and str(v).strip() for v in rows[-1]):
+        rows.pop()
+    width = max((len(r) for r in rows), default=0)
+    return [r + (None,) * (width - len(r)) for r in rows]
+
+
+def _value(matrix, row: int, col: int):
+    """1-based cell lookup, ``None`` outside the sheet (like ``ws.cell(...).value``)."""
+    if row < 1 or col < 1 or row > len(matrix):
+        return None
+    values = matrix[row - 1]
+    return values[col - 1] if col <= len(values) else None
+
+
+def _heuristic_find_columns(matrix):
+    max_row = len(matrix)
+    max_col = len(matrix[0]) if matrix else 0
     if max_row <= 0 or max_col <= 0:
         return None
 
     scan_rows = min(max_row, 250)
     scan_cols = min(max_col, 80)
+    texts = [[_cell_text(v) for v in row[:scan_cols]] for row in matrix[:scan_rows]]
 
     question_scores = []
-    for col in range(1, scan_cols + 1):
+    for col in range(scan_cols):
         score = 0
-        for row in range(1, scan_rows + 1):
-            t = _cell_text(ws.cell(row=row, column=col).value)
+        for row in texts:
+            t = row[col]
             if not t or _is_headerish_text(t):
                 continue
             if len(t) >= 12:
                 score += 1
-        question_scores.append((score, col))
+        question_scores.append((score, col + 1))
 
     question_scores.sort(reverse=True)
     if not question_scores or question_scores[0][0] == 0:
@@ -117,28 +147,28 @@ def _heuristic_find_columns(ws):
     question_col = question_scores[0][1]
 
     answer_scores = []
-    for col in range(1, scan_cols + 1):
-        if col == question_col:
+    for col in range(scan_cols):
+        if col + 1 == question_col:
             continue
         score = 0
-        for row in range(1, scan_rows + 1):
-            t = _cell_text(ws.cell(row=row, column=col).value)
+        for row in texts:
+            t = row[col]
             if not t or _is_headerish_text(t):
                 continue
             if len(_split_choices(t)) >= 2:
                 score += 1
-        answer_scores.append((score, col))
+        answer_scores.append((score, col + 1))
 
     answer_scores.sort(reverse=True)
     answers_col = answer_scores[0][1] if answer_scores and answer_scores[0][0] > 0 else None
 
     for row in range(1, max_row + 1):
-        q_text = _cell_text(ws.cell(row=row, column=question_col).value)
+        q_text = _cell_text(_value(matrix, row, question_col))
         if not q_text or _is_headerish_text(q_text):
             continue
 
         if answers_col is not None:
-            a_text = _cell_text(ws.cell(row=row, column=answers_col).value)
+            a_text = _cell_text(_value(matrix, row, answers_col))
             if len(_split_choices(a_text)) >= 2:
                 return max(0, row - 1), question_col, answers_col, None
 
@@ -146,7 +176,7 @@ def _heuristic_find_columns(ws):
         for c in range(1, scan_cols + 1):
             if c == question_col:
                 continue
-            t = _cell_text(ws.cell(row=row, column=c).value)
+            t = _cell_text(_value(matrix, row, c))
             if not t or _is_headerish_text(t):
                 continue
             row_choices.append(t)
@@ -156,10 +186,9 @@ def _heuristic_find_columns(ws):
     return None
 
 
-def _find_header(ws):
-    max_scan = min(ws.max_row or 0, 20)
-    for row_idx in range(1, max_scan + 1):
-        headers = [_normalize_header(ws.cell(row=row_idx, column=c).value) for c in range(1, ws.max_column + 1)]
+def _find_header(matrix):
+    for row_idx, row in enumerate(matrix[:20], start=1):
+        headers = [_normalize_header(v) for v in row]
         question_col = None
         answers_col = None
         multiple_col = None
@@ -177,7 +206,7 @@ def _find_header(ws):
         if question_col is not None and answers_col is not None:
             return row_idx, question_col, answers_col, multiple_col
 
-    return _heuristic_find_columns(ws)
+    return _heuristic_find_columns(matrix)
 
 
 class Command(BaseCommand):
@@ -202,6 +231,22 @@ class Command(BaseCommand):
             action="store_true",
             help="Mark all imported questions as multiple-choice.",
         )
+        parser.add_argument(
+            "--merge",
+            action="store_true",
+            help=(
+                "Update the existing questionnaire in place instead of replacing it: sections are matched by "
+                "code/title, questions by text/code, choices by label. Matched rows keep their ids, codes and "
+                "choice values, so stored answers stay valid. Shows the diff without --apply."
+            ),
+        )
+        parser.add_argument(
+            "--report",
+            help=(
+                "With --merge: write the added/changed/removed question codes and the ids of the affected "
+                "questions as JSON to this file (ids of added questions only with --apply)."
+            ),
+        )
 
     def handle(self, *args, **options):
         try:
@@ -216,7 +261,7 @@ class Command(BaseCommand):
             raise CommandError(f"Excel file not found: {file_path}")
 
         try:
-            wb = load_workbook(filename=str(file_path), data_only=True)
+            wb = load_workbook(filename=str(file_path), read_only=True, data_only=True)
         except PermissionError as e:
             raise CommandError(
                 "Cannot open Excel file (permission denied). "
@@ -229,17 +274,43 @@ class Command(BaseCommand):
 
         only_tests = bool(options.get("only_tests"))
 
+        try:
+            parsed_sections = self._parse_workbook(wb, only_tests=only_tests, all_multiple=bool(options.get("all_multiple")))
+        finally:
+            # Read-only workbooks keep the file handle open until closed.
+            wb.close()
+
+        section_count = len(parsed_sections)
+        question_count = sum(len(s["questions"]) for s in parsed_sections)
+        choice_count = sum(len(q["choices"]) for s in parsed_sections for q in s["questions"])
+
+        self.stdout.write(
+            f"Parsed: sections={section_count} questions={question_count} choices={choice_count} file={file_path}"
+        )
+
+        if options.get("merge"):
+            self._merge(parsed_sections, only_tests=only_tests, apply=bool(options.get("apply")), report_path=options.get("report"))
+            return
+
+        if not options.get("apply"):
+            self.stdout.write("Dry-run mode. Re-run with --apply to write to DB.")
+            return
+
+        self._write(parsed_sections, only_tests=only_tests)
+        self.stdout.write("Import completed.")
+
+    def _parse_workbook(self, wb, *, only_tests: bool, all_multiple: bool) -> list[dict]:
         parsed_sections = []
         used_section_codes: set[str] = set()
         used_question_codes: set[str] = set()
 
         for sheet_order, sheet_name in enumerate(wb.sheetnames, start=1):
-            ws = wb[sheet_name]
             is_tests_sheet = str(sheet_name).strip().lower() in {"тест", "тесты"}
             if only_tests and not is_tests_sheet:
                 if len(wb.sheetnames) != 1:
                     continue
-            header = _find_header(ws)
+            matrix = _sheet_matrix(wb[sheet_name])
+            header = _find_header(matrix)
             if header is None:
                 raise CommandError(f"Cannot find header row with 'Вопрос'/'Ответы' in sheet: {sheet_name}")
 
@@ -262,8 +333,8 @@ class Command(BaseCommand):
             questions = []
             question_order = 0
 
-            for row_idx in range(header_row + 1, (ws.max_row or 0) + 1):
-                q_raw = ws.cell(row=row_idx, column=question_col).value
+            for row_idx in range(header_row + 1, len(matrix) + 1):
+                q_raw = _value(matrix, row_idx, question_col)
                 if q_raw is None:
                     continue
                 q_text = str(q_raw).strip()
@@ -271,15 +342,15 @@ class Command(BaseCommand):
                     continue
 
                 if answers_col is not None:
-                    a_raw = ws.cell(row=row_idx, column=answers_col).value
+                    a_raw = _value(matrix, row_idx, answers_col)
                     choice_labels = _split_choices(a_raw)
                 else:
                     choice_labels = []
-                    max_col = ws.max_column or 0
+                    max_col = len(matrix[0])
                     for c in range(question_col + 1, max_col + 1):
                         if multiple_col is not None and c == multiple_col:
                             continue
-                        t = _cell_text(ws.cell(row=row_idx, column=c).value)
+                        t = _cell_text(_value(matrix, row_idx, c))
                         if not t or _is_headerish_text(t):
                             continue
                         parts = _split_choices(t)
@@ -313,10 +384,10 @@ class Command(BaseCommand):
                 used_question_codes.add(q_code)
 
                 row_is_multiple = False
-                if options.get("all_multiple"):
+                if all_multiple:
                     row_is_multiple = True
                 elif multiple_col is not None:
-                    row_is_multiple = _parse_bool(ws.cell(row=row_idx, column=multiple_col).value)
+                    row_is_multiple = _parse_bool(_value(matrix, row_idx, multiple_col))
                 else:
                     row_is_multiple = _guess_is_multiple(q_text)
 
@@ -345,21 +416,19 @@ class Command(BaseCommand):
                 }
             )
 
-        section_count = len(parsed_sections)
-        question_count = sum(len(s["questions"]) for s in parsed_sections)
-        choice_count = sum(len(q["choices"]) for s in parsed_sections for q in s["questions"])
 
-        self.stdout.write(
-            f"Parsed: sections={section_count} questions={question_count} choices={choice_count} file={file_path}"
-        )
+        return parsed_sections
 
-        if not options.get("apply"):
-            self.stdout.write("Dry-run mode. Re-run with --apply to write to DB.")
-            return
+    def _write(self, parsed_sections: list[dict], *, only_tests: bool) -> None:
+        """Replace the questionnaire in one transaction with three bulk INSERT batches.
 
+        Sections and questions are read back by their unique codes to get
+        primary keys, which works on every backend (bulk_create only returns
+        them where INSERT ... RETURNING is supported). bulk_create sends no
+        post_save, so the questionnaire revision is bumped explicitly.
+        """
         from profiles.models import QuestionnaireChoice, QuestionnaireQuestion, QuestionnaireSection
-
-        section_field_names = {f.name for f in QuestionnaireSection._meta.get_fields()}
+        from profiles.questionnaire import bump_questionnaire_revision
 
         with transaction.atomic():
             if only_tests:
@@ -373,20 +442,29 @@ class Command(BaseCommand):
                 QuestionnaireQuestion.objects.all().delete()
                 QuestionnaireSection.objects.all().delete()
 
-            for section in parsed_sections:
-                section_kwargs = {
-                    "code": section["code"],
-                    "gender": "",
-                    "title": section["title"],
-                    "hint": "",
-                    "order": section["order"],
-                }
-
-                section_obj = QuestionnaireSection.objects.create(**section_kwargs)
+            QuestionnaireSection.objects.bulk_create(
+                [
+                    QuestionnaireSection(
+                        code=section["code"],
+                        gender="",
+                        title=section["title"],
+                        hint="",
+                        order=section["order"],
+                    )
+                    for section in parsed_sections
+                ],
+                batch_size=500,
+            )
+            section_ids = dict(
+                QuestionnaireSection.objects.filter(code__in=[s["code"] for s in parsed_sections]).values_list(
+                    "code", "id"
+                )
+            )
 
-                for q_order, q in enumerate(section["questions"], start=1):
-                    question_obj = QuestionnaireQuestion.objects.create(
-                        section=section_obj,
+            QuestionnaireQuestion.objects.bulk_create(
+                [
+                    QuestionnaireQuestion(
+                        section_id=section_ids[section["code"]],
                         code=q["code"],
                         gender="",
                         text=q["text"],
@@ -394,13 +472,294 @@ class Command(BaseCommand):
                         is_multiple=bool(q.get("is_multiple")),
                         order=q_order,
                     )
+                    for section in parsed_sections
+                    for q_order, q in enumerate(section["questions"], start=1)
+                ],
+                batch_size=500,
+            )
+            question_codes = [q["code"] for s in parsed_sections for q in s["questions"]]
+            question_ids = dict(
+                QuestionnaireQuestion.objects.filter(code__in=question_codes).values_list("code", "id")
+            )
 
-                    for c_order, label in enumerate(q["choices"], start=1):
-                        QuestionnaireChoice.objects.create(
-                            question=question_obj,
-                            value=str(c_order),
-                            label=str(label).strip(),
-                            order=c_order,
+            QuestionnaireChoice.objects.bulk_create(
+                [
+                    QuestionnaireChoice(
+                        question_id=question_ids[q["code"]],
+                        value=str(c_order),
+                        label=str(label).strip(),
+                        order=c_order,
+                    )
+                    for section in parsed_sections
+                    for q in section["questions"]
+                    for c_order, label in enumerate(q["choices"], start=1)
+                ],
+                batch_size=1000,
+            )
+
+            bump_questionnaire_revision()
+
+    def _merge(self, parsed_sections: list[dict], *, only_tests: bool, apply: bool, report_path: str | None) -> None:
+        """Bring the questionnaire in line with the workbook with the fewest row changes.
+
+        Sections match by code, then by title. Questions match by text anywhere
+        in scope (so inserting a question does not shift everything after it),
+        then by code (a reworded question). Choices match by label. New
+        questions get codes no existing question uses, and new choices get
+        values after the existing ones, so answers keyed by code/value keep
+        meaning the same thing.
+        """
+        from profiles.models import QuestionnaireChoice, QuestionnaireQuestion, QuestionnaireSection
+        from profiles.questionnaire import bump_questionnaire_revision
+
+        sections_qs = QuestionnaireSection.objects.all()
+        if only_tests:
+            sections_qs = sections_qs.filter(code="tests")
+        existing_sections = list(sections_qs.order_by("order", "id"))
+        existing_questions = list(
+            QuestionnaireQuestion.objects.filter(section__in=existing_sections)
+            .order_by("section__order", "order", "id")
+            .prefetch_related("choices")
+        )
+        taken_section_codes = set(QuestionnaireSection.objects.values_list("code", flat=True))
+        taken_question_codes = set(QuestionnaireQuestion.objects.values_list("code", flat=True))
+
+        # Sections.
+        sections_by_code = {s.code: s for s in existing_sections}
+        sections_by_title = defaultdict(list)
+        for s in existing_sections:
+            sections_by_title[_norm(s.title)].append(s)
+        matched_sections: dict[str, QuestionnaireSection] = {}
+        used_section_ids = set()
+        new_sections = []
+        changed_sections = []
+        for ps in parsed_sections:
+            obj = sections_by_code.get(ps["code"])
+            if obj is None or obj.id in used_section_ids:
+                obj = next((s for s in sections_by_title[_norm(ps["title"])] if s.id not in used_section_ids), None)
+            if obj is None:
+                code = ps["code"]
+                suffix = 2
+                while code in taken_section_codes:
+                    code = f"{ps['code']}_{suffix}"
+                    suffix += 1
+                taken_section_codes.add(code)
+                obj = QuestionnaireSection(code=code, gender="", title=ps["title"], hint="", order=ps["order"])
+                new_sections.append(obj)
+            else:
+                used_section_ids.add(obj.id)
+                if (obj.title, obj.order) != (ps["title"], ps["order"]):
+                    obj.title, obj.order = ps["title"], ps["order"]
+                    changed_sections.append(obj)
+            matched_sections[ps["code"]] = obj
+        removed_sections = [s for s in existing_sections if s.id not in used_section_ids]
+
+        # Questions and their choices.
+        questions_by_text = defaultdict(list)
+        questions_by_code = {}
+        for q in existing_questions:
+            questions_by_text[_norm(q.text)].append(q)
+            questions_by_code[q.code] = q
+        used_question_ids = set()
+        pairs = []
+        for ps in parsed_sections:
+            for q_order, pq in enumerate(ps["questions"], start=1):
+                obj = next((q for q in questions_by_text[_norm(pq["text"])] if q.id not in used_question_ids), None)
+                if obj is not None:
+                    used_question_ids.add(obj.id)
+                pairs.append([ps, q_order, pq, obj])
+        # Only after every exact text match is taken, so an inserted question cannot steal a code.
+        for pair in pairs:
+            if pair[3] is None:
+                by_code = questions_by_code.get(pair[2]["code"])
+                if by_code is not None and by_code.id not in used_question_ids:
+                    used_question_ids.add(by_code.id)
+                    pair[3] = by_code
+
+        new_questions = []  # (question, section code, choice labels)
+        changed_questions = []
+        changed_fields: dict[str, list[str]] = {}
+        new_choices = []  # (question code, choice)
+        changed_choices = []
+        removed_choice_ids = []
+        for ps, q_order, pq, obj in pairs:
+            section = matched_sections[ps["code"]]
+            input_type = str(pq.get("input_type") or "choice")
+            is_multiple = bool(pq.get("is_multiple"))
+            if obj is None:
+                code = pq["code"]
+                suffix = 2
+                while code in taken_question_codes:
+                    code = f"{pq['code']}_{suffix}"
+                    suffix += 1
+                taken_question_codes.add(code)
+                question = QuestionnaireQuestion(
+                    code=code, gender="", text=pq["text"], input_type=input_type, is_multiple=is_multiple, order=q_order
+                )
+                new_questions.append((question, section.code, pq["choices"]))
+                continue
+
+            fields = []
+            if section.pk is None or obj.section_id != section.pk:
+                fields.append("section")
+            if obj.text != pq["text"]:
+                obj.text = pq["text"]
+                fields.append("text")
+            if obj.input_type != input_type:
+                obj.input_type = input_type
+                fields.append("input_type")
+            if obj.is_multiple != is_multiple:
+                obj.is_multiple = is_multiple
+                fields.append("is_multiple")
+            if obj.order != q_order:
+                obj.order = q_order
+                fields.append("order")
+
+            choices_changed = False
+            existing_choices = defaultdict(list)
+            for c in obj.choices.all():
+                existing_choices[_norm(c.label)].append(c)
+            values = [int(c.value) for c in obj.choices.all() if str(c.value).isdigit()]
+            next_value = max(values, default=0) + 1
+            kept = set()
+            for c_order, label in enumerate(pq["choices"], start=1):
+                label = str(label).strip()
+                choice = next((c for c in existing_choices[_norm(label)] if c.id not in kept), None)
+                if choice is None:
+                    new_choices.append((obj.code, QuestionnaireChoice(value=str(next_value), label=label, order=c_order)))
+                    next_value += 1
+                    choices_changed = True
+                    continue
+                kept.add(choice.id)
+                if (choice.label, choice.order) != (label, c_order):
+                    if choice.label != label:
+                        choices_changed = True
+                    choice.label, choice.order = label, c_order
+                    changed_choices.append(choice)
+            for c in obj.choices.all():
+                if c.id not in kept:
+                    removed_choice_ids.append(c.id)
+                    choices_changed = True
+            if choices_changed:
+                fields.append("choices")
+
+            if fields:
+                changed_fields[obj.code] = fields
+                if set(fields) - {"choices"}:
+                    changed_questions.append((obj, section.code))
+        removed_questions = [q for q in existing_questions if q.id not in used_question_ids]
+
+        added = [q.code for q, _, _ in new_questions]
+        removed = [q.code for q in removed_questions]
+        # Pure reordering does not change what an answer means.
+        affected = sorted(set(added) | set(removed) | {c for c, f in changed_fields.items() if set(f) - {"order"}})
+        # Ids of changed and removed questions are known now (removed rows lose them on delete);
+        # added ones are read back after bulk_create.
+        existing_ids = {q.code: q.id for q in existing_questions}
+        report = {
+            "added": added,
+            "changed": changed_fields,
+            "removed": removed,
+            "affected_question_codes": affected,
+            "affected_question_ids": sorted(existing_ids[code] for code in affected if code in existing_ids),
+            "sections": {
+                "added": [s.code for s in new_sections],
+                "changed": [s.code for s in changed_sections],
+                "removed": [s.code for s in removed_sections],
+            },
+        }
+
+        self.stdout.write(
+            f"Merge: questions +{len(added)} ~{len(changed_fields)} -{len(removed)}, "
+            f"sections +{len(new_sections)} ~{len(changed_sections)} -{len(removed_sections)}, "
+            f"choices +{len(new_choices)} ~{len(changed_choices)} -{len(removed_choice_ids)}"
+        )
+        for code in added:
+            self.stdout.write(f"  + {code}")
+        for code, fields in changed_fields.items():
+            self.stdout.write(f"  ~ {code}: {', '.join(fields)}")
+        for code in removed:
+            self.stdout.write(f"  - {code}")
+
+        def write_report():
+            if report_path:
+                Path(report_path).expanduser().write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        has_changes = any(
+            [
+                new_sections,
+                changed_sections,
+                removed_sections,
+                new_questions,
+                changed_questions,
+                removed_questions,
+                new_choices,
+                changed_choices,
+                removed_choice_ids,
+            ]
+        )
+        if not apply:
+            write_report()
+            self.stdout.write("Dry-run mode. Re-run with --apply to write to DB.")
+            return
+        if not has_changes:
+            write_report()
+            self.stdout.write("Questionnaire is already up to date.")
+            return
+
+        with transaction.atomic():
+            QuestionnaireSection.objects.bulk_create(new_sections, batch_size=500)
+            if changed_sections:
+                QuestionnaireSection.objects.bulk_update(changed_sections, ["title", "order"], batch_size=500)
+            section_ids = dict(
+                QuestionnaireSection.objects.filter(code__in=[s.code for s in matched_sections.values()]).values_list(
+                    "code", "id"
+                )
+            )
+
+            for question, section_code in changed_questions:
+                question.section_id = section_ids[section_code]
+            if changed_questions:
+                QuestionnaireQuestion.objects.bulk_update(
+                    [q for q, _ in changed_questions],
+                    ["section", "text", "input_type", "is_multiple", "order"],
+                    batch_size=500,
+                )
+            for question, section_code, _ in new_questions:
+                question.section_id = section_ids[section_code]
+            QuestionnaireQuestion.objects.bulk_create([q for q, _, _ in new_questions], batch_size=500)
+            question_ids = dict(
+                QuestionnaireQuestion.objects.filter(
+                    code__in=[q.code for q, _, _ in new_questions] + [code for code, _ in new_choices]
+                ).values_list("code", "id")
+            )
+            report["affected_question_ids"] = sorted(
+                report["affected_question_ids"] + [question_ids[q.code] for q, _, _ in new_questions]
+            )
+
+            if removed_choice_ids:
+                QuestionnaireChoice.objects.filter(id__in=removed_choice_ids).delete()
+            if changed_choices:
+                QuestionnaireChoice.objects.bulk_update(changed_choices, ["label", "order"], batch_size=1000)
+            choices = []
+            for code, choice in new_choices:
+                choice.question_id = question_ids[code]
+                choices.append(choice)
+            for question, _, labels in new_questions:
+                for c_order, label in enumerate(labels, start=1):
+                    choices.append(
+                        QuestionnaireChoice(
+                            question_id=question_ids[question.code], value=str(c_order), label=str(label).strip(), order=c_order
                         )
+                    )
+            QuestionnaireChoice.objects.bulk_create(choices, batch_size=1000)
 
-        self.stdout.write("Import completed.")
+            if removed_questions:
+                QuestionnaireQuestion.objects.filter(id__in=[q.id for q in removed_questions]).delete()
+            if removed_sections:
+                QuestionnaireSection.objects.filter(id__in=[s.id for s in removed_sections]).delete()
+
+            bump_questionnaire_revision()
+
+        write_report()
+        self.stdout.write(f"Merge completed, {len(affected)} questions affected.")
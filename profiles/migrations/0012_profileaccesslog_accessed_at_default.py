@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-19 00:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0011_encrypt_existing_questionnaires'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profileaccesslog',
+            name='accessed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-19 00:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0012_profileaccesslog_accessed_at_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileAccessDailyAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('access_type', models.CharField(choices=[('profile_view', 'Просмотр профиля'), ('questionnaire_view', 'Просмотр анкеты'), ('profile_edit', 'Редактирование профиля'), ('questionnaire_edit', 'Редактирование анкеты')], max_length=32)),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('first_accessed_at', models.DateTimeField()),
+                ('last_accessed_at', models.DateTimeField()),
+                ('accessed_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='access_aggregates', to=settings.AUTH_USER_MODEL)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='access_aggregates', to='profiles.profile')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['profile', 'day'], name='profiles_pr_profile_e7abe8_idx'), models.Index(fields=['accessed_by', 'day'], name='profiles_pr_accesse_2a1db0_idx')],
+            },
+        ),
+    ]
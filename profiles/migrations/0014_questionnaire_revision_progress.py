@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-19 02:10
+
+from django.db import migrations, models
+
+
+def create_revision(apps, schema_editor):
+    QuestionnaireRevision = apps.get_model("profiles", "QuestionnaireRevision")
+    QuestionnaireRevision.objects.get_or_create(pk=1, defaults={"version": 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0013_profileaccessdailyaggregate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='questionnaire_progress',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.CreateModel(
+            name='QuestionnaireRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_revision, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-19 04:10
+
+import profiles.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0015_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, storage=profiles.storage.content_addressed_storage, upload_to='avatars/'),
+        ),
+        migrations.AlterField(
+            model_name='profilephoto',
+            name='image',
+            field=models.ImageField(storage=profiles.storage.content_addressed_storage, upload_to='photos/'),
+        ),
+    ]
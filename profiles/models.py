@@ -2,6 +2,9 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from .images import derivative_url
+from .storage import content_addressed_storage
+
 
 class Profile(models.Model):
     class Gender(models.TextChoices):
@@ -25,9 +28,12 @@ class Profile(models.Model):
     birth_date = models.DateField(null=True, blank=True)
     gender = models.CharField(max_length=16, choices=Gender.choices, blank=True)
     looking_for = models.CharField(max_length=16, choices=LookingFor.choices, blank=True)
-    avatar = models.ImageField(upload_to="avatars/", null=True, blank=True)
+    avatar = models.ImageField(upload_to="avatars/", storage=content_addressed_storage, null=True, blank=True)
+    avatar_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     questionnaire_me = models.JSONField(default=dict, blank=True)
     questionnaire_ideal = models.JSONField(default=dict, blank=True)
+    # {kind: {"answered", "total", "version", "gender"}}, maintained by QuestionnaireForm.save
+    questionnaire_progress = models.JSONField(default=dict, blank=True, editable=False)
 
     class Theme(models.TextChoices):
         DARK = "dark", "Тёмная"
@@ -51,6 +57,24 @@ class Profile(models.Model):
             years -= 1
         return years
 
+    def avatar_variant_url(self, size: str, fmt: str = "jpeg") -> str | None:
+        """URL of a resized avatar, falling back to the original until derivatives exist."""
+        if not self.avatar:
+            return None
+        return derivative_url(self.avatar_derivatives, size, fmt) or self.avatar.url
+
+    @property
+    def avatar_thumb_url(self):
+        return self.avatar_variant_url("thumb")
+
+    @property
+    def avatar_card_url(self):
+        return self.avatar_variant_url("card")
+
+    @property
+    def avatar_full_url(self):
+        return self.avatar_variant_url("full")
+
     def __str__(self) -> str:
         return f"Profile({self.user_id})"
 
@@ -74,7 +98,7 @@ class ProfileAccessLog(models.Model):
     access_type = models.CharField(max_length=32, choices=AccessType.choices)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
-    accessed_at = models.DateTimeField(auto_now_add=True)
+    accessed_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ["-accessed_at"]
@@ -88,15 +112,61 @@ class ProfileAccessLog(models.Model):
         return f"ProfileAccessLog({self.profile_id}, {self.access_type}, {self.accessed_at})"
 
 
+class ProfileAccessDailyAggregate(models.Model):
+    """Daily rollup of archived ProfileAccessLog rows per (profile, accessed_by, access_type)."""
+
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="access_aggregates")
+    accessed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="access_aggregates",
+    )
+    access_type = models.CharField(max_length=32, choices=ProfileAccessLog.AccessType.choices)
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    first_accessed_at = models.DateTimeField()
+    last_accessed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-day"]
+        indexes = [
+            models.Index(fields=["profile", "day"]),
+            models.Index(fields=["accessed_by", "day"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"ProfileAccessDailyAggregate({self.profile_id}, {self.access_type}, {self.day}, {self.count})"
+
+
 class ProfilePhoto(models.Model):
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="photos")
-    image = models.ImageField(upload_to="photos/")
+    image = models.ImageField(upload_to="photos/", storage=content_addressed_storage)
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)
     order = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["order", "created_at"]
 
+    def variant_url(self, size: str, fmt: str = "jpeg") -> str | None:
+        """URL of a resized copy, falling back to the original until derivatives exist."""
+        if not self.image:
+            return None
+        return derivative_url(self.derivatives, size, fmt) or self.image.url
+
+    @property
+    def thumb_url(self):
+        return self.variant_url("thumb")
+
+    @property
+    def card_url(self):
+        return self.variant_url("card")
+
+    @property
+    def full_url(self):
+        return self.variant_url("full")
+
     def __str__(self) -> str:
         return f"ProfilePhoto({self.profile_id})"
 
@@ -157,3 +227,16 @@ class QuestionnaireChoice(models.Model):
 
     def __str__(self) -> str:
         return f"QuestionnaireChoice({self.question_id}:{self.value})"
+
+
+class QuestionnaireRevision(models.Model):
+    """Single-row counter bumped whenever sections, questions or choices change.
+
+    Cached questionnaire specs and per-profile progress are keyed by ``version``.
+    """
+
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"QuestionnaireRevision({self.version})"
@@ -1,7 +1,13 @@
 from __future__ import annotations
 
-from django.db.models import Prefetch, Q
+import threading
+
+from django.db import connection, transaction
+from django.db.models import F, Prefetch, Q
 from django.db.utils import OperationalError, ProgrammingError
+from django.utils import timezone
+
+from accounts.cache_utils import cache_result
 
 SCALE_CHOICES = [
     ("1", "Совсем не про меня"),
@@ -284,74 +290,137 @@ QUESTIONNAIRE_SPEC = [
 ]
 
 
-def get_questionnaire_spec(gender: str | None = None, kind: str | None = None):
-    try:
-        from .models import QuestionnaireChoice, QuestionnaireQuestion, QuestionnaireSection
-
-        if not QuestionnaireSection.objects.exists():
-            spec = _normalize_questionnaire_spec(QUESTIONNAIRE_SPEC)
-            kind_value = (str(kind).strip().lower() if kind is not None else "") or None
-            if kind_value != "ideal":
-                for section in spec:
-                    for q in section.get("questions") or []:
-                        q["is_multiple"] = False
-            return spec
-
-        gender_value = (str(gender).strip() if gender is not None else "") or None
+def _build_questionnaire_spec(gender: str | None, kind: str | None):
+    from .models import QuestionnaireChoice, QuestionnaireQuestion, QuestionnaireSection
+
+    if not QuestionnaireSection.objects.exists():
+        spec = _normalize_questionnaire_spec(QUESTIONNAIRE_SPEC)
         kind_value = (str(kind).strip().lower() if kind is not None else "") or None
+        if kind_value != "ideal":
+            for section in spec:
+                for q in section.get("questions") or []:
+                    q["is_multiple"] = False
+        return spec
 
-        sections_qs = QuestionnaireSection.objects.order_by("order", "id")
-        questions_qs = QuestionnaireQuestion.objects.order_by("order", "id")
-
-        if kind_value in ("me", "ideal"):
-            section_flag = "show_in_me" if kind_value == "me" else "show_in_ideal"
-            question_flag = section_flag
-            sections_qs = sections_qs.filter(**{section_flag: True})
-            questions_qs = questions_qs.filter(**{question_flag: True})
-
-        if gender_value is not None:
-            sections_qs = sections_qs.filter(Q(gender="") | Q(gender=gender_value))
-            questions_qs = questions_qs.filter(Q(gender="") | Q(gender=gender_value))
-
-        sections_qs = sections_qs.prefetch_related(
-            Prefetch(
-                "questions",
-                queryset=questions_qs.prefetch_related(
-                    Prefetch(
-                        "choices",
-                        queryset=QuestionnaireChoice.objects.order_by("order", "id"),
-                    )
-                ),
-            )
-        )
+    gender_value = (str(gender).strip() if gender is not None else "") or None
+    kind_value = (str(kind).strip().lower() if kind is not None else "") or None
 
-        spec = []
-        for section in sections_qs:
-            questions = []
-            for q in section.questions.all():
-                choices = [(c.value, c.label) for c in q.choices.all()]
-                input_type = (getattr(q, "input_type", None) or "choice")
-                is_multiple = (
-                    bool(getattr(q, "is_multiple", False))
-                    and input_type.strip().lower() != "text"
-                    and bool(choices)
-                )
-                if kind_value is not None and kind_value != "ideal":
-                    is_multiple = False
-                questions.append(
-                    {
-                        "id": q.code,
-                        "text": q.text,
-                        "input_type": input_type,
-                        "choices": choices,
-                        "is_multiple": is_multiple,
-                        "show_in_me": bool(getattr(q, "show_in_me", True)),
-                        "show_in_ideal": bool(getattr(q, "show_in_ideal", True)),
-                    }
+    sections_qs = QuestionnaireSection.objects.order_by("order", "id")
+    questions_qs = QuestionnaireQuestion.objects.order_by("order", "id")
+
+    if kind_value in ("me", "ideal"):
+        section_flag = "show_in_me" if kind_value == "me" else "show_in_ideal"
+        question_flag = section_flag
+        sections_qs = sections_qs.filter(**{section_flag: True})
+        questions_qs = questions_qs.filter(**{question_flag: True})
+
+    if gender_value is not None:
+        sections_qs = sections_qs.filter(Q(gender="") | Q(gender=gender_value))
+        questions_qs = questions_qs.filter(Q(gender="") | Q(gender=gender_value))
+
+    sections_qs = sections_qs.prefetch_related(
+        Prefetch(
+            "questions",
+            queryset=questions_qs.prefetch_related(
+                Prefetch(
+                    "choices",
+                    queryset=QuestionnaireChoice.objects.order_by("order", "id"),
                 )
-            if not questions:
-                continue
-            spec.append({"id": section.code, "title": section.title, "questions": questions})
+            ),
+        )
+    )
+
+    spec = []
+    for section in sections_qs:
+        questions = []
+        for q in section.questions.all():
+            choices = [(c.value, c.label) for c in q.choices.all()]
+            input_type = (getattr(q, "input_type", None) or "choice")
+            is_multiple = (
+                bool(getattr(q, "is_multiple", False))
+                and input_type.strip().lower() != "text"
+                and bool(choices)
+            )
+            if kind_value is not None and kind_value != "ideal":
+                is_multiple = False
+            questions.append(
+                {
+                    "id": q.code,
+                    "text": q.text,
+                    "input_type": input_type,
+                    "choices": choices,
+                    "is_multiple": is_multiple,
+                    "show_in_me": bool(getattr(q, "show_in_me", True)),
+                    "show_in_ideal": bool(getattr(q, "show_in_ideal", True)),
+                }
+            )
+        if not questions:
+            continue
+        spec.append({"id": section.code, "title": section.title, "questions": questions})
+    return spec
+
+
+@cache_result("very_long")
+def _shared_questionnaire_spec(gender: str | None, kind: str | None, revision: int):
+    # ``revision`` only keys the entry: after a bump the old specs are never asked for again.
+    return _build_questionnaire_spec(gender, kind)
+
+
+_spec_cache: dict[tuple, list] = {}
+_spec_cache_lock = threading.Lock()
+
+
+def questionnaire_revision() -> int:
+    from .models import QuestionnaireRevision
+
+    return QuestionnaireRevision.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+
+
+def _bump_revision() -> None:
+    from .models import QuestionnaireRevision
+
+    updated = QuestionnaireRevision.objects.filter(pk=1).update(
+        version=F("version") + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        QuestionnaireRevision.objects.get_or_create(pk=1, defaults={"version": 2})
+
+
+def bump_questionnaire_revision() -> None:
+    """Invalidate cached specs and progress in every process.
+
+    Inside a transaction the bump runs once on commit, so an import that saves
+    hundreds of questions issues a single UPDATE. A bump already queued on the
+    connection is not queued again; a rollback discards it with the rest of the
+    on_commit callbacks, so the next transaction queues a fresh one.
+    """
+    if not connection.in_atomic_block:
+        _bump_revision()
+        return
+    if any(func is _bump_revision for _, func, _ in connection.run_on_commit):
+        return
+    transaction.on_commit(_bump_revision)
+
+
+def get_questionnaire_spec(gender: str | None = None, kind: str | None = None):
+    """Questionnaire spec for ``gender``/``kind``, memoized per questionnaire revision.
+
+    Memoized in the process and, for cold workers, in the shared cache.
+
+    The returned list is shared between callers and must not be mutated.
+    """
+    gender_value = (str(gender).strip() if gender is not None else "") or None
+    kind_value = (str(kind).strip().lower() if kind is not None else "") or None
+    try:
+        revision = questionnaire_revision()
+        key = (gender_value, kind_value, revision)
+        spec = _spec_cache.get(key)
+        if spec is None:
+            spec = _shared_questionnaire_spec(gender_value, kind_value, revision)
+            with _spec_cache_lock:
+                for stale in [k for k in _spec_cache if k[2] != revision]:
+                    del _spec_cache[stale]
+                _spec_cache[key] = spec
         return spec
     except (OperationalError, ProgrammingError):
         return _normalize_questionnaire_spec(QUESTIONNAIRE_SPEC)
@@ -390,6 +459,11 @@ def iter_question_ids(spec=None):
             yield q["id"]
 
 
+def _progress_tuple(answered: int, total: int):
+    percent = int(round((answered / total) * 100)) if total else 0
+    return answered, total, percent
+
+
 def questionnaire_progress(answers: dict | None, spec=None):
     answers = answers or {}
     spec = spec or get_questionnaire_spec()
@@ -405,6 +479,48 @@ def questionnaire_progress(answers: dict | None, spec=None):
             continue
         if str(v).strip() != "":
             answered += 1
-    total = questionnaire_total(spec)
-    percent = int(round((answered / total) * 100)) if total else 0
-    return answered, total, percent
+    return _progress_tuple(answered, questionnaire_total(spec))
+
+
+def update_questionnaire_progress(profile, kind: str, *, spec=None, save: bool = True):
+    """Recompute the cached progress of ``kind`` on ``profile`` (and persist it unless ``save`` is False)."""
+    if spec is None:
+        spec = get_questionnaire_spec_for_profile(profile, kind)
+    answers = profile.questionnaire_me if kind == "me" else profile.questionnaire_ideal
+    answered, total, _ = questionnaire_progress(answers, spec)
+    try:
+        version = questionnaire_revision()
+    except (OperationalError, ProgrammingError):
+        version = 0
+
+    progress = dict(profile.questionnaire_progress or {})
+    progress[kind] = {
+        "answered": answered,
+        "total": total,
+        "version": version,
+        "gender": questionnaire_gender_for_profile(profile, kind),
+    }
+    profile.questionnaire_progress = progress
+    if save and profile.pk:
+        type(profile).objects.filter(pk=profile.pk).update(questionnaire_progress=progress)
+    return _progress_tuple(answered, total)
+
+
+def cached_questionnaire_progress(profile, kind: str):
+    """(answered, total, percent) from Profile.questionnaire_progress.
+
+    Falls back to a full recount when the entry was computed for an older
+    questionnaire revision or for a different gender/looking_for.
+    """
+    entry = (profile.questionnaire_progress or {}).get(kind)
+    if entry:
+        try:
+            version = questionnaire_revision()
+        except (OperationalError, ProgrammingError):
+            version = 0
+        if (
+            entry.get("version") == version
+            and entry.get("gender") == questionnaire_gender_for_profile(profile, kind)
+        ):
+            return _progress_tuple(int(entry.get("answered") or 0), int(entry.get("total") or 0))
+    return update_questionnaire_progress(profile, kind)
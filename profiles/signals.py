@@ -1,11 +1,93 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import Profile
+from config.sitemaps import schedule_refresh
+from jobs.queue import enqueue
+from matchmaking.models import UserBan
+
+from .images import derivative_files, derivatives_are_current
+from .models import Profile, ProfilePhoto, QuestionnaireChoice, QuestionnaireQuestion, QuestionnaireSection
+from .questionnaire import bump_questionnaire_revision
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def ensure_profile_exists(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=QuestionnaireSection)
+@receiver(post_save, sender=QuestionnaireQuestion)
+@receiver(post_save, sender=QuestionnaireChoice)
+@receiver(post_delete, sender=QuestionnaireSection)
+@receiver(post_delete, sender=QuestionnaireQuestion)
+@receiver(post_delete, sender=QuestionnaireChoice)
+def questionnaire_changed(sender, **kwargs):
+    if kwargs.get("raw"):
+        return
+    bump_questionnaire_revision()
+
+
+# Image work runs in `manage.py run_workers`, never inside the upload request.
+
+
+@receiver(post_save, sender=ProfilePhoto)
+def photo_saved(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image or derivatives_are_current(instance.derivatives, instance.image.name):
+        return
+    enqueue("profiles.photo_derivatives", {"photo_id": instance.pk}, key=f"photo-derivatives:{instance.pk}")
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    source = instance.avatar.name if instance.avatar else None
+    if not source and not instance.avatar_derivatives:
+        return
+    if derivatives_are_current(instance.avatar_derivatives, source):
+        return
+    enqueue("profiles.avatar_derivatives", {"profile_id": instance.pk}, key=f"avatar-derivatives:{instance.pk}")
+
+
+@receiver(post_delete, sender=ProfilePhoto)
+def photo_deleted(sender, instance, **kwargs):
+    if not instance.image:
+        return
+    enqueue(
+        "profiles.release_image",
+        {"source": instance.image.name, "photo_derivatives": sorted(derivative_files(instance.derivatives))},
+    )
+
+
+@receiver(post_delete, sender=Profile)
+def profile_deleted(sender, instance, **kwargs):
+    if not instance.avatar:
+        return
+    enqueue(
+        "profiles.release_image",
+        {"source": instance.avatar.name, "avatar_derivatives": sorted(derivative_files(instance.avatar_derivatives))},
+    )
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def refresh_profile_sitemap(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_refresh(instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_user_sitemap(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    # New users get their entry through the profile created above; logins (last_login) change nothing.
+    if raw or created or (update_fields is not None and "is_active" not in update_fields):
+        return
+    schedule_refresh(instance.pk)
+
+
+@receiver(post_save, sender=UserBan)
+@receiver(post_delete, sender=UserBan)
+def refresh_banned_user_sitemap(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_refresh(instance.user_id)
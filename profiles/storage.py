@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import LazyObject
+
+BLOB_PREFIX = "blobs"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Stores uploads as ``blobs/ab/cd/<sha256>.<ext>`` under MEDIA_ROOT.
+
+    The same bytes uploaded twice (as a gallery photo and as an avatar, or by
+    two users) end up as one file, and the second upload writes nothing.
+    Files are shared, so they must only be deleted once no row references
+    them: ``profiles.images.release_image`` and ``manage.py gc_media`` do that.
+    """
+
+    def _hash(self, content) -> str:
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def generate_filename(self, filename):
+        # upload_to only decides the extension; the directory is derived from the content.
+        return filename
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1].lower()
+        digest = self._hash(content)
+        name = f"{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+        if self.exists(name):
+            # Bump mtime so gc_media treats a re-used orphan like a fresh upload.
+            try:
+                os.utime(self.path(name))
+            except FileNotFoundError:
+                pass
+            else:
+                return name
+
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(directory, self.directory_permissions_mode)
+
+        # Write to a temp file and rename: concurrent uploads of the same bytes
+        # both succeed and leave one complete file.
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                for chunk in content.chunks():
+                    fh.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return name
+
+
+class _DefaultContentAddressedStorage(LazyObject):
+    def _setup(self):
+        self._wrapped = ContentAddressedStorage()
+
+
+_storage = _DefaultContentAddressedStorage()
+
+
+def content_addressed_storage():
+    """Callable for ``ImageField(storage=...)``; keeps the storage out of migrations."""
+    return _storage
@@ -0,0 +1,35 @@
+from config.sitemaps import build_all, refresh_buckets, schedule_rebuild
+from jobs.queue import job
+
+from .images import refresh_avatar_derivatives, refresh_photo_derivatives, release_image
+from .models import Profile, ProfilePhoto
+
+
+@job("profiles.photo_derivatives")
+def photo_derivatives(photo_id: int):
+    photo = ProfilePhoto.objects.filter(pk=photo_id).first()
+    if photo is not None:
+        refresh_photo_derivatives(photo)
+
+
+@job("profiles.avatar_derivatives")
+def avatar_derivatives(profile_id: int):
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if profile is not None:
+        refresh_avatar_derivatives(profile)
+
+
+@job("profiles.release_image")
+def release_image_files(source: str, photo_derivatives=(), avatar_derivatives=()):
+    release_image(source, photo_derivatives=photo_derivatives, avatar_derivatives=avatar_derivatives)
+
+
+@job("profiles.sitemap_bucket")
+def sitemap_bucket(bucket: int):
+    refresh_buckets([bucket])
+
+
+@job("profiles.sitemap_rebuild")
+def sitemap_rebuild():
+    build_all()
+    schedule_rebuild()
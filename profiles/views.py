@@ -1,21 +1,24 @@
 from django.contrib.auth.decorators import login_required
 from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.http import urlencode
 
 from matchmaking.models import UserBan, UserBlock
 
+from .access_log import record_profile_access
 from .forms import OnboardingForm, PhotoUploadForm, QuestionnaireForm
 from .models import Profile, ProfilePhoto, ProfileAccessLog
-from .questionnaire import get_questionnaire_spec_for_profile, questionnaire_progress
+from .questionnaire import cached_questionnaire_progress, get_questionnaire_spec_for_profile
 
 
 def _log_profile_access(profile, user, access_type, request):
-    """Helper function to log profile access."""
+    """Helper function to log profile access (written in batches off the request path)."""
     ip_address = request.META.get("REMOTE_ADDR") or request.META.get("HTTP_X_FORWARDED_FOR", "")
     user_agent = request.META.get("HTTP_USER_AGENT", "")
-    ProfileAccessLog.objects.create(
-        profile=profile,
-        accessed_by=user if user.is_authenticated else None,
+    record_profile_access(
+        profile_id=profile.id,
+        user_id=user.id if user.is_authenticated else None,
         access_type=access_type,
         ip_address=ip_address[:45] if ip_address else None,
         user_agent=user_agent[:500] if user_agent else "",
@@ -42,10 +45,8 @@ def me(request):
     profile = request.user.profile
     upload_form = PhotoUploadForm()
 
-    spec_me = get_questionnaire_spec_for_profile(profile, "me")
-    spec_ideal = get_questionnaire_spec_for_profile(profile, "ideal")
-    me_answered, me_total, me_percent = questionnaire_progress(profile.questionnaire_me, spec_me)
-    ideal_answered, ideal_total, ideal_percent = questionnaire_progress(profile.questionnaire_ideal, spec_ideal)
+    me_answered, me_total, me_percent = cached_questionnaire_progress(profile, "me")
+    ideal_answered, ideal_total, ideal_percent = cached_questionnaire_progress(profile, "ideal")
     blocks_count = UserBlock.objects.filter(blocker=request.user).count()
 
     _log_profile_access(profile, request.user, ProfileAccessLog.AccessType.PROFILE_VIEW, request)
@@ -86,23 +87,72 @@ def blocked_users(request):
             other_name = other.get_username()
         other_avatar_url = None
         if other_profile is not None and other_profile.avatar:
-            other_avatar_url = other_profile.avatar.url
-        rows.append({"block": b, "other": other, "other_name": other_name, "other_avatar_url": other_avatar_url})
+            other_avatar_url = other_profile.avatar_thumb_url
+        rows.append(
+            {
+                "block": b,
+                "other": other,
+                "other_name": other_name,
+                "other_avatar_url": other_avatar_url,
+                "other_profile": other_profile,
+            }
+        )
 
     return render(request, "profiles/blocks.html", {"rows": rows})
 
 
+SECTION_HINTS = {
+    "principles": "Ценности и принципы, которые определяют поведение в отношениях и в жизни. Нужны, чтобы находить людей с похожими установками.",
+    "housing": "Ожидания по быту и личному пространству. Нужны, чтобы снизить конфликтность в совместной жизни.",
+    "roles": "Предпочтения по ролям и принятию решений в паре. Нужны, чтобы совпали ожидания от партнёрства.",
+    "work": "Отношение к работе, карьере и балансу. Нужны, чтобы понимать темп жизни и приоритеты.",
+    "wife_expenses": "Ожидания по финансам/подаркам/бюджету. Нужны, чтобы избежать разногласий по деньгам.",
+    "sexual": "Комфорт и ожидания в интимной сфере. Нужны, чтобы оценить базовую совместимость.",
+    "rest": "Как вы отдыхаете и проводите свободное время. Нужны, чтобы было легко планировать досуг вместе.",
+    "love_language": "Как вы предпочитаете получать/давать любовь и заботу. Нужны, чтобы лучше понимать друг друга.",
+    "tests": "Ситуационные вопросы для проверки реакций и границ. Нужны, чтобы увидеть поведение в стрессовых/неоднозначных ситуациях.",
+}
+
+
+def _questionnaire_section_id(request, spec) -> str | None:
+    section_ids = [section["id"] for section in spec]
+    if not section_ids:
+        return None
+
+    requested = (request.POST.get("section") or request.GET.get("section") or "").strip()
+    if requested in section_ids:
+        return requested
+
+    qid = (request.GET.get("q") or "").strip()
+    if qid:
+        for section in spec:
+            if any(q["id"] == qid for q in section["questions"]):
+                return section["id"]
+
+    return section_ids[0]
+
+
+def _questionnaire_url(kind: str, section: str | None, *, edit: bool) -> str:
+    params = {}
+    if edit:
+        params["edit"] = "1"
+    if section:
+        params["section"] = section
+    url = reverse("questionnaire", kwargs={"kind": kind})
+    return f"{url}?{urlencode(params)}" if params else url
+
+
 @login_required
 def questionnaire(request, kind: str):
+    """One questionnaire section per request; progress comes from Profile.questionnaire_progress."""
     if kind not in ("me", "ideal"):
         raise Http404
 
     profile = request.user.profile
 
     spec = get_questionnaire_spec_for_profile(profile, kind)
-
-    before_answers = profile.questionnaire_me if kind == "me" else profile.questionnaire_ideal
-    _, _, before_percent = questionnaire_progress(before_answers, spec)
+    section_ids = [section["id"] for section in spec]
+    section_id = _questionnaire_section_id(request, spec)
 
     editable = (request.GET.get("edit") or "").strip() == "1"
     if (request.GET.get("view") or "").strip() == "1":
@@ -115,13 +165,13 @@ def questionnaire(request, kind: str):
     )
     _log_profile_access(profile, request.user, access_type, request)
 
-    if request.method == "POST" and editable:
-        form = QuestionnaireForm(request.POST, profile=profile, kind=kind)
+    if request.method == "POST" and editable and section_id is not None:
+        _, _, before_percent = cached_questionnaire_progress(profile, kind)
+        form = QuestionnaireForm(request.POST, profile=profile, kind=kind, section=section_id)
         if form.is_valid():
             form.save()
 
-            after_answers = profile.questionnaire_me if kind == "me" else profile.questionnaire_ideal
-            _, _, after_percent = questionnaire_progress(after_answers, spec)
+            _, _, after_percent = cached_questionnaire_progress(profile, kind)
             if before_percent < 100 and after_percent == 100:
                 from panel.models import AdminNotification
 
@@ -131,71 +181,65 @@ def questionnaire(request, kind: str):
                     questionnaire_kind=kind,
                 )
 
-            return redirect("questionnaire", kind=kind)
+            goto = (request.POST.get("goto") or "").strip()
+            if goto in section_ids:
+                return redirect(_questionnaire_url(kind, goto, edit=True))
+            return redirect(_questionnaire_url(kind, section_id, edit=False))
     else:
-        form = QuestionnaireForm(profile=profile, kind=kind)
-
-    answers = profile.questionnaire_me if kind == "me" else profile.questionnaire_ideal
-    answered, total, percent = questionnaire_progress(answers, spec)
+        form = QuestionnaireForm(profile=profile, kind=kind, section=section_id)
 
+    answered, total, percent = cached_questionnaire_progress(profile, kind)
     other_kind = "ideal" if kind == "me" else "me"
-    other_answers = profile.questionnaire_ideal if kind == "me" else profile.questionnaire_me
-    other_spec = get_questionnaire_spec_for_profile(profile, other_kind)
-    other_answered, other_total, other_percent = questionnaire_progress(other_answers, other_spec)
-
-    section_hints = {
-        "principles": "Ценности и принципы, которые определяют поведение в отношениях и в жизни. Нужны, чтобы находить людей с похожими установками.",
-        "housing": "Ожидания по быту и личному пространству. Нужны, чтобы снизить конфликтность в совместной жизни.",
-        "roles": "Предпочтения по ролям и принятию решений в паре. Нужны, чтобы совпали ожидания от партнёрства.",
-        "work": "Отношение к работе, карьере и балансу. Нужны, чтобы понимать темп жизни и приоритеты.",
-        "wife_expenses": "Ожидания по финансам/подаркам/бюджету. Нужны, чтобы избежать разногласий по деньгам.",
-        "sexual": "Комфорт и ожидания в интимной сфере. Нужны, чтобы оценить базовую совместимость.",
-        "rest": "Как вы отдыхаете и проводите свободное время. Нужны, чтобы было легко планировать досуг вместе.",
-        "love_language": "Как вы предпочитаете получать/давать любовь и заботу. Нужны, чтобы лучше понимать друг друга.",
-        "tests": "Ситуационные вопросы для проверки реакций и границ. Нужны, чтобы увидеть поведение в стрессовых/неоднозначных ситуациях.",
-    }
+    other_answered, other_total, other_percent = cached_questionnaire_progress(profile, other_kind)
 
     sections = []
+    current = None
     for section in spec:
         sid = section["id"]
-        rows = []
-        for q in section["questions"]:
-            qid = q["id"]
-            rows.append(
-                {
-                    "id": qid,
-                    "text": q["text"],
-                    "input_type": (q.get("input_type") or "choice"),
-                    "field": form[qid],
-                    "is_multiple": (kind == "ideal") and bool(q.get("is_multiple")),
-                }
-            )
-        sections.append(
-            {
-                "id": sid,
-                "title": section["title"],
-                "hint": section_hints.get(sid, ""),
-                "questions": rows,
-            }
-        )
+        item = {
+            "id": sid,
+            "title": section["title"],
+            "hint": SECTION_HINTS.get(sid, ""),
+            "count": len(section["questions"]),
+            "questions": [],
+        }
+        if sid == section_id:
+            for q in section["questions"]:
+                qid = q["id"]
+                item["questions"].append(
+                    {
+                        "id": qid,
+                        "text": q["text"],
+                        "input_type": (q.get("input_type") or "choice"),
+                        "field": form[qid],
+                        "is_multiple": (kind == "ideal") and bool(q.get("is_multiple")),
+                    }
+                )
+            current = item
+        sections.append(item)
+
+    index = section_ids.index(section_id) if section_id is not None else 0
+    context = {
+        "form": form,
+        "kind": kind,
+        "sections": sections,
+        "section": current,
+        "section_number": index + 1,
+        "prev_section": section_ids[index - 1] if index > 0 else None,
+        "next_section": section_ids[index + 1] if index + 1 < len(section_ids) else None,
+        "editable": editable,
+        "answered": answered,
+        "total": total,
+        "percent": percent,
+        "other_kind": other_kind,
+        "other_answered": other_answered,
+        "other_total": other_total,
+        "other_percent": other_percent,
+    }
 
-    return render(
-        request,
-        "profiles/questionnaire.html",
-        {
-            "form": form,
-            "kind": kind,
-            "sections": sections,
-            "editable": editable,
-            "answered": answered,
-            "total": total,
-            "percent": percent,
-            "other_kind": other_kind,
-            "other_answered": other_answered,
-            "other_total": other_total,
-            "other_percent": other_percent,
-        },
-    )
+    if request.headers.get("HX-Request") == "true":
+        return render(request, "profiles/_questionnaire_section.html", context)
+    return render(request, "profiles/questionnaire.html", context)
 
 
 @login_required
@@ -253,8 +297,7 @@ def photo_delete(request, photo_id: int):
 
     profile = request.user.profile
     photo = get_object_or_404(ProfilePhoto, id=photo_id, profile=profile)
-    if photo.image:
-        photo.image.delete(save=False)
+    # The file and its derivatives are removed by a background job once nothing references them.
     photo.delete()
     return redirect("photos_manage")
 